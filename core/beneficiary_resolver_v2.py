@@ -4,6 +4,7 @@ Module amélioré pour la résolution des bénéficiaires avec logs détaillés
 import pandas as pd
 import numpy as np
 import logging
+import threading
 from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
@@ -13,13 +14,28 @@ class BeneficiaryResolverV2:
     """Résolution intelligente des bénéficiaires version 2 avec logs détaillés"""
     
     def __init__(self):
+        # Statistiques propres à chaque thread (résolutions simultanées)
+        self._local = threading.local()
         self.mapping_strategy = None
         self.mapping_stats = {}
+    
+    @property
+    def mapping_stats(self) -> Dict:
+        """Statistiques de la dernière résolution du thread appelant"""
+        return getattr(self._local, 'mapping_stats', {})
+    
+    @mapping_stats.setter
+    def mapping_stats(self, stats: Dict):
+        self._local.mapping_stats = stats
         
     def resolve_beneficiaries(self, transactions_df: pd.DataFrame, 
-                             export_df: pd.DataFrame) -> pd.DataFrame:
+                             export_df: pd.DataFrame,
+                             names: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Résout les bénéficiaires pour chaque transaction avec logs détaillés
+        
+        Args:
+            names: Noms déjà extraits de l'Export (index_export), sinon extraits ici
         """
         logger.info("="*60)
         logger.info("DÉBUT DE LA RÉSOLUTION DES BÉNÉFICIAIRES V2")
@@ -31,7 +47,8 @@ class BeneficiaryResolverV2:
         logger.info(f"  • Export: {len(export_df)} lignes")
         
         # 2. Chercher et extraire les noms depuis Export
-        names = self._extract_names_robust(export_df)
+        if names is None:
+            names = self.index_export(export_df)
         
         if not names:
             logger.error("❌ AUCUN NOM EXTRAIT depuis Export!")
@@ -51,6 +68,10 @@ class BeneficiaryResolverV2:
         
         return result
     
+    def index_export(self, export_df: pd.DataFrame) -> List[str]:
+        """Noms de l'Export dans l'ordre (calculables dès l'arrivée du fichier)"""
+        return self._extract_names_robust(export_df)
+    
     def _extract_names_robust(self, export_df: pd.DataFrame) -> List[str]:
         """
         Extraction robuste des noms avec plusieurs stratégies
@@ -6,8 +6,9 @@ import numpy as np
 from datetime import datetime
 import logging
 import os
+import threading
 import json
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 from .smart_processor import SmartProcessor
 
 logger = logging.getLogger(__name__)
@@ -17,12 +18,34 @@ class DataProcessor:
     """Processeur principal pour le mapping et traitement des données"""
     
     def __init__(self):
+        # Erreurs et clé du dernier résultat, propres à chaque thread (traitements simultanés)
+        self._local = threading.local()
         self.mappings_cache = self._load_mappings_cache()
         self.errors = []
         self.warnings = []
         self.smart_processor = SmartProcessor()
         self.use_smart_processing = True  # Flag pour activer/désactiver le traitement intelligent
 
+    @property
+    def last_stage_key(self) -> Optional[str]:
+        """Clé du dernier résultat calculé par le thread appelant"""
+        return getattr(self._local, 'last_stage_key', None)
+    
+    @last_stage_key.setter
+    def last_stage_key(self, key: Optional[str]):
+        self._local.last_stage_key = key
+    
+    @property
+    def errors(self) -> list:
+        """Erreurs/avertissements du traitement en cours dans le thread appelant"""
+        if not hasattr(self._local, 'errors'):
+            self._local.errors = []
+        return self._local.errors
+    
+    @errors.setter
+    def errors(self, errors: list):
+        self._local.errors = errors
+
     def _load_mappings_cache(self) -> dict:
         """Charger le cache des correspondances précédentes"""
         cache_file = "./config/mappings_cache.json"
@@ -42,22 +65,27 @@ class DataProcessor:
             json.dump(self.mappings_cache, f, ensure_ascii=False, indent=2)
     
     def process_transactions(self, bulk_df: pd.DataFrame, export_df: pd.DataFrame, 
-                            fees_df: pd.DataFrame, metadata: dict) -> Tuple[pd.DataFrame, list]:
+                            fees_df: pd.DataFrame, metadata: dict,
+                            input_keys: Optional[Dict[str, str]] = None) -> Tuple[pd.DataFrame, list]:
         """
         Traite les transactions avec le mode intelligent si activé
+            input_keys: Clés des fichiers lus (mémoïsation des étapes du SmartProcessor)
             Tuple[DataFrame processé, Liste des erreurs/warnings]
         """
-        self.errors = []
+        errors = self.errors = []
+        self.last_stage_key = None
         
         # Utiliser le traitement intelligent si activé
         if self.use_smart_processing:
             logger.info("🚀 Utilisation du traitement intelligent (SmartProcessor)")
             try:
                 processed_df, stats = self.smart_processor.process_smart(
-                    bulk_df, export_df, fees_df, metadata
+                    bulk_df, export_df, fees_df, metadata, input_keys=input_keys
                 )
+                # Clé du résultat final : entrée de l'étape de rendu
+                self.last_stage_key = self.smart_processor.last_stage_key
                 # Ajouter les colonnes manquantes si nécessaire
-                return self._ensure_required_columns(processed_df), self.errors
+                return self._ensure_required_columns(processed_df), errors
             except Exception as e:
                 logger.error(f"Erreur dans SmartProcessor, fallback sur traitement classique: {e}")
                 self.use_smart_processing = False
@@ -93,7 +121,7 @@ class DataProcessor:
         # Sauvegarder le cache
         self._save_mappings_cache()
         
-        return processed_df, self.errors
+        return processed_df, errors
     
     def _format_dates(self, df: pd.DataFrame) -> pd.Series:
         """Formater les dates au format français"""
@@ -8,6 +8,8 @@ import pythoncom
 import pandas as pd
 import logging
 from datetime import datetime
+from .excel_range_batch import com_range
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -89,15 +91,7 @@ class DirectExcelFiller:
         # Trouver la ligne de début des transactions
         start_row = 9  # Ajuster selon votre template
         
-        # Remplir les transactions
-        for idx, record in df.iterrows():
-            row = start_row + idx
-            sheet.Cells(row, 1).Value = record.get('Date', '')
-            sheet.Cells(row, 2).Value = record.get('TransactionID', '')
-            sheet.Cells(row, 3).Value = 'PAIEMENT'
-            sheet.Cells(row, 4).Value = record.get('Status', '')
-            sheet.Cells(row, 5).Value = f"{record.get('Amount', 0):,.0f}".replace(',', ' ')
-            sheet.Cells(row, 6).Value = f"{record.get('Frais', 0):,.0f}".replace(',', ' ')
-            sheet.Cells(row, 7).Value = 'UGP'
-            sheet.Cells(row, 8).Value = record.get('Vers', '')
-            sheet.Cells(row, 9).Value = record.get('Beneficiaire', '')
+        # Remplir les transactions (colonnes A à I) en un seul tableau 2-D
+        block = RenderBlock.ensure(df)
+        if len(block) > 0:
+            com_range(sheet, start_row, 1, start_row + len(block) - 1, 9).Value = block.rows(formatted=True)
@@ -9,6 +9,11 @@ import win32com.client as win32
 import pythoncom
 import pandas as pd
 import logging
+from .excel_range_batch import (
+    AMOUNT_FORMAT, to_amount, contiguous_runs,
+    com_range, read_com_block, find_header_row
+)
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +26,7 @@ class ExcelCOMFiller:
         self.excel = None
         self.workbook = None
         
-    def fill_template(self, processed_df: pd.DataFrame, metadata: dict, output_path: str) -> str:
+    def fill_template(self, processed_df, metadata: dict, output_path: str) -> str:
         """
         Remplit le template en utilisant Excel via COM
         Préserve TOUT : images, logos, formats, formules, etc.
@@ -80,70 +85,73 @@ class ExcelCOMFiller:
             pythoncom.CoUninitialize()
     
     def _fill_metadata_com(self, sheet, metadata: dict):
-        """Remplit les métadonnées via COM"""
+        """Remplit les métadonnées via COM (zone d'en-tête lue en un seul appel)"""
         try:
+            # Lire A1:J14 d'un coup au lieu de cellule par cellule
+            grid = read_com_block(sheet, 1, 1, 14, 10)
+            
             # Parcourir les premières lignes pour trouver et remplir
             for row in range(1, 15):
                 for col in range(1, 10):
-                    cell_value = sheet.Cells(row, col).Value
+                    cell_value = grid[row - 1][col - 1]
                     if cell_value:
                         cell_text = str(cell_value).lower().strip()
+                        next_value = grid[row - 1][col]
                         
                         # Date de paiement
                         if 'date de paiement' in cell_text:
-                            next_cell = sheet.Cells(row, col + 1)
-                            if not next_cell.Value:
-                                next_cell.Value = metadata.get('date_paiement', datetime.now().strftime("%d-%b-%Y"))
+                            if not next_value:
+                                sheet.Cells(row, col + 1).Value = metadata.get('date_paiement', datetime.now().strftime("%d-%b-%Y"))
                                 logger.info(f"Date remplie en ligne {row}")
                         
                         # Libellé
                         elif 'libellé' in cell_text or 'libelle' in cell_text:
-                            next_cell = sheet.Cells(row, col + 1)
-                            if not next_cell.Value:
-                                next_cell.Value = metadata.get('libelle', 'PAIEMENT')
+                            if not next_value:
+                                sheet.Cells(row, col + 1).Value = metadata.get('libelle', 'PAIEMENT')
                                 logger.info(f"Libellé rempli en ligne {row}")
                         
                         # Budget
                         elif 'budget' in cell_text:
-                            next_cell = sheet.Cells(row, col + 1)
-                            if not next_cell.Value:
+                            if not next_value:
                                 budget_value = metadata.get('budget', 500000)
-                                next_cell.Value = f"{budget_value:,.0f}".replace(',', ' ')
+                                budget_cell = sheet.Cells(row, col + 1)
+                                budget_cell.Value = to_amount(budget_value)
+                                budget_cell.NumberFormat = AMOUNT_FORMAT
                                 logger.info(f"Budget rempli en ligne {row}")
                         
                         # Projet
                         elif 'projet' in cell_text:
-                            next_cell = sheet.Cells(row, col + 1)
-                            if not next_cell.Value:
-                                next_cell.Value = metadata.get('projet', 'UGP')
+                            if not next_value:
+                                sheet.Cells(row, col + 1).Value = metadata.get('projet', 'UGP')
                                 logger.info(f"Projet rempli en ligne {row}")
                                 
         except Exception as e:
             logger.error(f"Erreur remplissage métadonnées: {e}")
     
-    def _fill_transactions_com(self, sheet, df: pd.DataFrame):
-        """Remplit les transactions via COM"""
+    def _fill_transactions_com(self, sheet, data):
+        """
+        Remplit les transactions via COM
+        
+        Une seule lecture pour localiser l'en-tête, puis un tableau 2-D
+        par plage de colonnes contiguës (au lieu d'un appel par cellule)
+        """
         try:
+            block = RenderBlock.ensure(data)
+            
+            # Lire la zone d'en-tête A1:N29 en un seul appel
+            grid = read_com_block(sheet, 1, 1, 29, 14)
+            
             # Trouver la ligne d'en-tête
-            header_row = None
-            for row in range(1, 30):
-                cell_value = sheet.Cells(row, 1).Value
-                if cell_value and 'date' in str(cell_value).lower():
-                    # Vérifier d'autres colonnes pour confirmer
-                    other_cell = sheet.Cells(row, 2).Value
-                    if other_cell and any(x in str(other_cell).lower() for x in ['transaction', 'n°']):
-                        header_row = row
-                        logger.info(f"En-tête trouvé à la ligne {header_row}")
-                        break
-            
-            if not header_row:
+            header_row = find_header_row(grid, confirm=['transaction', 'n°'])
+            if header_row:
+                logger.info(f"En-tête trouvé à la ligne {header_row}")
+            else:
                 header_row = 8  # Valeur par défaut
                 logger.warning(f"En-tête non trouvé, utilisation ligne {header_row}")
             
             # Mapper les colonnes
             column_mapping = {}
-            for col in range(1, 15):
-                header_value = sheet.Cells(header_row, col).Value
+            for col, header_value in enumerate(grid[header_row - 1], start=1):
                 if header_value:
                     header_text = str(header_value).lower().strip()
                     
@@ -170,52 +178,37 @@ class ExcelCOMFiller:
             
             # Remplir les données
             start_row = header_row + 1
-            for idx, record in df.iterrows():
-                current_row = start_row + idx
-                
-                if 'Date' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Date']).Value = record.get('Date', '')
-                
-                if 'Transaction' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Transaction']).Value = record.get('TransactionID', '')
-                
-                if 'Type' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Type']).Value = record.get('Type', 'PAIEMENT')
-                
-                if 'Statut' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Statut']).Value = record.get('Status', '')
-                
-                if 'Montant' in column_mapping:
-                    amount = record.get('Amount', 0)
-                    sheet.Cells(current_row, column_mapping['Montant']).Value = f"{amount:,.0f}".replace(',', ' ')
-                
-                if 'Frais' in column_mapping:
-                    fee = record.get('Frais', 0)
-                    sheet.Cells(current_row, column_mapping['Frais']).Value = f"{fee:,.0f}".replace(',', ' ')
-                
-                if 'De' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['De']).Value = record.get('De', 'UGP')
+            if len(block) > 0:
+                last_row = start_row + len(block) - 1
                 
-                if 'Vers' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Vers']).Value = record.get('Vers', '')
+                for first_col, keys in contiguous_runs(column_mapping):
+                    target = com_range(sheet, start_row, first_col, last_row, first_col + len(keys) - 1)
+                    target.Value = block.header_rows(keys)
                 
-                if 'Beneficiaire' in column_mapping:
-                    sheet.Cells(current_row, column_mapping['Beneficiaire']).Value = record.get('Beneficiaire', '')
+                # Montants numériques : un format "# ##0" par colonne
+                for key in ('Montant', 'Frais'):
+                    if key in column_mapping:
+                        col = column_mapping[key]
+                        com_range(sheet, start_row, col, last_row, col).NumberFormat = AMOUNT_FORMAT
             
             # Ajouter les totaux
-            if len(df) > 0:
-                total_row = start_row + len(df) + 1
+            if len(block) > 0:
+                total_row = start_row + len(block) + 1
                 
                 if 'Statut' in column_mapping:
                     sheet.Cells(total_row, column_mapping['Statut']).Value = "TOTAL:"
                 
                 if 'Montant' in column_mapping:
-                    total_amount = df['Amount'].sum()
-                    sheet.Cells(total_row, column_mapping['Montant']).Value = f"{total_amount:,.0f}".replace(',', ' ')
+                    total_amount = block.total_amount
+                    total_cell = sheet.Cells(total_row, column_mapping['Montant'])
+                    total_cell.Value = total_amount
+                    total_cell.NumberFormat = AMOUNT_FORMAT
                 
                 if 'Frais' in column_mapping:
-                    total_fees = df['Frais'].sum()
-                    sheet.Cells(total_row, column_mapping['Frais']).Value = f"{total_fees:,.0f}".replace(',', ' ')
+                    total_fees = block.total_fees
+                    total_cell = sheet.Cells(total_row, column_mapping['Frais'])
+                    total_cell.Value = total_fees
+                    total_cell.NumberFormat = AMOUNT_FORMAT
                 
                 logger.info(f"Totaux ajoutés ligne {total_row}")
                 
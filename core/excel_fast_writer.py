@@ -6,16 +6,56 @@ import os
 import logging
 from pathlib import Path
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from typing import Dict, Any
 import time
 from datetime import datetime
-import shutil
+from .template_cache import load_template_clone
+from .excel_range_batch import AMOUNT_FORMAT, to_amount
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
+# Styles nommés partagés par toutes les cellules du tableau
+STYLE_DATA = 'ugp_data'
+STYLE_CENTER = 'ugp_data_center'
+STYLE_AMOUNT = 'ugp_amount'
+STYLE_TOTAL = 'ugp_total'
+STYLE_TOTAL_AMOUNT = 'ugp_total_amount'
+
+
+def _build_named_styles() -> list:
+    """Construit les quelques styles nommés utilisés par le rapport"""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    data_font = Font(name='Arial', size=10)
+    total_font = Font(name='Arial', size=11, bold=True)
+    
+    return [
+        NamedStyle(name=STYLE_DATA, font=data_font, border=border,
+                   alignment=Alignment(horizontal='left', vertical='center')),
+        NamedStyle(name=STYLE_CENTER, font=data_font, border=border,
+                   alignment=Alignment(horizontal='center', vertical='center')),
+        NamedStyle(name=STYLE_AMOUNT, font=data_font, border=border, number_format=AMOUNT_FORMAT,
+                   alignment=Alignment(horizontal='right', vertical='center')),
+        NamedStyle(name=STYLE_TOTAL, font=total_font),
+        NamedStyle(name=STYLE_TOTAL_AMOUNT, font=total_font, border=border, number_format=AMOUNT_FORMAT,
+                   alignment=Alignment(horizontal='right', vertical='center'))
+    ]
+
+
+def register_report_styles(wb):
+    """
+    Enregistre les styles nommés dans le classeur (une seule fois)
+    
+    Appliqué au template mis en cache : chaque clone les possède déjà
+    """
+    existing = set(wb.named_styles)
+    for style in _build_named_styles():
+        if style.name not in existing:
+            wb.add_named_style(style)
+
 
 class ExcelFastWriter:
     """
@@ -37,63 +77,47 @@ class ExcelFastWriter:
         self.ws = None
         self.start_time = time.time()
         
-        # Configuration des styles
-        self.border_style = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        self.header_font = Font(name='Arial', size=11, bold=True)
-        self.data_font = Font(name='Arial', size=10)
-        self.total_font = Font(name='Arial', size=11, bold=True)
-        
-        self.center_alignment = Alignment(horizontal='center', vertical='center')
-        self.left_alignment = Alignment(horizontal='left', vertical='center')
-        self.right_alignment = Alignment(horizontal='right', vertical='center')
+        # Colonnes du tableau (A à J) → style nommé
+        self.column_styles = [STYLE_CENTER] + [STYLE_DATA] * 4 + [STYLE_AMOUNT] * 2 + [STYLE_DATA] * 3
         
         logger.info("=" * 60)
         logger.info(" EXCEL FAST WRITER - MODE OPTIMISÉ")
         logger.info("=" * 60)
     
-    def write_report(self, data: pd.DataFrame, metadata: Dict[str, Any]) -> str:
+    def write_report(self, data, metadata: Dict[str, Any]) -> str:
         """
         Écrit le rapport complet en mode batch optimisé
         
         Args:
-            data: DataFrame avec les transactions
+            data: RenderBlock du job (ou DataFrame, converti une fois)
             metadata: Métadonnées du rapport
             
         Returns:
             Chemin du fichier généré
         """
         try:
-            # Étape 1: Copier le template
-            logger.info("\n📋 Copie du template...")
-            start = time.time()
-            shutil.copy2(self.template_path, self.output_path)
-            logger.info(f"  ✓ Template copié ({time.time() - start:.1f}s)")
+            block = RenderBlock.ensure(data)
             
-            # Étape 2: Charger avec openpyxl
-            logger.info("\n📂 Ouverture du fichier...")
+            # Étapes 1-2: Cloner le template depuis le cache du processus
+            # (plus de copie disque ni de re-parsing à chaque rapport)
+            logger.info("\n📋 Clonage du template...")
             start = time.time()
-            self.wb = load_workbook(self.output_path)
+            self.wb = load_template_clone(self.template_path, prepare=register_report_styles)
             self.ws = self.wb['Rapport paiement']
-            logger.info(f"  ✓ Fichier ouvert ({time.time() - start:.1f}s)")
+            logger.info(f"  ✓ Template prêt ({time.time() - start:.1f}s)")
             
             # Étape 3: Écrire les métadonnées
             self._write_metadata_batch(metadata)
             
             # Étape 4: Préparer le template pour le nombre de transactions
-            num_transactions = len(data)
+            num_transactions = len(block)
             self._prepare_template_fast(num_transactions)
             
             # Étape 5: Écrire toutes les transactions en batch
-            self._write_transactions_batch(data)
+            self._write_transactions_batch(block)
             
-            # Étape 6: Calculer et écrire les totaux
-            self._write_totals_batch(data)
+            # Étape 6: Écrire les totaux (déjà calculés dans le bloc)
+            self._write_totals_batch(block)
             
             # Étape 7: Sauvegarder
             logger.info("\n💾 Sauvegarde...")
@@ -124,13 +148,14 @@ class ExcelFastWriter:
         metadata_map = {
             'C7': metadata.get('date_paiement', datetime.now().strftime('%d/%m/%Y')),
             'C8': metadata.get('libelle', 'PAIEMENT'),
-            'C9': self._format_number(metadata.get('budget', 0)),
+            'C9': to_amount(metadata.get('budget', 0)),
             'C10': metadata.get('projet', 'UGP')
         }
         
         # Écriture batch
         for cell, value in metadata_map.items():
             self.ws[cell] = value
+        self.ws['C9'].number_format = AMOUNT_FORMAT
             
         logger.info(f"  ✓ Métadonnées écrites ({time.time() - start:.1f}s)")
     
@@ -149,103 +174,45 @@ class ExcelFastWriter:
         logger.info(f"  → Insertion de {rows_to_insert} lignes...")
         self.ws.insert_rows(insert_position, amount=rows_to_insert)
         
-        # Copier le format de la ligne 12 pour toutes les nouvelles lignes
-        # Récupérer les formats de la ligne 12
-        source_row = 12
-        for i in range(rows_to_insert):
-            target_row = insert_position + i
-            
-            # Copier le format pour chaque colonne (A à I)
-            for col in range(1, 10):  # Colonnes A à I
-                source_cell = self.ws.cell(row=source_row, column=col)
-                target_cell = self.ws.cell(row=target_row, column=col)
-                
-                # Copier les bordures
-                target_cell.border = self.border_style
-                
-                # Copier l'alignement selon la colonne
-                if col in [7, 8]:  # Colonnes G et H (montants)
-                    target_cell.alignment = self.right_alignment
-                elif col == 1:  # Colonne A (numéro)
-                    target_cell.alignment = self.center_alignment
-                else:
-                    target_cell.alignment = self.left_alignment
-                    
-                # Copier la police
-                target_cell.font = self.data_font
+        # Appliquer les styles nommés aux nouvelles lignes (aucun objet de style créé)
+        for target_row in range(insert_position, insert_position + rows_to_insert):
+            for col, style_name in enumerate(self.column_styles, start=1):
+                self.ws.cell(row=target_row, column=col).style = style_name
         
         logger.info(f"  ✓ Template préparé ({time.time() - start:.1f}s)")
     
-    def _write_transactions_batch(self, data: pd.DataFrame):
+    def _write_transactions_batch(self, block: RenderBlock):
         """Écrit toutes les transactions en une seule opération batch"""
-        logger.info(f"\n📝 Écriture de {len(data)} transactions (batch)...")
+        logger.info(f"\n📝 Écriture de {len(block)} transactions (batch)...")
         start = time.time()
         
-        # Préparer toutes les données en mémoire
-        batch_data = []
-        for idx, row in data.iterrows():
-            trans_data = [
-                idx + 1,  # Numéro
-                row.get('Date', ''),
-                row.get('TransactionID', ''),
-                row.get('Type', 'PAIEMENT'),
-                'Success',
-                self._format_number(row.get('Amount', 0)),
-                self._format_number(row.get('Frais', 0)),
-                row.get('De', 'UGP'),
-                row.get('Vers', ''),
-                row.get('Beneficiaire', '')
-            ]
-            batch_data.append(trans_data)
-        
-        # Écrire toutes les données d'un coup
+        # Lignes déjà prêtes dans le bloc (montants numériques, statut nettoyé)
         start_row = 12
-        for i, trans_data in enumerate(batch_data):
+        for i, trans_data in enumerate(block.rows()):
             current_row = start_row + i
-            for j, value in enumerate(trans_data):
-                cell = self.ws.cell(row=current_row, column=j+1)
-                cell.value = value
-                
-                # Appliquer les styles de base
-                cell.border = self.border_style
-                cell.font = self.data_font
-                
-                # Alignement selon la colonne
-                if j in [5, 6]:  # Montant et Frais
-                    cell.alignment = self.right_alignment
-                elif j == 0:  # Numéro
-                    cell.alignment = self.center_alignment
-                else:
-                    cell.alignment = self.left_alignment
+            for j, value in enumerate((i + 1,) + trans_data):  # Numéro + colonnes du bloc
+                cell = self.ws.cell(row=current_row, column=j+1, value=value)
+                cell.style = self.column_styles[j]
         
         logger.info(f"  ✓ Transactions écrites ({time.time() - start:.1f}s)")
     
-    def _write_totals_batch(self, data: pd.DataFrame):
+    def _write_totals_batch(self, block: RenderBlock):
         """Écrit les totaux en batch"""
-        logger.info("\n📊 Calcul et écriture des totaux...")
+        logger.info("\n📊 Écriture des totaux...")
         start = time.time()
         
-        total_amount = data['Amount'].sum() if 'Amount' in data.columns else 0
-        total_fees = data['Frais'].sum() if 'Frais' in data.columns else 0
+        total_amount = block.total_amount
+        total_fees = block.total_fees
         
         # Position de la ligne TOTAL
-        total_row = 12 + len(data) + 1
+        total_row = 12 + len(block) + 1
         
         # Écrire TOTAL
-        self.ws.cell(row=total_row, column=5, value="TOTAL").font = self.total_font
-        
-        # Écrire les montants totaux
-        total_amount_cell = self.ws.cell(row=total_row, column=6)
-        total_amount_cell.value = self._format_number(total_amount)
-        total_amount_cell.font = self.total_font
-        total_amount_cell.alignment = self.right_alignment
-        total_amount_cell.border = self.border_style
+        self.ws.cell(row=total_row, column=5, value="TOTAL").style = STYLE_TOTAL
         
-        total_fees_cell = self.ws.cell(row=total_row, column=7)
-        total_fees_cell.value = self._format_number(total_fees)
-        total_fees_cell.font = self.total_font
-        total_fees_cell.alignment = self.right_alignment
-        total_fees_cell.border = self.border_style
+        # Écrire les montants totaux (numériques)
+        self.ws.cell(row=total_row, column=6, value=total_amount).style = STYLE_TOTAL_AMOUNT
+        self.ws.cell(row=total_row, column=7, value=total_fees).style = STYLE_TOTAL_AMOUNT
         
         # Écrire le récapitulatif (si existe dans le template)
         recap_row = total_row + 3
@@ -259,18 +226,20 @@ class ExcelFastWriter:
                         if 'montant' in cell_value.lower() and 'total' in cell_value.lower():
                             # Mettre à jour le montant total
                             value_cell = self.ws.cell(row=row, column=col+1)
-                            value_cell.value = self._format_number(total_amount)
+                            value_cell.value = total_amount
+                            value_cell.number_format = AMOUNT_FORMAT
                         elif 'frais' in cell_value.lower():
                             # Mettre à jour les frais
                             value_cell = self.ws.cell(row=row, column=col+1)
-                            value_cell.value = self._format_number(total_fees)
+                            value_cell.value = total_fees
+                            value_cell.number_format = AMOUNT_FORMAT
         
         logger.info(f"  ✓ Totaux écrits ({time.time() - start:.1f}s)")
         logger.info(f"    • Montant total: {self._format_number(total_amount)} FCFA")
         logger.info(f"    • Frais totaux: {self._format_number(total_fees)} FCFA")
     
     def _format_number(self, value):
-        """Formate un nombre avec séparateurs de milliers"""
+        """Formate un nombre avec séparateurs de milliers (affichage dans les logs)"""
         try:
             if pd.isna(value) or value == '' or value is None:
                 return '0'
@@ -0,0 +1,113 @@
+"""
+Utilitaires d'écriture par blocs pour les writers COM / xlwings
+Chaque aller-retour COM coûte cher : on prépare les valeurs en mémoire
+et on les envoie sous forme de tableaux 2-D, une plage à la fois
+"""
+import math
+from typing import Dict, List, Tuple, Any, Optional
+import pandas as pd
+
+# Constantes Excel (évite d'importer win32com.client.constants)
+XL_CENTER = -4108
+XL_NONE = -4142
+XL_EDGE_BOTTOM = 9
+XL_BORDER_INDEXES = range(7, 13)  # Bordures gauche/haut/bas/droite + intérieures
+
+# Format des montants : espace comme séparateur de milliers, la cellule reste numérique.
+# L'espace d'un format Excel est un caractère littéral (il ne se répète pas comme ',') :
+# chaque groupe est écrit jusqu'au million de milliards, indépendamment de la langue d'Excel
+AMOUNT_FORMAT = '# ### ### ### ##0'
+
+
+def to_excel_value(value: Any) -> Any:
+    """Convertit une valeur pandas/numpy en type natif marshallable par COM"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and math.isnan(value):
+        return ''
+    if hasattr(value, 'item'):  # Scalaires numpy (int64, float64...)
+        return to_excel_value(value.item())
+    return value
+
+
+def column_values(df: pd.DataFrame, column: str, default: Any = '') -> List[Any]:
+    """Retourne une colonne du DataFrame en liste native (valeur par défaut si absente)"""
+    if column in df.columns:
+        return [to_excel_value(v) for v in df[column].tolist()]
+    return [default] * len(df)
+
+
+def to_amount(value: Any) -> int:
+    """Convertit un montant en entier natif (0 si vide ou invalide)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return 0 if math.isnan(value) else int(round(value))
+
+
+def format_thousands(value: Any) -> str:
+    """Formate un montant avec des espaces comme séparateurs de milliers"""
+    try:
+        return f"{float(value):,.0f}".replace(',', ' ')
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def contiguous_runs(column_mapping: Dict[str, int]) -> List[Tuple[int, List[str]]]:
+    """
+    Regroupe les colonnes mappées en plages contiguës
+
+    Args:
+        column_mapping: {'Date': 1, 'Transaction': 2, 'Montant': 5, ...}
+
+    Returns:
+        Liste de (première colonne, [clés dans l'ordre des colonnes])
+    """
+    runs = []
+    for key, col in sorted(column_mapping.items(), key=lambda item: item[1]):
+        if runs and col == runs[-1][0] + len(runs[-1][1]):
+            runs[-1][1].append(key)
+        else:
+            runs.append((col, [key]))
+    return runs
+
+
+def rows_from_columns(columns: Dict[str, List[Any]], keys: List[str]) -> List[Tuple[Any, ...]]:
+    """Transpose des colonnes en lignes (tableau 2-D pour Range.Value)"""
+    return list(zip(*(columns[key] for key in keys)))
+
+
+def com_range(sheet, first_row: int, first_col: int, last_row: int, last_col: int):
+    """Retourne la plage COM couvrant le rectangle demandé"""
+    return sheet.Range(sheet.Cells(first_row, first_col), sheet.Cells(last_row, last_col))
+
+
+def read_com_block(sheet, first_row: int, first_col: int,
+                   last_row: int, last_col: int) -> List[List[Any]]:
+    """Lit une plage COM en un seul aller-retour, toujours sous forme 2-D"""
+    values = com_range(sheet, first_row, first_col, last_row, last_col).Value
+    if not isinstance(values, (tuple, list)):
+        return [[values]]
+    return [list(row) for row in values]
+
+
+def find_header_row(grid: List[List[Any]], first_row: int = 1,
+                    confirm: Optional[List[str]] = None) -> Optional[int]:
+    """
+    Cherche la ligne d'en-tête ('Date' en première colonne) dans une grille lue en bloc
+
+    Args:
+        grid: Grille 2-D lue depuis la feuille
+        first_row: Numéro Excel de la première ligne de la grille
+        confirm: Termes attendus dans la colonne suivante pour confirmer l'en-tête
+    """
+    for offset, row in enumerate(grid):
+        first = row[0] if row else None
+        if first and 'date' in str(first).lower():
+            if confirm is None:
+                return first_row + offset
+            other = row[1] if len(row) > 1 else None
+            if other and any(term in str(other).lower() for term in confirm):
+                return first_row + offset
+    return None
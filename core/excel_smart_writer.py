@@ -7,6 +7,11 @@ import pythoncom
 import logging
 import os
 from datetime import datetime
+from .excel_range_batch import (
+    XL_CENTER, XL_NONE, XL_EDGE_BOTTOM, XL_BORDER_INDEXES, AMOUNT_FORMAT,
+    format_thousands, to_amount, com_range, read_com_block
+)
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +53,9 @@ class ExcelSmartWriter:
         """
         Prépare le template en insérant des lignes si nécessaire
         
+        Les lignes sont insérées en un seul appel et formatées une fois
+        pour tout le bloc (au lieu de ligne par ligne, cellule par cellule)
+        
         Args:
             num_transactions: Nombre de transactions à écrire
         """
@@ -65,35 +73,35 @@ class ExcelSmartWriter:
             
             # Point d'insertion: après la ligne 13
             insert_at_row = self.DATA_START_ROW + existing_data_rows
+            last_inserted_row = insert_at_row + rows_to_insert - 1
             
-            # Insérer les lignes une par une
-            for i in range(rows_to_insert):
-                # Insérer une ligne
-                self.sheet.Rows(insert_at_row).Insert()
-                
-                # Copier le format de la ligne 12 mais sans les bordures
-                source_row = self.sheet.Rows(self.DATA_START_ROW)
-                dest_row = self.sheet.Rows(insert_at_row)
-                
-                # Copier juste le format de police et alignement, pas les bordures
-                for col in range(2, 11):  # Colonnes B à J
-                    source_cell = self.sheet.Cells(self.DATA_START_ROW, col)
-                    dest_cell = self.sheet.Cells(insert_at_row, col)
-                    
-                    # Copier le format
-                    dest_cell.Font.Name = source_cell.Font.Name
-                    dest_cell.Font.Size = source_cell.Font.Size
-                    dest_cell.Font.Bold = False  # Pas de gras
-                    dest_cell.HorizontalAlignment = -4108  # xlCenter
-                    
-                    # Pas de bordures
-                    for border_idx in range(7, 13):  # Toutes les bordures
-                        dest_cell.Borders(border_idx).LineStyle = -4142  # xlNone
-                    
-                    # Effacer le contenu
-                    dest_cell.Value = ""
-                
-                logger.info(f"    • Ligne {insert_at_row} insérée (sans bordures)")
+            # Insérer toutes les lignes d'un coup
+            self.sheet.Range(
+                self.sheet.Rows(insert_at_row), self.sheet.Rows(last_inserted_row)
+            ).Insert()
+            
+            # Police de la ligne 12 (lue une seule fois)
+            source_font = self.sheet.Cells(self.DATA_START_ROW, 2).Font
+            font_name = source_font.Name
+            font_size = source_font.Size
+            
+            # Formater le bloc inséré (colonnes B à J) en une fois
+            block = com_range(self.sheet, insert_at_row, 2, last_inserted_row, 10)
+            block_font = block.Font
+            block_font.Name = font_name
+            block_font.Size = font_size
+            block_font.Bold = False  # Pas de gras
+            block.HorizontalAlignment = XL_CENTER
+            
+            # Pas de bordures
+            block_borders = block.Borders
+            for border_idx in XL_BORDER_INDEXES:
+                block_borders(border_idx).LineStyle = XL_NONE
+            
+            # Effacer le contenu
+            block.ClearContents()
+            
+            logger.info(f"    • Lignes {insert_at_row}-{last_inserted_row} insérées (sans bordures)")
             
             # Nettoyer le presse-papier
             self.excel.CutCopyMode = False
@@ -117,10 +125,11 @@ class ExcelSmartWriter:
             
             # Budget (ligne 8, colonne C)
             if 'budget' in metadata:
-                # Formater le budget avec séparateurs
-                budget_str = f"{int(metadata['budget']):,}".replace(',', ' ')
-                self.sheet.Cells(8, 3).Value = budget_str
-                logger.info(f"  • Budget: {budget_str}")
+                # Budget numérique, affiché avec séparateurs
+                budget_cell = self.sheet.Cells(8, 3)
+                budget_cell.Value = to_amount(metadata['budget'])
+                budget_cell.NumberFormat = AMOUNT_FORMAT
+                logger.info(f"  • Budget: {format_thousands(metadata['budget'])}")
             
             # Projet (ligne 9, colonne C)
             if 'projet' in metadata:
@@ -133,104 +142,48 @@ class ExcelSmartWriter:
             logger.error(f"❌ Erreur écriture métadonnées: {e}")
             return False
     
-    def write_transactions(self, df):
-        """Écrit les transactions dans le tableau"""
+    def write_transactions(self, data):
+        """
+        Écrit les transactions dans le tableau
+        
+        Toutes les valeurs sont envoyées en un seul tableau 2-D (Range.Value),
+        puis le format est appliqué une fois sur la plage complète
+        
+        Args:
+            data: RenderBlock du job (ou DataFrame, converti une fois)
+        """
         try:
-            logger.info(f"\nÉcriture de {len(df)} transactions...")
+            block = RenderBlock.ensure(data)
+            logger.info(f"\nÉcriture de {len(block)} transactions...")
             
             # Préparer le template pour le bon nombre de lignes
-            total_data_rows = self.prepare_template(len(df))
+            total_data_rows = self.prepare_template(len(block))
             
-            # Écrire chaque transaction
-            for idx, row in df.iterrows():
-                excel_row = self.DATA_START_ROW + idx
-                
-                # Date (colonne B)
-                date_val = row.get('Date', '')
-                if date_val:
-                    cell = self.sheet.Cells(excel_row, 2)
-                    cell.Value = str(date_val)
-                    cell.HorizontalAlignment = -4108  # xlCenter
-                    cell.Font.Bold = False  # Enlever le gras
-                
-                # N° Transaction (colonne C)
-                trans_id = row.get('TransactionID', '')
-                cell = self.sheet.Cells(excel_row, 3)
-                cell.Value = str(trans_id)
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
-                
-                # Type (colonne D)
-                cell = self.sheet.Cells(excel_row, 4)
-                cell.Value = 'PAIEMENT'
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
-                
-                # Statut (colonne E)
-                status = row.get('Status', 'Success')
-                if status:
-                    # Nettoyer le statut : enlever virgules et corriger l'orthographe
-                    status = str(status).strip().replace('Succes', 'Success').replace(',', '')
-                cell = self.sheet.Cells(excel_row, 5)
-                cell.Value = status
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
-                
-                # Montant (colonne F) - Formater avec espaces
-                amount = row.get('Amount', 0)
-                cell = self.sheet.Cells(excel_row, 6)
-                if amount:
-                    amount_str = f"{int(amount):,}".replace(',', ' ')
-                    cell.Value = amount_str
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
+            if len(block) > 0:
+                rows = block.rows()
+                first_row = self.DATA_START_ROW
+                last_row = first_row + len(rows) - 1
                 
-                # Frais ONG (colonne G)
-                frais = row.get('Frais', 0)
-                cell = self.sheet.Cells(excel_row, 7)
-                if frais:
-                    frais_str = f"{int(frais):,}".replace(',', ' ')
-                    cell.Value = frais_str
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
+                # Colonnes B (Date) à J (Bénéficiaire) en un seul appel
+                block = com_range(self.sheet, first_row, 2, last_row, 10)
+                block.Value = rows
+                block.HorizontalAlignment = XL_CENTER
+                block.Font.Bold = False  # Enlever le gras
                 
-                # De (colonne H)
-                cell = self.sheet.Cells(excel_row, 8)
-                cell.Value = row.get('De', 'UGP')
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
-                
-                # Vers (colonne I)
-                vers = row.get('Vers', '')
-                if vers:
-                    # Enlever le préfixe du pays si présent
-                    vers = str(vers).replace('235', '')
-                cell = self.sheet.Cells(excel_row, 9)
-                cell.Value = vers
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
-                
-                # Bénéficiaire (colonne J)
-                beneficiaire = row.get('Beneficiaire', '')
-                cell = self.sheet.Cells(excel_row, 10)
-                cell.Value = str(beneficiaire)
-                cell.HorizontalAlignment = -4108  # xlCenter
-                cell.Font.Bold = False
+                # Montant et Frais ONG (colonnes F-G) : nombres formatés "# ##0"
+                com_range(self.sheet, first_row, 6, last_row, 7).NumberFormat = AMOUNT_FORMAT
                 
                 # Enlever les bordures inférieures de la ligne 13
-                if excel_row == 13:
-                    for col in range(2, 11):  # Colonnes B à J
-                        cell = self.sheet.Cells(excel_row, col)
-                        # Enlever la bordure inférieure
-                        cell.Borders(9).LineStyle = -4142  # xlNone pour bordure inférieure
+                if first_row <= 13 <= last_row:
+                    com_range(self.sheet, 13, 2, 13, 10).Borders(XL_EDGE_BOTTOM).LineStyle = XL_NONE
                 
-                logger.info(f"  ✓ Ligne {excel_row}: {trans_id} → {beneficiaire}")
+                logger.info(f"  ✓ Lignes {first_row}-{last_row} écrites en un bloc")
             
             # Écrire le TOTAL
-            self.write_total(df, total_data_rows)
+            self.write_total(block, total_data_rows)
             
             # Écrire le récapitulatif
-            self.write_recapitulatif(df, total_data_rows)
+            self.write_recapitulatif(block, total_data_rows)
             
             return True
             
@@ -240,7 +193,7 @@ class ExcelSmartWriter:
             traceback.print_exc()
             return False
     
-    def write_total(self, df, total_data_rows):
+    def write_total(self, block, total_data_rows):
         """Écrit la ligne de total"""
         try:
             # La ligne de total est 2 lignes après la dernière transaction
@@ -251,18 +204,15 @@ class ExcelSmartWriter:
             # Texte "TOTAL:" en colonne E
             self.sheet.Cells(total_row, 5).Value = "TOTAL:"
             
-            # Total des montants en colonne F
-            total_amount = df['Amount'].sum()
-            amount_str = f"{int(total_amount):,}".replace(',', ' ')
-            self.sheet.Cells(total_row, 6).Value = amount_str
+            # Totaux des montants (F) et des frais (G) en un seul appel
+            total_amount = block.total_amount
+            total_frais = block.total_fees
+            totals = com_range(self.sheet, total_row, 6, total_row, 7)
+            totals.Value = ((total_amount, total_frais),)
+            totals.NumberFormat = AMOUNT_FORMAT
             
-            # Total des frais en colonne G
-            total_frais = df['Frais'].sum()
-            frais_str = f"{int(total_frais):,}".replace(',', ' ')
-            self.sheet.Cells(total_row, 7).Value = frais_str
-            
-            logger.info(f"  • Montant total: {amount_str} FCFA")
-            logger.info(f"  • Frais totaux: {frais_str} FCFA")
+            logger.info(f"  • Montant total: {format_thousands(total_amount)} FCFA")
+            logger.info(f"  • Frais totaux: {format_thousands(total_frais)} FCFA")
             
             return total_row
             
@@ -270,7 +220,7 @@ class ExcelSmartWriter:
             logger.error(f"❌ Erreur écriture total: {e}")
             return 0
     
-    def write_recapitulatif(self, df, total_data_rows):
+    def write_recapitulatif(self, block, total_data_rows):
         """Écrit SEULEMENT les valeurs dans la section récapitulatif existante"""
         try:
             # Le récapitulatif existe déjà dans le template, on cherche où il est
@@ -279,35 +229,31 @@ class ExcelSmartWriter:
             logger.info(f"\nMise à jour des valeurs du récapitulatif")
             
             # Parcourir les lignes pour trouver le récapitulatif existant
+            # (colonne A lue en un seul appel, lignes 20 à 39)
             found_recap = False
-            for row in range(20, 40):  # Chercher entre lignes 20 et 40
-                cell_value = self.sheet.Cells(row, 1).Value
+            column_a = read_com_block(self.sheet, 20, 1, 39, 1)
+            for row, (cell_value,) in enumerate(column_a, start=20):
                 if cell_value and "Montant net à percevoir" in str(cell_value):
                     found_recap = True
                     recap_row = row
                     
-                    # Montant net à percevoir (déjà sur cette ligne)
-                    total_amount = df['Amount'].sum()
-                    amount_str = f"{int(total_amount):,}".replace(',', ' ')
-                    self.sheet.Cells(recap_row, 10).Value = amount_str
-                    logger.info(f"  • Montant net ligne {recap_row}: {amount_str}")
-                    
-                    # Frais (ligne suivante)
-                    recap_row += 1
-                    total_frais = df['Frais'].sum()
-                    frais_str = f"{int(total_frais):,}".replace(',', ' ')
-                    self.sheet.Cells(recap_row, 10).Value = frais_str
-                    logger.info(f"  • Frais ligne {recap_row}: {frais_str}")
-                    
-                    # Total dépense (ligne suivante)
-                    recap_row += 1
-                    total_depense = total_amount + total_frais
-                    depense_str = f"{int(total_depense):,}".replace(',', ' ')
-                    self.sheet.Cells(recap_row, 10).Value = depense_str
-                    logger.info(f"  • Total dépense ligne {recap_row}: {depense_str}")
-                    
-                    # Reliquat (ligne suivante)
-                    recap_row += 1
+                    # Montant net, frais et total dépense (colonne J) en un seul appel
+                    total_amount = block.total_amount
+                    total_frais = block.total_fees
+                    total_depense = block.total_depense
+                    recap_values = com_range(self.sheet, recap_row, 10, recap_row + 2, 10)
+                    recap_values.Value = (
+                        (total_amount,),
+                        (total_frais,),
+                        (total_depense,)
+                    )
+                    recap_values.NumberFormat = AMOUNT_FORMAT
+                    logger.info(f"  • Montant net ligne {recap_row}: {format_thousands(total_amount)}")
+                    logger.info(f"  • Frais ligne {recap_row + 1}: {format_thousands(total_frais)}")
+                    logger.info(f"  • Total dépense ligne {recap_row + 2}: {format_thousands(total_depense)}")
+
+                    # Reliquat (ligne suivant le total dépense)
+                    recap_row += 3
                     # Le reliquat peut être calculé si on a le budget
                     # Pour l'instant, on laisse vide ou formule Excel
                     logger.info(f"  • Reliquat ligne {recap_row}: laissé tel quel")
@@ -356,7 +302,7 @@ class ExcelSmartWriter:
         
         Args:
             file_path: Chemin du fichier Excel
-            df: DataFrame avec les transactions
+            df: RenderBlock ou DataFrame avec les transactions
             metadata: Dictionnaire avec les métadonnées
         """
         try:
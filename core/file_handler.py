@@ -9,6 +9,7 @@ from typing import Dict, List, Tuple, Optional
 import json
 from datetime import datetime
 import logging
+from .render_block import RenderBlock, COLUMNS as RENDER_COLUMNS, AMOUNT_COLUMNS
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +52,31 @@ class FileHandler:
         logger.info(f"Pas de filtrage nécessaire - toutes les {len(df)} lignes sont des transactions principales")
         return df
     
+    def read_bulk_metadata(self, file_path: str, encoding: Optional[str] = None) -> dict:
+        """
+        Lire l'en-tête du BulkReport (nom du plan, organisation) sans les transactions
+        """
+        encoding = encoding or self.detect_encoding(file_path)
+        metadata = {}
+        with open(file_path, 'r', encoding=encoding) as f:
+            lines = f.readlines()
+            
+            # Extraire les infos importantes
+            for i, line in enumerate(lines):
+                if 'Bulk Plan Name' in line and i + 1 < len(lines):
+                    # Extraire le nom du plan
+                    next_line = lines[i + 1]
+                    parts = next_line.split(',')
+                    if len(parts) >= 2:
+                        metadata['plan_name'] = parts[1].strip().strip('"')
+                
+                if 'Organization Name' in line and i + 1 < len(lines):
+                    next_line = lines[i + 1]
+                    parts = next_line.split(',')
+                    if len(parts) >= 1:
+                        metadata['organization'] = parts[0].strip().strip('"')
+        return metadata
+    
     def read_bulk_report(self, file_path: str) -> Tuple[pd.DataFrame, dict]:
         """
         Lire le fichier BulkReport CSV avec détection intelligente
@@ -60,24 +86,7 @@ class FileHandler:
             encoding = self.detect_encoding(file_path)
             
             # Lire les métadonnées
-            metadata = {}
-            with open(file_path, 'r', encoding=encoding) as f:
-                lines = f.readlines()
-                
-                # Extraire les infos importantes
-                for i, line in enumerate(lines):
-                    if 'Bulk Plan Name' in line and i + 1 < len(lines):
-                        # Extraire le nom du plan
-                        next_line = lines[i + 1]
-                        parts = next_line.split(',')
-                        if len(parts) >= 2:
-                            metadata['plan_name'] = parts[1].strip().strip('"')
-                    
-                    if 'Organization Name' in line and i + 1 < len(lines):
-                        next_line = lines[i + 1]
-                        parts = next_line.split(',')
-                        if len(parts) >= 1:
-                            metadata['organization'] = parts[0].strip().strip('"')
+            metadata = self.read_bulk_metadata(file_path, encoding)
             
             # Trouver où commencent les données
             data_start_line = self._find_data_start(file_path, encoding)
@@ -332,9 +341,11 @@ class FileHandler:
             return file_path
         return None
     
-    def save_report(self, df: pd.DataFrame, metadata: dict, output_path: str):
-        """Sauvegarder le rapport final"""
+    def save_report(self, df, metadata: dict, output_path: str):
+        """Sauvegarder le rapport final (df: DataFrame traité ou RenderBlock)"""
         try:
+            block = RenderBlock.ensure(df)
+            
             # Créer le dossier de sortie si nécessaire
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
@@ -388,24 +399,17 @@ class FileHandler:
                 
                 row += 1
                 
-                # Écrire les données
-                for idx, record in df.iterrows():
-                    worksheet.write(row, 0, record.get('Date', ''), cell_format)
-                    worksheet.write(row, 1, record.get('TransactionID', ''), cell_format)
-                    worksheet.write(row, 2, record.get('Type', 'PAIEMENT'), cell_format)
-                    worksheet.write(row, 3, record.get('Status', ''), cell_format)
-                    worksheet.write(row, 4, record.get('Amount', 0), money_format)
-                    worksheet.write(row, 5, record.get('Frais', 0), money_format)
-                    worksheet.write(row, 6, record.get('De', 'UGP'), cell_format)
-                    worksheet.write(row, 7, record.get('Vers', ''), cell_format)
-                    worksheet.write(row, 8, record.get('Beneficiaire', ''), cell_format)
-                    row += 1
+                # Écrire les données colonne par colonne depuis le bloc de rendu
+                for col, name in enumerate(RENDER_COLUMNS):
+                    column_format = money_format if name in AMOUNT_COLUMNS else cell_format
+                    worksheet.write_column(row, col, block.column(name), column_format)
+                row += len(block)
                 
                 # Ligne de total
                 row += 1
                 worksheet.write(row, 3, 'TOTAL:', header_format)
-                worksheet.write(row, 4, df['Amount'].sum(), money_format)
-                worksheet.write(row, 5, df['Frais'].sum(), money_format)
+                worksheet.write(row, 4, block.total_amount, money_format)
+                worksheet.write(row, 5, block.total_fees, money_format)
                 
                 # Ajuster les largeurs de colonnes
                 worksheet.set_column('A:A', 15)  # Date
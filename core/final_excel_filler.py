@@ -7,6 +7,8 @@ import pythoncom
 import pandas as pd
 import logging
 from datetime import datetime
+from .excel_range_batch import com_range, format_thousands
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -147,49 +149,27 @@ class FinalExcelFiller:
         
         logger.info(f"Début remplissage de {len(df)} transactions à partir de ligne {start_row}")
         
-        for idx, record in df.iterrows():
-            row = start_row + idx
-            
-            # Log détaillé avant écriture
-            logger.info(f"Écriture ligne {row}:")
-            logger.info(f"  - Date: {record.get('Date', '')}")
-            logger.info(f"  - TransactionID: {record.get('TransactionID', '')}")
-            logger.info(f"  - Amount: {record.get('Amount', 0)}")
-            
+        block = RenderBlock.ensure(df)
+        if len(block) > 0:
+            last_row = start_row + len(block) - 1
             try:
-                # Écrire directement dans les colonnes sans vérification (colonnes 2-10)
-                sheet.Cells(row, 2).Value = str(record.get('Date', ''))  # Date
-                sheet.Cells(row, 3).Value = str(record.get('TransactionID', ''))  # N° Transaction
-                sheet.Cells(row, 4).Value = 'PAIEMENT'  # Type
-                sheet.Cells(row, 5).Value = str(record.get('Status', 'Success')).strip()  # Statut
-                
-                amount = record.get('Amount', 0)
-                sheet.Cells(row, 6).Value = f"{amount:,.0f}".replace(',', ' ')  # Montant
-                
-                fee = record.get('Frais', 0)
-                sheet.Cells(row, 7).Value = f"{fee:,.0f}".replace(',', ' ')  # Frais ONG
-                
-                sheet.Cells(row, 8).Value = 'UGP'  # De
-                sheet.Cells(row, 9).Value = str(record.get('Vers', ''))  # Vers
-                sheet.Cells(row, 10).Value = str(record.get('Beneficiaire', ''))  # Bénéficiaire
-                
-                logger.info(f"✓ Ligne {row} écrite avec succès")
+                # Colonnes 2-10 en un seul tableau 2-D (montants formatés "491 741")
+                com_range(sheet, start_row, 2, last_row, 10).Value = block.rows(formatted=True)
+                logger.info(f"✓ Lignes {start_row}-{last_row} écrites avec succès")
             except Exception as e:
-                logger.error(f"✗ Erreur écriture ligne {row}: {e}")
+                logger.error(f"✗ Erreur écriture lignes {start_row}-{last_row}: {e}")
         
         # Ajouter la ligne de total
-        if len(df) > 0:
-            total_row = start_row + len(df) + 1
+        if len(block) > 0:
+            total_row = start_row + len(block) + 1
             
             if 'Statut' in column_mapping:
                 sheet.Cells(total_row, column_mapping['Statut']).Value = "TOTAL:"
             
             if 'Montant' in column_mapping:
-                total_amount = df['Amount'].sum()
-                sheet.Cells(total_row, column_mapping['Montant']).Value = f"{total_amount:,.0f}".replace(',', ' ')
+                sheet.Cells(total_row, column_mapping['Montant']).Value = format_thousands(block.total_amount)
             
             if 'Frais' in column_mapping:
-                total_fees = df['Frais'].sum()
-                sheet.Cells(total_row, column_mapping['Frais']).Value = f"{total_fees:,.0f}".replace(',', ' ')
+                sheet.Cells(total_row, column_mapping['Frais']).Value = format_thousands(block.total_fees)
             
-        logger.info(f"Rempli {len(df)} transactions")
+        logger.info(f"Rempli {len(block)} transactions")
@@ -0,0 +1,106 @@
+"""
+Chargement simultané des fichiers d'entrée (BulkReport, Export, Frais)
+Les lectures (décompression xlsx, E/S disque) se recouvrent : la phase de
+chargement coûte le temps du fichier le plus lent et non la somme des trois
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Type de fichier -> méthode de lecture du FileHandler
+READ_METHODS = {
+    'bulkreport': 'read_bulk_report',
+    'export': 'read_export_file',
+    'frais': 'read_fees_file'
+}
+
+# Fichiers sans lesquels le rapport ne peut être produit ('frais' est optionnel)
+REQUIRED = ('bulkreport', 'export')
+
+
+class LoadedInputs(NamedTuple):
+    """Fichiers d'entrée chargés"""
+    bulk_df: pd.DataFrame
+    bulk_metadata: Dict[str, Any]
+    export_df: pd.DataFrame
+    fees_df: Optional[pd.DataFrame]
+    keys: Dict[str, Optional[str]]          # clés du cache des étapes ('bulk', 'export', 'fees')
+    timings: Dict[str, float]               # durée de lecture par type de fichier (secondes)
+    errors: Dict[str, str]                  # erreurs par type de fichier (frais : taux par défaut)
+
+
+class InputLoader:
+    """Lit les trois fichiers d'entrée en parallèle"""
+
+    def __init__(self, file_handler, reader: Optional[Callable[[str, str], Tuple[Any, Optional[str]]]] = None):
+        """
+        Args:
+            file_handler: FileHandler utilisé pour la lecture
+            reader: Lecture (type, chemin) -> (résultat, clé) ; par défaut lecture
+                    directe par le FileHandler, sans clé de cache
+        """
+        self.file_handler = file_handler
+        self.reader = reader or self._read
+
+    def _read(self, file_type: str, path: str) -> Tuple[Any, Optional[str]]:
+        return getattr(self.file_handler, READ_METHODS[file_type])(path), None
+
+    def _timed(self, file_type: str, path: str):
+        start = time.perf_counter()
+        try:
+            return self.reader(file_type, path), None, time.perf_counter() - start
+        except Exception as e:
+            return None, e, time.perf_counter() - start
+
+    def load(self, bulk_path: str, export_path: str, fees_path: Optional[str] = None) -> LoadedInputs:
+        """
+        Charge les fichiers simultanément
+
+        Raises:
+            L'erreur de lecture du BulkReport ou de l'Export (après la fin des
+            autres lectures) ; une table des frais illisible est ignorée
+        """
+        paths = {'bulkreport': bulk_path, 'export': export_path}
+        if fees_path:
+            paths['frais'] = fees_path
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix='input') as executor:
+            futures = {file_type: executor.submit(self._timed, file_type, path)
+                       for file_type, path in paths.items()}
+            outcomes = {file_type: future.result() for file_type, future in futures.items()}
+        elapsed = time.perf_counter() - start
+
+        values, timings, errors = {}, {}, {}
+        for file_type, (value, error, duration) in outcomes.items():
+            timings[file_type] = duration
+            if error is not None:
+                errors[file_type] = str(error)
+                logger.warning(f"  ⚠ Lecture {file_type} en échec ({duration:.2f}s): {error}")
+            else:
+                values[file_type] = value
+                logger.debug(f"  • Lecture {file_type}: {duration:.2f}s")
+        logger.info(f"  ⏱ Fichiers chargés en {elapsed:.2f}s "
+                    f"(somme des lectures: {sum(timings.values()):.2f}s)")
+
+        for file_type in REQUIRED:
+            if file_type in errors:
+                raise outcomes[file_type][1]
+
+        (bulk_df, bulk_metadata), bulk_key = values['bulkreport']
+        export_df, export_key = values['export']
+        fees_df, fees_key = values.get('frais', (None, None))
+        return LoadedInputs(
+            bulk_df=bulk_df,
+            bulk_metadata=bulk_metadata,
+            export_df=export_df,
+            fees_df=fees_df,
+            keys={'bulk': bulk_key, 'export': export_key, 'fees': fees_key},
+            timings=timings,
+            errors=errors
+        )
@@ -0,0 +1,241 @@
+"""
+Gestion des fichiers de sortie partagés entre jobs parallèles
+Noms uniques par job, écriture dans un fichier temporaire du même dossier
+puis publication atomique (os.replace) et manifeste des fichiers produits
+"""
+import os
+import time
+import json
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Politiques de synchronisation disque
+FSYNC_NONE = 'none'      # Aucune synchronisation (le plus rapide)
+FSYNC_FILE = 'file'      # fsync du fichier avant publication (défaut)
+FSYNC_FULL = 'full'      # fsync du fichier puis du dossier après publication
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_FILE, FSYNC_FULL)
+
+MANIFEST_NAME = 'manifest.jsonl'
+TEMP_PREFIX = '~tmp_'
+
+# Fichier temporaire abandonné : supprimé après ce délai même si son auteur est inconnu
+TEMP_MAX_AGE = 6 * 3600
+
+# Machine auteur des fichiers temporaires (dossier de sortie partagé sur le réseau)
+HOST_TAG = hashlib.sha1(socket.gethostname().encode('utf-8')).hexdigest()[:6]
+
+
+def new_job_id() -> str:
+    """Identifiant court et unique pour un job de traitement"""
+    return uuid.uuid4().hex[:12]
+
+
+def _fsync_path(path: str):
+    """Force l'écriture d'un fichier sur le disque"""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _pid_alive(pid: int) -> bool:
+    """Le processus existe-t-il encore sur cette machine ?"""
+    if os.name == 'nt':
+        # os.kill(pid, 0) terminerait le processus sous Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _temp_owner(name: str) -> Optional[tuple]:
+    """(machine, pid) de l'auteur d'un fichier temporaire, None si le nom ne l'indique pas"""
+    parts = name[len(TEMP_PREFIX):].split('_', 1)[0].split('-')
+    if len(parts) != 2 or not parts[1].isdigit():
+        return None
+    return parts[0], int(parts[1])
+
+
+def _fsync_dir(directory: str):
+    """Force l'écriture de l'entrée de dossier (sans effet sous Windows)"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OutputManager:
+    """Publie les rapports de façon atomique dans le dossier de sortie"""
+
+    def __init__(self, output_dir: str = './outputs', fsync_policy: str = FSYNC_FILE,
+                 manifest_name: str = MANIFEST_NAME):
+        """
+        Args:
+            output_dir: Dossier de sortie partagé
+            fsync_policy: 'none', 'file' ou 'full'
+            manifest_name: Nom du manifeste (JSON Lines) dans le dossier de sortie
+        """
+        if fsync_policy not in FSYNC_POLICIES:
+            logger.warning(f"⚠️ Politique fsync inconnue '{fsync_policy}', utilisation de '{FSYNC_FILE}'")
+            fsync_policy = FSYNC_FILE
+
+        self.output_dir = Path(output_dir)
+        self.fsync_policy = fsync_policy
+        self.manifest_path = self.output_dir / manifest_name
+        self._manifest_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> 'OutputManager':
+        """Construit le gestionnaire depuis la configuration (preferences + output)"""
+        config = config or {}
+        output_config = config.get('output', {})
+        return cls(
+            output_dir=config.get('preferences', {}).get('output_folder', './outputs'),
+            fsync_policy=output_config.get('fsync_policy', FSYNC_FILE),
+            manifest_name=output_config.get('manifest', MANIFEST_NAME)
+        )
+
+    def unique_name(self, prefix: str, job_id: Optional[str] = None, extension: str = '.xlsx') -> str:
+        """
+        Nom de fichier unique pour un job
+
+        Exemple: Rapport_AUTO_20250909_101500_3f2a9c1b7d04.xlsx
+        """
+        job_id = job_id or new_job_id()
+        return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}{extension}"
+
+    def final_path(self, name: str) -> Path:
+        """Chemin final dans le dossier de sortie (créé si nécessaire)"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.output_dir / name
+
+    def temp_path(self, final_path) -> Path:
+        """
+        Fichier temporaire dans le même dossier que la cible
+
+        Même volume que la cible : os.replace reste atomique. L'extension
+        est conservée pour qu'Excel puisse ouvrir le fichier temporaire ;
+        le nom indique la machine et le processus auteurs (nettoyage sûr).
+        """
+        final_path = Path(final_path)
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        owner = f"{HOST_TAG}-{os.getpid()}"
+        return final_path.parent / f"{TEMP_PREFIX}{owner}_{uuid.uuid4().hex[:8]}_{final_path.name}"
+
+    def publish(self, temp_path, final_path, job_id: Optional[str] = None,
+                kind: Optional[str] = None, extra: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Publie le fichier temporaire sous son nom final puis l'inscrit au manifeste
+
+        Returns:
+            Chemin final publié
+        """
+        temp_path, final_path = str(temp_path), str(final_path)
+
+        if self.fsync_policy in (FSYNC_FILE, FSYNC_FULL):
+            _fsync_path(temp_path)
+
+        os.replace(temp_path, final_path)
+
+        if self.fsync_policy == FSYNC_FULL:
+            _fsync_dir(os.path.dirname(os.path.abspath(final_path)))
+
+        self._record(final_path, job_id, kind or Path(final_path).suffix.lstrip('.'), extra)
+        logger.info(f"  ✓ Publié: {Path(final_path).name}")
+        return final_path
+
+    def discard(self, temp_path):
+        """Supprime un fichier temporaire abandonné (job échoué)"""
+        try:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Fichier temporaire non supprimé {temp_path}: {e}")
+
+    def cleanup_temp_files(self, max_age: float = TEMP_MAX_AGE) -> int:
+        """
+        Supprime les fichiers temporaires laissés par un crash (au démarrage du démon)
+
+        Un fichier en cours d'écriture par un autre démon ou un processus de
+        travail est conservé : seuls sont supprimés ceux dont le processus
+        auteur (sur cette machine) n'existe plus, ou plus vieux que max_age.
+        """
+        if not self.output_dir.exists():
+            return 0
+        removed = 0
+        now = time.time()
+        for temp_file in self.output_dir.glob(f"{TEMP_PREFIX}*"):
+            try:
+                age = now - temp_file.stat().st_mtime
+            except OSError:
+                continue
+            owner = _temp_owner(temp_file.name)
+            orphan = owner is not None and owner[0] == HOST_TAG and not _pid_alive(owner[1])
+            if not orphan and age < max_age:
+                continue
+            self.discard(str(temp_file))
+            removed += 1
+        if removed:
+            logger.info(f"🧹 {removed} fichier(s) temporaire(s) supprimé(s)")
+        return removed
+
+    def _record(self, path: str, job_id: Optional[str], kind: str, extra: Optional[Dict[str, Any]]):
+        """Ajoute une ligne au manifeste (une écriture par entrée, en mode append)"""
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'job_id': job_id,
+            'kind': kind,
+            'path': os.path.abspath(path),
+            'size': os.path.getsize(path)
+        }
+        if extra:
+            entry.update(extra)
+
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        try:
+            with self._manifest_lock:
+                with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"⚠️ Manifeste non mis à jour: {e}")
+
+    def read_manifest(self, job_id: Optional[str] = None) -> list:
+        """Retourne les entrées du manifeste (filtrées par job si demandé)"""
+        if not self.manifest_path.exists():
+            return []
+        entries = []
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Ligne tronquée par un crash
+                if job_id is None or entry.get('job_id') == job_id:
+                    entries.append(entry)
+        return entries
@@ -0,0 +1,187 @@
+"""
+Bloc de rendu partagé par tous les writers
+Le DataFrame traité est converti une seule fois par job en colonnes prêtes à écrire
+(statut nettoyé, préfixe pays retiré, montants entiers, totaux pré-calculés)
+"""
+import logging
+from typing import Dict, List, Tuple, Any, Optional, Union
+import numpy as np
+import pandas as pd
+from .excel_range_batch import format_thousands
+from .shared_frames import FrameHandle, SharedFrame, SharedFrameStore, attach
+
+logger = logging.getLogger(__name__)
+
+# Colonnes du tableau dans l'ordre du template
+COLUMNS = ('Date', 'TransactionID', 'Type', 'Status', 'Amount', 'Frais', 'De', 'Vers', 'Beneficiaire')
+
+# Valeurs par défaut si la colonne est absente du DataFrame
+DEFAULTS = {
+    'Date': '',
+    'TransactionID': '',
+    'Type': 'PAIEMENT',
+    'Status': 'Success',
+    'De': 'UGP',
+    'Vers': '',
+    'Beneficiaire': ''
+}
+
+# Clés des en-têtes du template (mapping des fillers) → colonnes du bloc
+HEADER_COLUMNS = {
+    'Date': 'Date',
+    'Transaction': 'TransactionID',
+    'Type': 'Type',
+    'Statut': 'Status',
+    'Montant': 'Amount',
+    'Frais': 'Frais',
+    'De': 'De',
+    'Vers': 'Vers',
+    'Beneficiaire': 'Beneficiaire'
+}
+
+# Colonnes numériques (montants en FCFA)
+AMOUNT_COLUMNS = ('Amount', 'Frais')
+
+COUNTRY_PREFIX = '235'
+
+
+def _text_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Retourne une colonne texte (vide pour les valeurs manquantes)"""
+    if column not in df.columns:
+        return np.full(len(df), DEFAULTS[column], dtype=object)
+    series = df[column]
+    return np.where(series.isna(), '', series.astype(str)).astype(object)
+
+
+def _amount_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Retourne une colonne de montants entiers (0 si vide ou invalide)"""
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=np.int64)
+    values = pd.to_numeric(df[column], errors='coerce').fillna(0)
+    return values.round().astype(np.int64).to_numpy()
+
+
+def _clean_status(values: np.ndarray) -> np.ndarray:
+    """Enlève les virgules et corrige 'Succes' en 'Success'"""
+    status = pd.Series(values, dtype=object).str.replace(',', '', regex=False).str.strip()
+    status = status.replace({'Succes': 'Success', '': DEFAULTS['Status']})
+    return status.to_numpy(dtype=object)
+
+
+def _strip_country_prefix(values: np.ndarray) -> np.ndarray:
+    """Enlève le préfixe pays (235) en tête du numéro uniquement"""
+    vers = pd.Series(values, dtype=object)
+    return vers.str.replace(rf'^{COUNTRY_PREFIX}', '', regex=True).to_numpy(dtype=object)
+
+
+class RenderBlock:
+    """
+    Transactions sous forme de colonnes prêtes pour le rendu
+
+    Construit une fois par job (ReportGenerator / AutoProcessor) puis
+    consommé par tous les backends (COM, xlwings, openpyxl, xlsxwriter)
+    sans itération ligne à ligne sur le DataFrame.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.count = len(columns['Amount'])
+        self._lists = {}
+        self._formatted = {}
+        self._shared: Optional[SharedFrame] = None
+
+        # Totaux calculés une seule fois
+        self.total_amount = int(columns['Amount'].sum())
+        self.total_fees = int(columns['Frais'].sum())
+        self.total_depense = self.total_amount + self.total_fees
+        beneficiaries = columns['Beneficiaire']
+        self.unique_beneficiaries = len(set(beneficiaries[beneficiaries != ''].tolist()))
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'RenderBlock':
+        """Construit le bloc à partir du DataFrame traité"""
+        df = df.reset_index(drop=True)
+        columns = {}
+        for column in COLUMNS:
+            if column in AMOUNT_COLUMNS:
+                columns[column] = _amount_column(df, column)
+            else:
+                columns[column] = _text_column(df, column)
+
+        columns['Status'] = _clean_status(columns['Status'])
+        columns['Vers'] = _strip_country_prefix(columns['Vers'])
+
+        block = cls(columns)
+        logger.debug(f"Bloc de rendu: {block.count} transactions, total {block.total_amount}")
+        return block
+
+    @classmethod
+    def ensure(cls, data: Union['RenderBlock', pd.DataFrame]) -> 'RenderBlock':
+        """Retourne le bloc tel quel ou le construit depuis un DataFrame"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dataframe(data)
+
+    def share(self, store: SharedFrameStore, refs: int = 1) -> FrameHandle:
+        """Publie les colonnes en mémoire partagée pour un rendu dans un autre processus"""
+        return store.publish(self.columns, refs=refs)
+
+    @classmethod
+    def from_shared(cls, handle: FrameHandle) -> 'RenderBlock':
+        """Bloc sur les colonnes d'un segment partagé (montants sans copie) ; close() le détache"""
+        frame = attach(handle)
+        block = cls(frame.columns)
+        block._shared = frame
+        return block
+
+    def close(self):
+        """Détache le segment partagé (blocs construits par from_shared)"""
+        if self._shared is not None:
+            self._lists.clear()
+            self._formatted.clear()
+            self.columns = {}
+            self._shared.close()
+            self._shared = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def column(self, name: str) -> List[Any]:
+        """Colonne en liste de types natifs (int/str), marshallable par COM"""
+        if name not in self._lists:
+            self._lists[name] = self.columns[name].tolist()
+        return self._lists[name]
+
+    def formatted(self, name: str) -> List[str]:
+        """Montants formatés avec espaces ('491 741'), calculés une seule fois"""
+        if name not in self._formatted:
+            self._formatted[name] = [format_thousands(v) for v in self.column(name)]
+        return self._formatted[name]
+
+    def rows(self, names=COLUMNS, formatted: bool = False) -> List[Tuple[Any, ...]]:
+        """
+        Lignes prêtes pour une écriture 2-D (Range.Value, append...)
+
+        Args:
+            names: Colonnes dans l'ordre voulu
+            formatted: Montants en texte formaté plutôt qu'en entiers
+        """
+        columns = [
+            self.formatted(name) if formatted and name in AMOUNT_COLUMNS else self.column(name)
+            for name in names
+        ]
+        return list(zip(*columns))
+
+    def header_rows(self, keys: List[str], formatted: bool = False) -> List[Tuple[Any, ...]]:
+        """Lignes pour des clés d'en-tête du template ('Transaction', 'Statut', 'Montant'...)"""
+        return self.rows([HEADER_COLUMNS[key] for key in keys], formatted=formatted)
+
+    def totals(self) -> Dict[str, int]:
+        """Totaux du rapport"""
+        return {
+            'count': self.count,
+            'total_amount': self.total_amount,
+            'total_fees': self.total_fees,
+            'total_depense': self.total_depense,
+            'unique_beneficiaries': self.unique_beneficiaries
+        }
@@ -2,14 +2,25 @@
 Module de génération de rapports Excel
 """
 import os
+import shutil
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional
 import pandas as pd
 import logging
+from .render_block import RenderBlock
+from .output_manager import OutputManager, new_job_id
+from .stage_cache import StageCache, code_version, file_fingerprint
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_PATH = Path(__file__).parent.parent / 'templates' / 'Rapport_template.xlsx'
+
+# Modules dont dépend le rendu (version du code de l'étape render_xlsx)
+RENDER_MODULES = ('core.report_generator', 'core.render_block', 'core.excel_range_batch',
+                  'core.excel_fast_writer', 'core.final_excel_filler')
+
 
 class ReportGenerator:
     """Générateur de rapports Excel formatés"""
@@ -17,68 +28,118 @@ class ReportGenerator:
     def __init__(self, config: dict = None):
         self.config = config or {}
         self.output_dir = self.config.get('preferences', {}).get('output_folder', './outputs')
-        
-    def generate_report(self, data: pd.DataFrame, metadata: dict, output_name: str = None) -> str:
+        self.output_manager = OutputManager.from_config(self.config)
+        # Cache des rendus (optionnel) et clé du dernier rendu (entrée de l'étape PDF),
+        # propre à chaque thread (rendus simultanés)
+        self.stage_cache: Optional[StageCache] = None
+        self._local = threading.local()
+    
+    @property
+    def last_render_key(self) -> Optional[str]:
+        """Clé du dernier rendu produit par le thread appelant"""
+        return getattr(self._local, 'last_render_key', None)
+    
+    @last_render_key.setter
+    def last_render_key(self, key: Optional[str]):
+        self._local.last_render_key = key
+    
+    def generate_report(self, data, metadata: dict, output_name: str = None,
+                        job_id: str = None, cache_key: str = None) -> str:
         """
         Génère le rapport Excel à partir des données
         
+        Le rapport est écrit dans un fichier temporaire du dossier de sortie
+        puis publié atomiquement : aucun autre job ne voit un fichier incomplet.
+        
         Args:
-            data: DataFrame avec les transactions
+            data: DataFrame avec les transactions (ou RenderBlock déjà construit)
             metadata: Métadonnées du rapport
-            output_name: Nom du fichier de sortie (optionnel)
+            output_name: Nom du fichier de sortie (optionnel, unique par défaut)
+            job_id: Identifiant du job (inscrit au manifeste)
+            cache_key: Clé de l'étape amont ; si fournie (et le cache actif), un rendu
+                       identique déjà produit est recopié au lieu d'être refait
             
         Returns:
             Chemin du fichier généré
         """
+        job_id = job_id or new_job_id()
         if output_name is None:
-            output_name = f"Rapport_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            output_name = self.output_manager.unique_name('Rapport', job_id)
+        elif not Path(output_name).suffix:
+            output_name = f"{output_name}.xlsx"
         
-        output_path = Path(self.config['preferences']['output_folder']) / output_name
+        output_path = self.output_manager.final_path(output_name)
+        temp_path = self.output_manager.temp_path(output_path)
         
+        self.last_render_key = None
         try:
-            # Vérifier si on doit utiliser le mode rapide
-            use_fast_mode = self.config.get('optimization', {}).get('use_fast_mode', False)
-            
-            if use_fast_mode:
-                logger.info("🚀 Utilisation du FastWriter optimisé")
-                try:
-                    from core.excel_fast_writer import ExcelHybridWriter
-                    template_path = Path(__file__).parent.parent / 'templates' / 'Rapport_template.xlsx'
-                    
-                    # Créer le dossier de sortie si nécessaire
-                    output_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Utiliser le writer rapide
-                    fast_writer = ExcelHybridWriter(
-                        template_path=str(template_path),
-                        output_path=str(output_path)
-                    )
-                    return fast_writer.write_report(data, metadata)
-                    
-                except Exception as e:
-                    logger.warning(f"⚠ FastWriter échoué, fallback au mode classique: {e}")
-                    # Fallback au mode classique
-                    
-            # Mode classique (par défaut ou si fast mode échoue)
-            logger.info("Utilisation de FinalExcelFiller avec win32com")
-            from core.final_excel_filler import FinalExcelFiller
-            template_path = Path(__file__).parent.parent / 'templates' / 'Rapport_template.xlsx'
-            
-            # Créer le dossier de sortie si nécessaire
-            output_path.parent.mkdir(parents=True, exist_ok=True)
+            # Bloc de rendu construit une seule fois, partagé par le writer et son fallback
+            block = RenderBlock.ensure(data)
             
-            filler = FinalExcelFiller()
-            # Ordre correct des arguments: template_path, output_path, df, metadata
-            success = filler.fill_template(str(template_path), str(output_path), data, metadata)
-            
-            if success:
-                return str(output_path)
+            render_key = self._render_key(cache_key, metadata)
+            cached = self.stage_cache.lookup_file('render_xlsx', render_key, '.xlsx') if render_key else None
+            if cached:
+                shutil.copy2(cached, temp_path)
+            elif self._render(block, metadata, temp_path):
+                if render_key:
+                    self.stage_cache.store_file('render_xlsx', render_key, str(temp_path))
             else:
+                self.output_manager.discard(temp_path)
                 return None
+            self.last_render_key = render_key
+            
+            return self.output_manager.publish(
+                temp_path, output_path, job_id=job_id, kind='xlsx',
+                extra={'transactions': len(block)}
+            )
         
         except Exception as e:
             logger.error(f"Erreur lors de la génération du rapport: {e}")
+            self.output_manager.discard(temp_path)
+            return None
+    
+    def _render_key(self, cache_key: Optional[str], metadata: dict) -> Optional[str]:
+        """Clé du rendu : données, métadonnées, template, mode d'écriture et code"""
+        if self.stage_cache is None or cache_key is None:
             return None
+        use_fast_mode = self.config.get('optimization', {}).get('use_fast_mode', False)
+        return StageCache.key(
+            'render_xlsx',
+            [cache_key, metadata, file_fingerprint(str(TEMPLATE_PATH)), use_fast_mode],
+            code_version(*RENDER_MODULES)
+        )
+    
+    def _render(self, block: RenderBlock, metadata: dict, output_path: Path) -> bool:
+        """Écrit le rapport dans output_path (FastWriter puis mode classique)"""
+        template_path = TEMPLATE_PATH
+        
+        # Vérifier si on doit utiliser le mode rapide
+        use_fast_mode = self.config.get('optimization', {}).get('use_fast_mode', False)
+        
+        if use_fast_mode:
+            logger.info("🚀 Utilisation du FastWriter optimisé")
+            try:
+                from core.excel_fast_writer import ExcelHybridWriter
+                
+                # Utiliser le writer rapide
+                fast_writer = ExcelHybridWriter(
+                    template_path=str(template_path),
+                    output_path=str(output_path)
+                )
+                fast_writer.write_report(block, metadata)
+                return True
+                
+            except Exception as e:
+                logger.warning(f"⚠ FastWriter échoué, fallback au mode classique: {e}")
+                # Fallback au mode classique
+                
+        # Mode classique (par défaut ou si fast mode échoue)
+        logger.info("Utilisation de FinalExcelFiller avec win32com")
+        from core.final_excel_filler import FinalExcelFiller
+        
+        filler = FinalExcelFiller()
+        # Ordre correct des arguments: template_path, output_path, df, metadata
+        return bool(filler.fill_template(str(template_path), str(output_path), block, metadata))
 
         
         # Ajouter les métadonnées complètes
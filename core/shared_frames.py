@@ -0,0 +1,235 @@
+"""
+Transmission de tableaux entre processus par mémoire partagée
+Un tableau (DataFrame traité ou colonnes d'un RenderBlock) est écrit une fois
+dans un segment multiprocessing.shared_memory, colonne par colonne : les
+colonnes numériques sont relues sans copie, les colonnes texte en un seul
+décodage UTF-8 (décalages + données, comme Arrow). Seul un descripteur de
+quelques centaines d'octets traverse le pipe ; le segment est libéré par son
+propriétaire quand le dernier consommateur l'a rendu
+"""
+import uuid
+import pickle
+import logging
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Alignement des colonnes dans le segment (octets)
+ALIGNMENT = 64
+
+KIND_NUMERIC = 'numeric'
+KIND_TEXT = 'text'
+KIND_PICKLE = 'pickle'
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_column(values: np.ndarray) -> Dict[str, Any]:
+    """
+    Représentation binaire d'une colonne
+
+    Returns:
+        {'kind', 'dtype', 'buffers': [bytes ou ndarray]} ; 'text' : masque des
+        valeurs manquantes, décalages (en caractères) et texte UTF-8 concaténé
+    """
+    if values.dtype != object:
+        return {'kind': KIND_NUMERIC, 'dtype': values.dtype.str, 'buffers': [np.ascontiguousarray(values)]}
+
+    missing = pd.isna(values)
+    present = values[~missing]
+    if not all(isinstance(value, str) for value in present):
+        # Colonne mixte (nombres, dates...) : sérialisée telle quelle
+        return {'kind': KIND_PICKLE, 'dtype': None,
+                'buffers': [pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)]}
+
+    texts = np.where(missing, '', values).tolist()
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in texts], out=offsets[1:])
+    data = ''.join(texts).encode('utf-8')
+    return {'kind': KIND_TEXT, 'dtype': None,
+            'buffers': [missing.astype(np.uint8), offsets, data]}
+
+
+class FrameHandle:
+    """Descripteur d'un tableau en mémoire partagée (seul objet transmis entre processus)"""
+
+    def __init__(self, segment: str, length: int, columns: List[Dict[str, Any]]):
+        self.segment = segment
+        self.length = length
+        self.columns = columns
+
+    @property
+    def names(self) -> List[str]:
+        return [column['name'] for column in self.columns]
+
+    def __repr__(self):
+        return f"FrameHandle({self.segment}: {self.length} lignes, {len(self.columns)} colonnes)"
+
+
+class SharedFrame:
+    """Tableau attaché depuis un segment (lecture seule)"""
+
+    def __init__(self, handle: FrameHandle):
+        self.handle = handle
+        self._shm = shared_memory.SharedMemory(name=handle.segment)
+        self.columns: Dict[str, np.ndarray] = {}
+        for column in handle.columns:
+            self.columns[column['name']] = self._decode(column)
+
+    def _buffer(self, spec: List[int], dtype) -> np.ndarray:
+        offset, size = spec
+        count = size // np.dtype(dtype).itemsize
+        view = np.ndarray((count,), dtype=dtype, buffer=self._shm.buf, offset=offset)
+        view.flags.writeable = False
+        return view
+
+    def _decode(self, column: Dict[str, Any]) -> np.ndarray:
+        buffers = column['buffers']
+        if column['kind'] == KIND_NUMERIC:
+            # Vue directe sur le segment : aucune copie
+            return self._buffer(buffers[0], column['dtype'])
+        if column['kind'] == KIND_PICKLE:
+            offset, size = buffers[0]
+            return pickle.loads(self._shm.buf[offset:offset + size])
+
+        missing = self._buffer(buffers[0], np.uint8).astype(bool)
+        offsets = self._buffer(buffers[1], np.int64).tolist()
+        offset, size = buffers[2]
+        text = bytes(self._shm.buf[offset:offset + size]).decode('utf-8')
+        values = np.empty(self.handle.length, dtype=object)
+        values[:] = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+        if missing.any():
+            values[missing] = None
+        return values
+
+    def to_dataframe(self, copy: bool = False) -> pd.DataFrame:
+        """DataFrame des colonnes (copy=True pour le garder après close())"""
+        return pd.DataFrame({name: values.copy() if copy else values
+                             for name, values in self.columns.items()}, copy=False)
+
+    def close(self):
+        """Détache le segment (les vues numériques deviennent inutilisables)"""
+        self.columns = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            # Une vue est encore référencée : le segment sera détaché au ramasse-miettes
+            logger.debug(f"Segment {self.handle.segment} encore référencé")
+
+    def __enter__(self) -> 'SharedFrame':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(handle: FrameHandle) -> SharedFrame:
+    """Attache un tableau publié par un autre processus (ou le même)"""
+    return SharedFrame(handle)
+
+
+class SharedFrameStore:
+    """
+    Segments publiés par ce processus, avec compteur de références
+
+    Le propriétaire garde chaque segment ouvert (nécessaire sous Windows) et
+    le supprime quand la dernière référence est rendue (release).
+    """
+
+    def __init__(self, prefix: str = 'ugp'):
+        self.prefix = prefix
+        self._segments: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self.stats = {'published': 0, 'released': 0, 'bytes': 0}
+
+    def publish(self, data: Union[pd.DataFrame, Dict[str, np.ndarray]], refs: int = 1) -> FrameHandle:
+        """
+        Écrit un tableau dans un nouveau segment
+
+        Args:
+            data: DataFrame (l'index n'est pas conservé) ou colonnes numpy de même longueur
+            refs: Consommateurs attendus (chacun rendra sa référence)
+        """
+        if isinstance(data, pd.DataFrame):
+            columns = {str(name): data[name].to_numpy() for name in data.columns}
+            length = len(data)
+        else:
+            columns = {name: np.asarray(values) for name, values in data.items()}
+            length = len(next(iter(columns.values()))) if columns else 0
+
+        encoded = [(name, _encode_column(values)) for name, values in columns.items()]
+        size, layout = 0, []
+        for name, column in encoded:
+            specs = []
+            for buffer in column['buffers']:
+                size = _align(size)
+                nbytes = buffer.nbytes if isinstance(buffer, np.ndarray) else len(buffer)
+                specs.append([size, nbytes])
+                size += nbytes
+            layout.append({'name': name, 'kind': column['kind'], 'dtype': column['dtype'], 'buffers': specs})
+
+        segment = f"{self.prefix}_{uuid.uuid4().hex[:16]}"
+        shm = shared_memory.SharedMemory(name=segment, create=True, size=max(size, 1))
+        for (_, column), spec in zip(encoded, layout):
+            for buffer, (offset, nbytes) in zip(column['buffers'], spec['buffers']):
+                source = buffer.view(np.uint8).reshape(-1) if isinstance(buffer, np.ndarray) else buffer
+                shm.buf[offset:offset + nbytes] = source
+
+        with self._lock:
+            self._segments[segment] = [shm, max(1, refs)]
+            self.stats['published'] += 1
+            self.stats['bytes'] += size
+        return FrameHandle(segment, length, layout)
+
+    def retain(self, handle: FrameHandle, count: int = 1):
+        """Ajoute des consommateurs à un segment publié"""
+        with self._lock:
+            self._segments[handle.segment][1] += count
+
+    def release(self, handle: FrameHandle) -> bool:
+        """
+        Rend une référence ; le segment est supprimé à la dernière
+
+        Returns:
+            True si le segment a été supprimé
+        """
+        with self._lock:
+            entry = self._segments.get(handle.segment)
+            if entry is None:
+                return False
+            entry[1] -= 1
+            if entry[1] > 0:
+                return False
+            del self._segments[handle.segment]
+            self.stats['released'] += 1
+        self._destroy(entry[0])
+        return True
+
+    @staticmethod
+    def _destroy(shm: shared_memory.SharedMemory):
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Supprime tous les segments encore publiés (arrêt du propriétaire)"""
+        with self._lock:
+            segments, self._segments = self._segments, {}
+        for shm, _ in segments.values():
+            self._destroy(shm)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._segments)
@@ -3,8 +3,10 @@ Processeur intelligent qui orchestre la détection de format et le mapping des b
 """
 import pandas as pd
 import logging
-from typing import Tuple, Dict, Any
+import threading
+from typing import Tuple, Dict, Any, Optional, Callable, List
 from .format_detector import FormatDetector
+from .stage_cache import StageCache, code_version
 from .beneficiary_resolver_v2 import BeneficiaryResolverV2 as BeneficiaryResolver
 
 logger = logging.getLogger(__name__)
@@ -16,16 +18,73 @@ class SmartProcessor:
     def __init__(self):
         self.format_detector = FormatDetector()
         self.beneficiary_resolver = BeneficiaryResolver()
+        # Statistiques et clé du dernier résultat, propres à chaque thread (traitements simultanés)
+        self._local = threading.local()
         self.processing_stats = {}
+        # Cache des étapes (optionnel) : détection, résolution, frais
+        self.stage_cache: Optional[StageCache] = None
+    
+    @property
+    def last_stage_key(self) -> Optional[str]:
+        """Clé du dernier résultat calculé par le thread appelant"""
+        return getattr(self._local, 'last_stage_key', None)
+    
+    @last_stage_key.setter
+    def last_stage_key(self, key: Optional[str]):
+        self._local.last_stage_key = key
+    
+    @property
+    def processing_stats(self) -> Dict[str, Any]:
+        """Statistiques du dernier traitement du thread appelant"""
+        return getattr(self._local, 'processing_stats', {})
+    
+    @processing_stats.setter
+    def processing_stats(self, stats: Dict[str, Any]):
+        self._local.processing_stats = stats
+    
+    def _run_stage(self, stage: str, inputs: List[Any], compute: Callable[[], Any],
+                   modules: Tuple[str, ...], cached: bool) -> Tuple[Any, Optional[str]]:
+        """Exécute une étape via le cache si les clés des entrées sont connues"""
+        if self.stage_cache is None or not cached:
+            return compute(), None
+        return self.stage_cache.run(stage, inputs, compute, code_version(*modules))
+    
+    def detect(self, bulk_df: pd.DataFrame,
+               bulk_key: Optional[str] = None) -> Tuple[Tuple[Dict, pd.DataFrame], Optional[str]]:
+        """
+        Détection du format puis filtrage (ne dépendent que du BulkReport)
+        
+        Returns:
+            ((format_info, DataFrame filtré), clé de l'étape)
+        """
+        def compute():
+            format_info = self.format_detector.detect_format(bulk_df)
+            return format_info, self.format_detector.apply_filter(bulk_df, format_info)
+        
+        return self._run_stage('detect_format', [bulk_key], compute,
+                               ('core.format_detector',), bulk_key is not None)
+    
+    def index_export(self, export_df: pd.DataFrame,
+                     export_key: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """Noms extraits de l'Export (ne dépendent que de l'Export)"""
+        return self._run_stage('index_export', [export_key],
+                               lambda: self.beneficiary_resolver.index_export(export_df),
+                               ('core.beneficiary_resolver_v2',), export_key is not None)
     
     def process_smart(self, 
                      bulk_df: pd.DataFrame,
                      export_df: pd.DataFrame,
                      fees_df: pd.DataFrame,
-                     metadata: dict) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+                     metadata: dict,
+                     input_keys: Optional[Dict[str, str]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         """
         Traite intelligemment les données avec détection automatique et mapping adaptatif
         
+        Args:
+            input_keys: Clés des fichiers lus {'bulk', 'export', 'fees'} ; si fournies,
+                        chaque étape est mémoïsée et seule l'étape dont une entrée a
+                        changé (et les suivantes) est recalculée
+        
         Returns:
             Tuple: (DataFrame traité, statistiques de traitement)
         """
@@ -43,16 +102,17 @@ class SmartProcessor:
             'errors': []
         }
         
+        self.last_stage_key = None
         try:
-            # Étape 1: Détection du format
+            keys = input_keys or {}
+            
+            # Étapes 1 et 2: Détection du format puis filtrage (ne dépendent que du BulkReport)
             logger.info("\n📋 ÉTAPE 1: DÉTECTION DU FORMAT")
-            format_info = self.format_detector.detect_format(bulk_df)
+            logger.info("\n🔄 ÉTAPE 2: FILTRAGE DES TRANSACTIONS")
+            
+            (format_info, filtered_df), format_key = self.detect(bulk_df, keys.get('bulk'))
             stats['format_detected'] = format_info['format_type']
             stats['confidence'] = format_info['confidence']
-            
-            # Étape 2: Filtrage selon le format
-            logger.info("\n🔄 ÉTAPE 2: FILTRAGE DES TRANSACTIONS")
-            filtered_df = self.format_detector.apply_filter(bulk_df, format_info)
             stats['transactions_kept'] = len(filtered_df)
             stats['fees_filtered'] = len(bulk_df) - len(filtered_df)
             
@@ -61,27 +121,41 @@ class SmartProcessor:
             
             # Étape 3: Mapping des bénéficiaires
             logger.info(f"\n👥 ÉTAPE 3: MAPPING DES BÉNÉFICIAIRES")
-            result = self.beneficiary_resolver.resolve_beneficiaries(filtered_df, export_df)
-            
-            # Ajouter les colonnes mappées au DataFrame filtré
-            for col in result.columns:
-                if col not in filtered_df.columns:
-                    filtered_df[col] = result[col]
             
-            # S'assurer que les colonnes essentielles sont présentes
-            # Date - extraire de Transaction Timestamp ou Finished Timestamp
-            if 'Transaction Timestamp' in filtered_df.columns:
-                filtered_df['Date'] = filtered_df['Transaction Timestamp']
-            elif 'Finished Timestamp' in filtered_df.columns:
-                filtered_df['Date'] = filtered_df['Finished Timestamp']
+            def resolve():
+                names, _ = self.index_export(export_df, keys.get('export'))
+                result = self.beneficiary_resolver.resolve_beneficiaries(filtered_df, export_df, names=names)
+                
+                # Ajouter les colonnes mappées au DataFrame filtré
+                for col in result.columns:
+                    if col not in filtered_df.columns:
+                        filtered_df[col] = result[col]
+                
+                # S'assurer que les colonnes essentielles sont présentes
+                # Date - extraire de Transaction Timestamp ou Finished Timestamp
+                if 'Transaction Timestamp' in filtered_df.columns:
+                    filtered_df['Date'] = filtered_df['Transaction Timestamp']
+                elif 'Finished Timestamp' in filtered_df.columns:
+                    filtered_df['Date'] = filtered_df['Finished Timestamp']
+                
+                # Vers - utiliser Credit Msisdn
+                if 'Credit Msisdn' in filtered_df.columns:
+                    filtered_df['Vers'] = filtered_df['Credit Msisdn']
+                return filtered_df
             
-            # Vers - utiliser Credit Msisdn
-            if 'Credit Msisdn' in filtered_df.columns:
-                filtered_df['Vers'] = filtered_df['Credit Msisdn']
+            resolved_df, resolve_key = self._run_stage(
+                'resolve_beneficiaries', [format_key, keys.get('export')], resolve,
+                ('core.beneficiary_resolver_v2', 'core.smart_processor'), input_keys is not None
+            )
             
             # Étape 4: Calcul des frais
             logger.info("\n💰 ÉTAPE 4: CALCUL DES FRAIS")
-            processed_df = self._calculate_fees(filtered_df, fees_df, metadata)
+            processed_df, fees_key = self._run_stage(
+                'compute_fees', [resolve_key, keys.get('fees'), metadata.get('fee_rate', 0.0168)],
+                lambda: self._calculate_fees(resolved_df, fees_df, metadata),
+                ('core.smart_processor',), input_keys is not None
+            )
+            self.last_stage_key = fees_key
             
             # Étape 5: Validation finale
             logger.info("\n✅ ÉTAPE 5: VALIDATION FINALE")
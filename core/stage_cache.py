@@ -0,0 +1,220 @@
+"""
+Mémoïsation sur disque des étapes du traitement
+Chaque étape est identifiée par une clé dérivée de ses entrées (hash des fichiers
+sources ou clés des étapes amont), de ses paramètres et de la version du code
+qui l'implémente ; son résultat est réutilisé tant que la clé est identique
+"""
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import logging
+import threading
+import importlib.util
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from .template_cache import file_hash
+
+logger = logging.getLogger(__name__)
+
+_code_versions: Dict[Tuple[str, ...], str] = {}
+_fingerprints: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_lock = threading.Lock()
+
+
+def code_version(*module_names: str) -> str:
+    """Hash du code source des modules (une modification invalide les résultats)"""
+    with _lock:
+        if module_names not in _code_versions:
+            digest = hashlib.sha256()
+            for name in module_names:
+                try:
+                    spec = importlib.util.find_spec(name)
+                except (ImportError, ValueError):
+                    spec = None
+                source = spec.origin if spec else None
+                if source and os.path.exists(source):
+                    with open(source, 'rb') as f:
+                        digest.update(f.read())
+                else:
+                    digest.update(name.encode())
+            _code_versions[module_names] = digest.hexdigest()[:16]
+        return _code_versions[module_names]
+
+
+def file_fingerprint(path: Optional[str]) -> str:
+    """Hash du contenu d'un fichier d'entrée (recalculé seulement si taille/date changent)"""
+    if not path or not os.path.exists(path):
+        return 'absent'
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[0] == stat_key:
+            return cached[1]
+    digest = file_hash(path)
+    with _lock:
+        _fingerprints[path] = (stat_key, digest)
+    return digest
+
+
+class StageCache:
+    """
+    Résultats d'étapes sur disque avec expiration (TTL) et éviction par taille
+
+    Les valeurs sont sérialisées (pickle) dans <cache_dir>/<étape>/<clé>.pkl ;
+    les fichiers produits (xlsx, pdf) sont copiés dans <cache_dir>/<étape>/<clé><ext>.
+    """
+
+    def __init__(self, cache_dir: str = './cache/stages', ttl: float = 3600,
+                 max_size_mb: float = 500, enabled: bool = True):
+        """
+        Args:
+            cache_dir: Dossier du cache
+            ttl: Durée de validité d'un résultat (secondes)
+            max_size_mb: Taille maximale du cache (les moins récemment utilisés sont supprimés)
+            enabled: Cache désactivé = chaque étape est recalculée
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> 'StageCache':
+        """Construit le cache depuis la section 'advanced' de la configuration"""
+        advanced = (config or {}).get('advanced', {})
+        return cls(
+            cache_dir=advanced.get('cache_dir', './cache/stages'),
+            ttl=advanced.get('cache_ttl', 3600),
+            max_size_mb=advanced.get('cache_max_size_mb', 500),
+            enabled=advanced.get('enable_cache', True)
+        )
+
+    @staticmethod
+    def key(stage: str, inputs: Iterable[Any], code: str = '') -> str:
+        """Clé d'une étape : nom, version du code, clés amont et paramètres"""
+        payload = json.dumps([stage, code, list(inputs)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _entry(self, stage: str, key: str, suffix: str = '.pkl') -> Path:
+        return self.cache_dir / stage / f"{key}{suffix}"
+
+    def _valid(self, path: Path) -> bool:
+        """Entrée présente et non expirée (supprimée si expirée)"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        if time.time() - stat.st_mtime > self.ttl:
+            path.unlink(missing_ok=True)
+            return False
+        # Dernière utilisation (atime) pour l'éviction, date de création (mtime) conservée
+        os.utime(path, (time.time(), stat.st_mtime))
+        return True
+
+    def run(self, stage: str, inputs: Iterable[Any], compute: Callable[[], Any],
+            code: str = '') -> Tuple[Any, str]:
+        """
+        Retourne le résultat mémoïsé de l'étape ou le calcule
+
+        Args:
+            stage: Nom de l'étape ('parse_bulk', 'resolve_beneficiaries'...)
+            inputs: Clés des étapes amont / empreintes des fichiers / paramètres
+            compute: Calcul de l'étape (appelé seulement en cas d'absence)
+            code: Version du code de l'étape (code_version(...))
+
+        Returns:
+            (résultat, clé de l'étape) — la clé sert d'entrée aux étapes aval
+        """
+        key = self.key(stage, inputs, code)
+        if not self.enabled:
+            return compute(), key
+
+        path = self._entry(stage, key)
+        if self._valid(path):
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                self._count('hits')
+                logger.info(f"  ⚡ Étape '{stage}' en cache")
+                return value, key
+            except Exception as e:
+                logger.warning(f"  ⚠ Entrée de cache illisible ({stage}): {e}")
+
+        self._count('misses')
+        value = compute()
+        try:
+            self._store(path, lambda target: target.write_bytes(
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        except Exception as e:
+            logger.warning(f"  ⚠ Étape '{stage}' non mise en cache: {e}")
+        return value, key
+
+    def lookup_file(self, stage: str, key: str, suffix: str) -> Optional[str]:
+        """Fichier produit par une étape pour cette clé (None si absent ou expiré)"""
+        if not self.enabled:
+            return None
+        path = self._entry(stage, key, suffix)
+        if self._valid(path):
+            self._count('hits')
+            logger.info(f"  ⚡ Étape '{stage}' en cache")
+            return str(path)
+        self._count('misses')
+        return None
+
+    def store_file(self, stage: str, key: str, source: str):
+        """Conserve une copie du fichier produit par l'étape"""
+        if not self.enabled:
+            return
+        suffix = Path(source).suffix
+        try:
+            self._store(self._entry(stage, key, suffix), lambda target: shutil.copy2(source, target))
+        except Exception as e:
+            logger.warning(f"  ⚠ Fichier de l'étape '{stage}' non mis en cache: {e}")
+
+    def _store(self, path: Path, write: Callable[[Path], Any]):
+        """Écriture atomique de l'entrée puis éviction si le cache dépasse sa taille"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"~{os.getpid()}_{threading.get_ident()}_{path.name}")
+        write(temp)
+        # Date de création = maintenant (copy2 conserve celle du fichier source)
+        os.utime(temp, None)
+        os.replace(temp, path)
+        self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_size"""
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.cache_dir.glob('*/*'):
+                if path.name.startswith('~'):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.max_size:
+                return
+            for _, size, path in sorted(entries):
+                path.unlink(missing_ok=True)
+                self.stats['evicted'] += 1
+                total -= size
+                if total <= self.max_size:
+                    break
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        """Vide le cache (rechargement forcé)"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,104 @@
+"""
+Cache du template Excel au niveau du processus
+Le template est parsé une seule fois (feuilles, styles, cellules fusionnées, images)
+puis chaque rapport reçoit un clone indépendant, bien moins coûteux qu'un load_workbook
+"""
+import os
+import pickle
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+from openpyxl import load_workbook
+from openpyxl.workbook import Workbook
+
+logger = logging.getLogger(__name__)
+
+_cache: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def file_hash(path: str) -> str:
+    """Calcule le SHA-256 du fichier (lectures de 1 Mo)"""
+    sha256_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256_hash.update(block)
+    return sha256_hash.hexdigest()
+
+
+def _template_hash(path: str, entry: Dict[str, Any]) -> str:
+    """Retourne le hash du template, recalculé seulement si taille/date ont changé"""
+    stat = os.stat(path)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    if entry and entry['stat'] == stat_key:
+        return entry['hash']
+    digest = file_hash(path)
+    if entry and entry['hash'] == digest:
+        entry['stat'] = stat_key
+    return digest
+
+
+def load_template_clone(template_path: str,
+                        prepare: Optional[Callable[[Workbook], None]] = None) -> Workbook:
+    """
+    Retourne un clone du template prêt à être rempli
+
+    Le template parsé est gardé en cache (sérialisé) et invalidé dès que
+    le hash du fichier change. Chaque appel retourne un classeur indépendant.
+
+    Args:
+        template_path: Chemin du template Excel
+        prepare: Préparation appliquée une seule fois avant la mise en cache
+                 (ex: enregistrement des styles nommés)
+    """
+    path = os.path.abspath(template_path)
+    key = f"{path}|{prepare.__module__}.{prepare.__qualname__}" if prepare else path
+
+    with _lock:
+        entry = _cache.get(key)
+        digest = _template_hash(path, entry)
+
+        if entry is None or entry['hash'] != digest:
+            _stats['misses'] += 1
+            logger.info(f"  → Parsing du template (cache {'invalidé' if entry else 'vide'})")
+            workbook = load_workbook(path)
+            if prepare:
+                prepare(workbook)
+            try:
+                payload = pickle.dumps(workbook, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                # Classeur non sérialisable : pas de cache, on le retourne tel quel
+                logger.warning(f"  ⚠ Template non mis en cache: {e}")
+                return workbook
+            stat = os.stat(path)
+            entry = {
+                'hash': digest,
+                'stat': (stat.st_mtime_ns, stat.st_size),
+                'payload': payload
+            }
+            _cache[key] = entry
+            # Le classeur parsé n'a jamais été sauvegardé : il peut servir directement
+            return workbook
+
+        _stats['hits'] += 1
+        payload = entry['payload']
+
+    return pickle.loads(payload)
+
+
+def clear_template_cache():
+    """Vide le cache (tests, rechargement forcé)"""
+    with _lock:
+        _cache.clear()
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Retourne les statistiques du cache"""
+    with _lock:
+        return {
+            'templates': len(_cache),
+            'hits': _stats['hits'],
+            'misses': _stats['misses']
+        }
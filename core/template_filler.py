@@ -12,6 +12,8 @@ from openpyxl.utils import get_column_letter
 from openpyxl.cell.cell import MergedCell
 from openpyxl.drawing.image import Image as OpenpyxlImage
 import logging
+from .excel_range_batch import format_thousands
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -222,52 +224,17 @@ class TemplateFiller:
         # Commencer à remplir à partir de la ligne suivante
         start_row = header_row + 1
         
-        # Remplir les données
-        for idx, record in df.iterrows():
-            current_row = start_row + idx
-            
-            # Date
-            if 'Date' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Date'], record.get('Date', ''))
-            
-            # N° Transaction
-            if 'Transaction' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Transaction'], record.get('TransactionID', ''))
-            
-            # Type
-            if 'Type' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Type'], record.get('Type', 'PAIEMENT'))
-            
-            # Statut
-            if 'Statut' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Statut'], record.get('Status', ''))
-            
-            # Montant
-            if 'Montant' in column_mapping:
-                amount = record.get('Amount', 0)
-                # Formatter avec séparateurs de milliers
-                self._write_to_cell(worksheet, current_row, column_mapping['Montant'], f"{amount:,.0f}".replace(',', ' '))
-            
-            # Frais
-            if 'Frais' in column_mapping:
-                fee = record.get('Frais', 0)
-                self._write_to_cell(worksheet, current_row, column_mapping['Frais'], f"{fee:,.0f}".replace(',', ' '))
-            
-            # De
-            if 'De' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['De'], record.get('De', 'UGP'))
-            
-            # Vers
-            if 'Vers' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Vers'], record.get('Vers', ''))
-            
-            # Bénéficiaire
-            if 'Beneficiaire' in column_mapping:
-                self._write_to_cell(worksheet, current_row, column_mapping['Beneficiaire'], record.get('Beneficiaire', ''))
+        # Remplir les données depuis le bloc de rendu (montants formatés "491 741")
+        block = RenderBlock.ensure(df)
+        keys = list(column_mapping)
+        for offset, values in enumerate(block.header_rows(keys, formatted=True)):
+            current_row = start_row + offset
+            for key, value in zip(keys, values):
+                self._write_to_cell(worksheet, current_row, column_mapping[key], value)
         
         # Ajouter la ligne de total
-        if len(df) > 0:
-            total_row = start_row + len(df) + 1
+        if len(block) > 0:
+            total_row = start_row + len(block) + 1
             
             # Écrire "TOTAL" dans la colonne Statut ou Type
             if 'Statut' in column_mapping:
@@ -277,13 +244,11 @@ class TemplateFiller:
             
             # Total des montants
             if 'Montant' in column_mapping:
-                total_amount = df['Amount'].sum()
-                self._write_to_cell(worksheet, total_row, column_mapping['Montant'], f"{total_amount:,.0f}".replace(',', ' '))
+                self._write_to_cell(worksheet, total_row, column_mapping['Montant'], format_thousands(block.total_amount))
             
             # Total des frais
             if 'Frais' in column_mapping:
-                total_fees = df['Frais'].sum()
-                self._write_to_cell(worksheet, total_row, column_mapping['Frais'], f"{total_fees:,.0f}".replace(',', ' '))
+                self._write_to_cell(worksheet, total_row, column_mapping['Frais'], format_thousands(block.total_fees))
             
             logger.info(f"Totaux ajoutés à la ligne {total_row}")
     
@@ -8,6 +8,10 @@ from datetime import datetime
 import xlwings as xw
 import pandas as pd
 import logging
+from .excel_range_batch import (
+    AMOUNT_FORMAT, to_amount, contiguous_runs, find_header_row
+)
+from .render_block import RenderBlock
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +22,7 @@ class XlwingsFiller:
     def __init__(self):
         self.template_path = r"C:\Users\faycalhabibahmat\Desktop\Moov\UGP\Rapport UGP.xlsx"
         
-    def fill_template(self, processed_df: pd.DataFrame, metadata: dict, output_path: str) -> str:
+    def fill_template(self, processed_df, metadata: dict, output_path: str) -> str:
         """
         Remplit le template en utilisant xlwings
         GARANTIT la préservation de TOUS les éléments
@@ -68,67 +72,76 @@ class XlwingsFiller:
             logger.error(f"Erreur xlwings: {e}")
             raise
     
+    def _read_block(self, sheet, first_row: int, first_col: int, last_row: int, last_col: int) -> list:
+        """Lit une plage en un seul aller-retour, toujours sous forme 2-D"""
+        return sheet.range((first_row, first_col), (last_row, last_col)).options(ndim=2).value
+    
     def _fill_metadata_xlwings(self, sheet, metadata: dict):
-        """Remplit les métadonnées avec xlwings"""
+        """Remplit les métadonnées avec xlwings (zone d'en-tête lue en un seul appel)"""
         try:
+            # Lire A1:J14 d'un coup
+            grid = self._read_block(sheet, 1, 1, 14, 10)
+            
             # Parcourir les premières lignes
             for row in range(1, 15):
                 for col in range(1, 10):
-                    cell_value = sheet.range((row, col)).value
+                    cell_value = grid[row - 1][col - 1]
                     if cell_value:
                         cell_text = str(cell_value).lower().strip()
+                        next_value = grid[row - 1][col]
                         
                         # Date de paiement
                         if 'date de paiement' in cell_text:
-                            next_cell = sheet.range((row, col + 1))
-                            if not next_cell.value:
-                                next_cell.value = metadata.get('date_paiement', datetime.now().strftime("%d-%b-%Y"))
+                            if not next_value:
+                                sheet.range((row, col + 1)).value = metadata.get('date_paiement', datetime.now().strftime("%d-%b-%Y"))
                                 logger.info(f"Date remplie")
                         
                         # Libellé
                         elif 'libellé' in cell_text or 'libelle' in cell_text:
-                            next_cell = sheet.range((row, col + 1))
-                            if not next_cell.value:
-                                next_cell.value = metadata.get('libelle', 'PAIEMENT')
+                            if not next_value:
+                                sheet.range((row, col + 1)).value = metadata.get('libelle', 'PAIEMENT')
                                 logger.info(f"Libellé rempli")
                         
                         # Budget
                         elif 'budget' in cell_text:
-                            next_cell = sheet.range((row, col + 1))
-                            if not next_cell.value:
+                            if not next_value:
                                 budget_value = metadata.get('budget', 500000)
-                                next_cell.value = f"{budget_value:,.0f}".replace(',', ' ')
+                                budget_cell = sheet.range((row, col + 1))
+                                budget_cell.value = to_amount(budget_value)
+                                budget_cell.number_format = AMOUNT_FORMAT
                                 logger.info(f"Budget rempli")
                         
                         # Projet
                         elif 'projet' in cell_text:
-                            next_cell = sheet.range((row, col + 1))
-                            if not next_cell.value:
-                                next_cell.value = metadata.get('projet', 'UGP')
+                            if not next_value:
+                                sheet.range((row, col + 1)).value = metadata.get('projet', 'UGP')
                                 logger.info(f"Projet rempli")
                                 
         except Exception as e:
             logger.error(f"Erreur métadonnées: {e}")
     
-    def _fill_transactions_xlwings(self, sheet, df: pd.DataFrame):
-        """Remplit les transactions avec xlwings"""
+    def _fill_transactions_xlwings(self, sheet, data):
+        """
+        Remplit les transactions avec xlwings
+        
+        Un tableau 2-D par plage de colonnes contiguës au lieu d'un appel par cellule
+        """
         try:
-            # Trouver la ligne d'en-tête
-            header_row = None
-            for row in range(1, 30):
-                cell_value = sheet.range((row, 1)).value
-                if cell_value and 'date' in str(cell_value).lower():
-                    header_row = row
-                    logger.info(f"En-tête trouvé ligne {header_row}")
-                    break
+            block = RenderBlock.ensure(data)
+            
+            # Lire la zone d'en-tête A1:N29 en un seul appel
+            grid = self._read_block(sheet, 1, 1, 29, 14)
             
-            if not header_row:
+            # Trouver la ligne d'en-tête
+            header_row = find_header_row(grid)
+            if header_row:
+                logger.info(f"En-tête trouvé ligne {header_row}")
+            else:
                 header_row = 8
             
             # Mapper les colonnes
             column_mapping = {}
-            for col in range(1, 15):
-                header_value = sheet.range((header_row, col)).value
+            for col, header_value in enumerate(grid[header_row - 1], start=1):
                 if header_value:
                     header_text = str(header_value).lower().strip()
                     
@@ -153,52 +166,38 @@ class XlwingsFiller:
             
             # Remplir les données
             start_row = header_row + 1
-            for idx, record in df.iterrows():
-                current_row = start_row + idx
-                
-                if 'Date' in column_mapping:
-                    sheet.range((current_row, column_mapping['Date'])).value = record.get('Date', '')
-                
-                if 'Transaction' in column_mapping:
-                    sheet.range((current_row, column_mapping['Transaction'])).value = record.get('TransactionID', '')
-                
-                if 'Type' in column_mapping:
-                    sheet.range((current_row, column_mapping['Type'])).value = record.get('Type', 'PAIEMENT')
-                
-                if 'Statut' in column_mapping:
-                    sheet.range((current_row, column_mapping['Statut'])).value = record.get('Status', '')
-                
-                if 'Montant' in column_mapping:
-                    amount = record.get('Amount', 0)
-                    sheet.range((current_row, column_mapping['Montant'])).value = f"{amount:,.0f}".replace(',', ' ')
-                
-                if 'Frais' in column_mapping:
-                    fee = record.get('Frais', 0)
-                    sheet.range((current_row, column_mapping['Frais'])).value = f"{fee:,.0f}".replace(',', ' ')
-                
-                if 'De' in column_mapping:
-                    sheet.range((current_row, column_mapping['De'])).value = record.get('De', 'UGP')
-                
-                if 'Vers' in column_mapping:
-                    sheet.range((current_row, column_mapping['Vers'])).value = record.get('Vers', '')
-                
-                if 'Beneficiaire' in column_mapping:
-                    sheet.range((current_row, column_mapping['Beneficiaire'])).value = record.get('Beneficiaire', '')
+            if len(block) > 0:
+                last_row = start_row + len(block) - 1
+                
+                for first_col, keys in contiguous_runs(column_mapping):
+                    last_col = first_col + len(keys) - 1
+                    sheet.range((start_row, first_col), (last_row, last_col)).value = \
+                        [list(row) for row in block.header_rows(keys)]
+                
+                # Montants numériques : un format "# ##0" par colonne
+                for key in ('Montant', 'Frais'):
+                    if key in column_mapping:
+                        col = column_mapping[key]
+                        sheet.range((start_row, col), (last_row, col)).number_format = AMOUNT_FORMAT
             
             # Totaux
-            if len(df) > 0:
-                total_row = start_row + len(df) + 1
+            if len(block) > 0:
+                total_row = start_row + len(block) + 1
                 
                 if 'Statut' in column_mapping:
                     sheet.range((total_row, column_mapping['Statut'])).value = "TOTAL:"
                 
                 if 'Montant' in column_mapping:
-                    total_amount = df['Amount'].sum()
-                    sheet.range((total_row, column_mapping['Montant'])).value = f"{total_amount:,.0f}".replace(',', ' ')
+                    total_amount = block.total_amount
+                    total_cell = sheet.range((total_row, column_mapping['Montant']))
+                    total_cell.value = total_amount
+                    total_cell.number_format = AMOUNT_FORMAT
                 
                 if 'Frais' in column_mapping:
-                    total_fees = df['Frais'].sum()
-                    sheet.range((total_row, column_mapping['Frais'])).value = f"{total_fees:,.0f}".replace(',', ' ')
+                    total_fees = block.total_fees
+                    total_cell = sheet.range((total_row, column_mapping['Frais']))
+                    total_cell.value = total_fees
+                    total_cell.number_format = AMOUNT_FORMAT
                 
                 logger.info(f"Totaux ajoutés")
                 
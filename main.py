@@ -30,6 +30,7 @@ logger = logging.getLogger(__name__)
 from core.file_handler import FileHandler
 from core.data_processor import DataProcessor
 from core.report_generator import ReportGenerator
+from core.input_loader import InputLoader
 
 # Configuration du thème
 ctk.set_appearance_mode("dark")
@@ -404,20 +405,20 @@ class UGPReporterApp(ctk.CTk):
             # Étape 1: Chargement des fichiers
             self.update_progress(0.2, "Chargement des fichiers...")
             
-            bulk_df, bulk_metadata = file_handler.read_bulk_report(
-                self.file_paths['bulk'].get()
-            )
-            self.log(f"✅ {len(bulk_df)} transactions chargées")
-            
-            export_df = file_handler.read_export_file(
-                self.file_paths['export'].get()
-            )
-            self.log(f"✅ {len(export_df)} bénéficiaires chargés")
-            
-            fees_df = file_handler.read_fees_file(
+            # Les trois fichiers sont lus en même temps
+            inputs = InputLoader(file_handler).load(
+                self.file_paths['bulk'].get(),
+                self.file_paths['export'].get(),
                 self.file_paths['fees'].get()
             )
-            self.log(f"✅ Table des frais chargée")
+            bulk_df, bulk_metadata = inputs.bulk_df, inputs.bulk_metadata
+            export_df, fees_df = inputs.export_df, inputs.fees_df
+            self.log(f"✅ {len(bulk_df)} transactions chargées ({inputs.timings['bulkreport']:.1f}s)")
+            self.log(f"✅ {len(export_df)} bénéficiaires chargés ({inputs.timings['export']:.1f}s)")
+            if fees_df is not None:
+                self.log(f"✅ Table des frais chargée ({inputs.timings['frais']:.1f}s)")
+            elif 'frais' in inputs.errors:
+                self.log(f"⚠️ Table des frais illisible, taux par défaut: {inputs.errors['frais']}")
             
             # Étape 2: Traitement des données
             self.update_progress(0.5, "Traitement des données...")
@@ -444,9 +445,8 @@ class UGPReporterApp(ctk.CTk):
             # Étape 3: Génération du rapport
             self.update_progress(0.8, "Génération du rapport Excel...")
             
-            # Générer le nom du fichier
-            date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_name = f"Rapport_{metadata['projet']}_{date_str}.xlsx"
+            # Générer le nom du fichier (unique même si deux rapports partent la même seconde)
+            output_name = generator.output_manager.unique_name(f"Rapport_{metadata['projet']}")
             
             # Générer le rapport
             output_path = generator.generate_report(
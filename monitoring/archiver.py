@@ -0,0 +1,204 @@
+"""
+Archivage des fichiers traités (ou en erreur)
+Les fichiers sont déplacés par os.replace (aucune copie sur le même disque,
+copie seulement entre deux volumes), les ensembles archivés sont compressés
+en arrière-plan et les archives plus anciennes que la rétention supprimées
+"""
+import os
+import time
+import errno
+import queue
+import shutil
+import zipfile
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def move_file(source: Path, target: Path) -> bool:
+    """
+    Déplace un fichier : renommage atomique, copie seulement entre volumes (EXDEV)
+
+    Un fichier encore ouvert (Windows) est copié et laissé en place.
+
+    Returns:
+        True si le fichier a été renommé, False s'il a fallu le copier
+    """
+    try:
+        os.replace(source, target)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV and not isinstance(e, PermissionError):
+            raise
+    shutil.copy2(source, target)
+    try:
+        os.remove(source)
+    except OSError:
+        logger.warning(f"  [WARNING] Impossible de supprimer: {source.name} (fichier peut-être encore ouvert)")
+    return False
+
+
+class Archiver:
+    """Déplacement des ensembles, compression différée et rétention"""
+
+    def __init__(self, compress: bool = True, retention_days: Optional[float] = 30,
+                 compression_level: int = 6, prune_interval: float = 3600):
+        """
+        Args:
+            compress: Compresser chaque ensemble archivé (zip) en arrière-plan
+            retention_days: Âge maximal des archives (None = conservées)
+            compression_level: Niveau de compression zlib (1-9)
+            prune_interval: Intervalle minimal entre deux purges (secondes)
+        """
+        self.compress = compress
+        self.retention_days = retention_days
+        self.compression_level = compression_level
+        self.prune_interval = prune_interval
+        self.roots: List[Path] = []
+        self._queue: 'queue.Queue[Optional[Path]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self.stats = {'moved': 0, 'copied': 0, 'compressed': 0, 'pruned': 0}
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> 'Archiver':
+        """Construit l'archiveur depuis la section 'advanced' de la configuration"""
+        advanced = (config or {}).get('advanced', {})
+        return cls(
+            compress=advanced.get('enable_compression', True),
+            retention_days=advanced.get('backup_retention_days', 30),
+            compression_level=advanced.get('compression_level', 6)
+        )
+
+    def archive(self, files: Dict[str, Optional[str]], root: Path) -> Optional[Path]:
+        """
+        Déplace un ensemble de fichiers dans <root>/<horodatage>/
+
+        Returns:
+            Dossier de l'ensemble archivé (None si aucun fichier n'existait)
+        """
+        sources = [Path(path) for path in files.values() if path and os.path.exists(path)]
+        if not sources:
+            return None
+        root = Path(root)
+        self.add_root(root)
+        folder = self._unique_folder(root)
+
+        for source in sources:
+            try:
+                renamed = move_file(source, folder / source.name)
+                self._count('moved' if renamed else 'copied')
+                logger.info(f"  [ARCHIVED] {source.name} -> {root.name}/{folder.name}/")
+            except Exception as e:
+                logger.warning(f"  [WARNING] Erreur archivage {source.name}: {e}")
+
+        if self.compress:
+            self._enqueue(folder)
+        return folder
+
+    def add_root(self, root: Path):
+        """Dossier d'archives soumis à la rétention"""
+        root = Path(root)
+        if root not in self.roots:
+            self.roots.append(root)
+
+    @staticmethod
+    def _unique_folder(root: Path) -> Path:
+        """Dossier horodaté (suffixé si deux ensembles partent la même seconde)"""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        root.mkdir(parents=True, exist_ok=True)
+        for index in range(1000):
+            folder = root / (stamp if index == 0 else f"{stamp}_{index}")
+            try:
+                folder.mkdir()
+                return folder
+            except FileExistsError:
+                continue
+        raise FileExistsError(f"Aucun dossier d'archive libre pour {stamp}")
+
+    def _enqueue(self, folder: Path):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='archiver', daemon=True)
+                self._thread.start()
+        self._queue.put(folder)
+
+    def _worker(self):
+        while True:
+            folder = self._queue.get()
+            try:
+                if folder is None:
+                    return
+                self._compress(folder)
+            except Exception as e:
+                logger.warning(f"  [WARNING] Compression impossible de {folder}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _compress(self, folder: Path):
+        """Remplace le dossier de l'ensemble par <dossier>.zip (écrit puis renommé)"""
+        target = folder.with_suffix('.zip')
+        temp = folder.with_name(f"~{folder.name}.zip")
+        with zipfile.ZipFile(temp, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=self.compression_level) as archive:
+            for path in sorted(folder.iterdir()):
+                archive.write(path, path.name)
+        os.replace(temp, target)
+        shutil.rmtree(folder, ignore_errors=True)
+        self._count('compressed')
+        logger.debug(f"  [COMPRESSED] {target.name}")
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Supprime les archives plus anciennes que la rétention"""
+        if not self.retention_days:
+            return 0
+        now = now or time.time()
+        cutoff = now - self.retention_days * 86400
+        removed = 0
+        for root in self.roots:
+            if not root.exists():
+                continue
+            for entry in root.iterdir():
+                try:
+                    if entry.stat().st_mtime >= cutoff or entry.name.startswith('~'):
+                        continue
+                    if entry.is_dir():
+                        shutil.rmtree(entry)
+                    else:
+                        entry.unlink()
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"  [WARNING] Archive non supprimée {entry.name}: {e}")
+        if removed:
+            self._count('pruned', removed)
+            logger.info(f"[CLEANUP] {removed} archive(s) de plus de {self.retention_days} jours supprimée(s)")
+        return removed
+
+    def prune_if_due(self) -> int:
+        """Purge au plus une fois par prune_interval (appelée par la vérification périodique)"""
+        now = time.time()
+        if now - self._last_prune < self.prune_interval:
+            return 0
+        self._last_prune = now
+        return self.prune(now)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def flush(self):
+        """Attend la fin des compressions en cours"""
+        self._queue.join()
+
+    def stop(self):
+        """Termine les compressions en file puis arrête le worker"""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
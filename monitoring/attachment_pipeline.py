@@ -0,0 +1,246 @@
+"""
+Pipeline des pièces jointes email
+Encodage base64 en continu depuis le disque, compression ZIP, contrôle de taille
+(lien local pour les fichiers trop volumineux) et envoi SMTP par blocs
+"""
+import os
+import re
+import uuid
+import base64
+import shutil
+import smtplib
+import logging
+import zipfile
+import tempfile
+import mimetypes
+import threading
+from pathlib import Path
+from email.policy import compat32
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.utils import getaddresses
+from typing import Dict, List, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Politique du package email (celle des MIMEText du projet) avec fins de ligne SMTP
+SMTP_POLICY = compat32.clone(linesep='\r\n')
+
+# 57 octets bruts = une ligne base64 de 76 caractères
+BASE64_LINE_BYTES = 57
+READ_CHUNK_SIZE = BASE64_LINE_BYTES * 1024 * 16  # ~912 Ko lus à la fois
+SEND_CHUNK_SIZE = 64 * 1024
+
+
+class EncodedAttachment:
+    """Pièce jointe déjà encodée en base64 dans un fichier du spool"""
+
+    def __init__(self, name: str, encoded_path: str, size: int):
+        self.name = name
+        self.encoded_path = encoded_path
+        self.size = size
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        maintype, subtype = content_type.split('/', 1)
+        part = MIMEBase(maintype, subtype)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', 'attachment', filename=name)
+        # En-têtes de la partie MIME (le contenu est lu depuis le disque à l'envoi)
+        self.header_bytes = part.as_bytes(policy=SMTP_POLICY).rstrip(b'\r\n') + b'\r\n\r\n'
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        with open(self.encoded_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(SEND_CHUNK_SIZE), b''):
+                yield chunk
+
+
+class PreparedAttachments:
+    """Résultat du pipeline pour un ensemble de fichiers"""
+
+    def __init__(self, attachments: List[EncodedAttachment], links: List[Tuple[str, str]]):
+        self.attachments = attachments
+        self.links = links  # (nom, lien local) des fichiers trop volumineux
+
+    def links_html(self) -> str:
+        """Bloc HTML listant les fichiers remplacés par un lien"""
+        if not self.links:
+            return ''
+        items = ''.join(f'<li><a href="{url}">{name}</a></li>' for name, url in self.links)
+        return ('<div class="stats"><p><strong>📁 Fichiers trop volumineux pour l\'email, '
+                f'disponibles sur le partage:</strong></p><ul>{items}</ul></div>')
+
+
+class AttachmentPipeline:
+    """
+    Prépare les pièces jointes d'un lot d'envoi
+
+    Chaque ensemble de fichiers est traité une seule fois par lot : compression
+    éventuelle dans un ZIP temporaire, puis encodage base64 par blocs dans un
+    fichier du spool. La mémoire utilisée ne dépend pas de la taille des fichiers.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        settings = settings or {}
+        self.max_size = int(settings.get('max_attachment_size_mb', 25) * 1024 * 1024)
+        self.compress = settings.get('compress_attachments', True)
+        self.compression_level = settings.get('compression_level', 6)
+        self.link_dir = Path(settings.get('oversize_link_dir', './outputs/partage'))
+
+        self.work_dir = Path(tempfile.mkdtemp(prefix='ugp_mail_'))
+        self._lock = threading.Lock()
+        self._prepared: Dict[Tuple[str, ...], PreparedAttachments] = {}
+        self.stats = {'encoded': 0, 'zipped': 0, 'linked': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    def prepare(self, paths: List[str]) -> PreparedAttachments:
+        """Prépare (une seule fois par lot) un ensemble de pièces jointes"""
+        key = tuple(paths)
+        with self._lock:
+            if key not in self._prepared:
+                self._prepared[key] = self._prepare(paths)
+            return self._prepared[key]
+
+    def _prepare(self, paths: List[str]) -> PreparedAttachments:
+        files = [Path(p) for p in paths if os.path.exists(p)]
+        for missing in set(paths) - {str(p) for p in files}:
+            logger.warning(f"  ⚠️ Pièce jointe introuvable: {missing}")
+        if not files:
+            return PreparedAttachments([], [])
+
+        total_size = sum(f.stat().st_size for f in files)
+        if self.compress and (len(files) > 1 or total_size > self.max_size):
+            files = [self._zip(files)]
+
+        attachments, links = [], []
+        for file_path in files:
+            size = file_path.stat().st_size
+            if size > self.max_size:
+                links.append((file_path.name, self._publish_link(file_path)))
+            else:
+                attachments.append(self._encode(file_path))
+        return PreparedAttachments(attachments, links)
+
+    def _zip(self, files: List[Path]) -> Path:
+        """Compresse les fichiers dans un ZIP temporaire (écriture par blocs)"""
+        name = f"{files[0].stem}.zip" if len(files) == 1 else f"Rapports_UGP_{uuid.uuid4().hex[:6]}.zip"
+        zip_path = self.work_dir / name
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED,
+                             compresslevel=self.compression_level) as archive:
+            for file_path in files:
+                archive.write(file_path, arcname=file_path.name)
+        self.stats['zipped'] += 1
+        logger.info(f"  🗜️ {len(files)} fichier(s) compressé(s): {zip_path.name} "
+                    f"({zip_path.stat().st_size / 1024:.0f} Ko)")
+        return zip_path
+
+    def _encode(self, file_path: Path) -> EncodedAttachment:
+        """Encode le fichier en base64 (lignes CRLF de 76 caractères) bloc par bloc"""
+        encoded_path = self.work_dir / f"{uuid.uuid4().hex[:8]}.b64"
+        with open(file_path, 'rb') as source, open(encoded_path, 'wb') as target:
+            for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b''):
+                target.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+        self.stats['encoded'] += 1
+        logger.info(f"  📎 Pièce jointe: {file_path.name}")
+        return EncodedAttachment(file_path.name, str(encoded_path), file_path.stat().st_size)
+
+    def _publish_link(self, file_path: Path) -> str:
+        """
+        Copie le fichier trop volumineux sur le partage local et retourne son lien
+
+        Chaque copie a son propre sous-dossier : deux rapports de même nom ne
+        s'écrasent pas et le lien d'un email déjà envoyé reste valide
+        """
+        target_dir = self.link_dir / uuid.uuid4().hex[:12]
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / file_path.name
+        shutil.copy2(file_path, target)
+        self.stats['linked'] += 1
+        logger.warning(f"  ⚠️ {file_path.name} dépasse {self.max_size // (1024 * 1024)} Mo: remplacé par un lien")
+        return target.resolve().as_uri()
+
+    def cleanup(self):
+        """Supprime les fichiers temporaires du lot"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class StreamedMessage:
+    """
+    Message multipart envoyé par blocs
+
+    Le squelette (en-têtes + HTML) est généré par le package email ; les
+    pièces jointes encodées sont lues depuis le disque au moment du DATA.
+    """
+
+    def __init__(self, msg: MIMEMultipart, attachments: List[EncodedAttachment] = None):
+        self.msg = msg
+        self.attachments = attachments or []
+        self.boundary = f"===============UGP{uuid.uuid4().hex}=="
+        msg.set_boundary(self.boundary)
+
+    def __getitem__(self, name):
+        return self.msg[name]
+
+    @property
+    def from_addr(self) -> str:
+        return getaddresses([self.msg['From']])[0][1]
+
+    @property
+    def to_addrs(self) -> List[str]:
+        fields = [self.msg[name] for name in ('To', 'Cc') if self.msg[name]]
+        return [address for _, address in getaddresses(fields) if address]
+
+    def _prefix(self) -> bytes:
+        """Squelette sérialisé sans la frontière finale (dot-stuffing SMTP appliqué)"""
+        skeleton = self.msg.as_bytes(policy=SMTP_POLICY)
+        prefix = skeleton[:skeleton.rindex(self._closing())]
+        return re.sub(rb'(?m)^\.', b'..', prefix)
+
+    def _closing(self) -> bytes:
+        return b'--' + self.boundary.encode() + b'--'
+
+    def iter_chunks(self, prefix: Optional[bytes] = None) -> Iterator[bytes]:
+        """Contenu du message, pièces jointes lues par blocs depuis le spool"""
+        yield prefix if prefix is not None else self._prefix()
+        for attachment in self.attachments:
+            yield b'--' + self.boundary.encode() + b'\r\n' + attachment.header_bytes
+            yield from attachment.iter_chunks()
+        yield self._closing() + b'\r\n'
+
+    def as_bytes(self) -> bytes:
+        return b''.join(self.iter_chunks())
+
+    def send(self, server: smtplib.SMTP) -> Dict:
+        """Envoie le message sur une session SMTP ouverte (commande DATA par blocs)"""
+        # Sérialisé avant MAIL FROM : une erreur ici laisse la session utilisable
+        prefix = self._prefix()
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(self.from_addr)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, self.from_addr)
+
+        refused = {}
+        for address in self.to_addrs:
+            code, response = server.rcpt(address)
+            if code not in (250, 251):
+                refused[address] = (code, response)
+        if len(refused) == len(self.to_addrs):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, response = server.docmd('DATA')
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+        for chunk in self.iter_chunks(prefix):
+            server.send(chunk)
+        server.send(b'.\r\n')
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+        return refused
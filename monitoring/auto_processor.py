@@ -3,10 +3,13 @@ Processeur automatique principal qui orchestre tout le workflow
 """
 import os
 import sys
+import time
+import shutil
 import logging
+import functools
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 # Ajouter le dossier parent au path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -14,9 +17,20 @@ sys.path.append(str(Path(__file__).parent.parent))
 from core.file_handler import FileHandler
 from core.data_processor import DataProcessor
 from core.report_generator import ReportGenerator
+from core.render_block import RenderBlock
+from core.output_manager import new_job_id
+from core.stage_cache import StageCache, code_version
+from core.input_loader import InputLoader
 from monitoring.pdf_converter import ProfessionalPDFConverter
 from monitoring.email_sender import ProfessionalEmailSender
+from monitoring.email_outbox import EmailOutbox, EmailDispatcher
+from monitoring.summary_store import SummaryStore
+from monitoring.job_journal import JobJournal, JobRecord, STAGES, STATUS_RUNNING
+from monitoring.input_prefetcher import InputPrefetcher
+from monitoring.stage_pipeline import StagePipeline
 from monitoring.file_watcher_fixed import SmartFileWatcher
+from monitoring.archiver import Archiver
+from monitoring.job_isolation import IsolatedJobRunner
 import json
 
 # Configuration du logging avec support UTF-8
@@ -35,12 +49,14 @@ logger = logging.getLogger(__name__)
 class AutoProcessor:
     """Orchestrateur principal du traitement automatique"""
     
-    def __init__(self, config_path: str = "config/auto_processor_config.json"):
+    def __init__(self, config_path: str = "config/auto_processor_config.json", worker: bool = False):
         """
         Initialise le processeur automatique
         
         Args:
             config_path: Chemin vers la configuration
+            worker: Processeur d'un processus de travail : exécute les jobs et dépose
+                    les emails, sans dispatcher, surveillant ni reprise de la boîte d'envoi
         """
         self.config = self._load_config(config_path)
         
@@ -49,9 +65,29 @@ class AutoProcessor:
         self.data_processor = DataProcessor()
         self.data_processor.use_smart_processing = True
         self.report_generator = ReportGenerator(self.config)
+        # Mémoïsation des étapes (advanced.enable_cache / cache_ttl)
+        self.stage_cache = StageCache.from_config(self.config)
+        self.data_processor.smart_processor.stage_cache = self.stage_cache
+        self.report_generator.stage_cache = self.stage_cache
+        # Lecture anticipée de chaque fichier dès son arrivée
+        self.prefetcher = InputPrefetcher(self.file_handler, self.stage_cache)
+        self.input_loader = InputLoader(self.file_handler, reader=self.prefetcher.take)
+        self.output_manager = self.report_generator.output_manager
         self.pdf_converter = ProfessionalPDFConverter()
         self.email_sender = ProfessionalEmailSender()
-        self.file_watcher = SmartFileWatcher()
+        email_settings = self.email_sender.config.get('settings', {})
+        # Délai de dépôt : fenêtre de digest pour regrouper les rapports d'une rafale
+        self.email_delay = email_settings.get('digest_window_seconds', 0)
+        # Les processus de travail déposent seulement : l'envoi (et la reprise des
+        # messages interrompus) reste au dispatcher du démon
+        self.email_outbox = EmailOutbox(email_settings.get('outbox_dir', 'outbox'), recover=not worker)
+        self.summary_store = SummaryStore.from_config(self.config)
+        self.journal = JobJournal(self.config['processing'].get('journal_dir', './outputs/journal'))
+        # Pipeline des étapes, démarré avec le monitoring (traitement séquentiel sinon)
+        self.pipeline: Optional[StagePipeline] = None
+        # Jobs exécutés dans des processus fils (processing.isolation.enabled)
+        self.stage_listener = None
+        self.isolation: Optional[IsolatedJobRunner] = None
         
         # Statistiques de traitement
         self.processing_stats = {
@@ -61,6 +97,32 @@ class AutoProcessor:
             'last_process': None
         }
         
+        if worker:
+            # Surcharges par inbox transmises par le démon (isolated_processor)
+            self.email_dispatcher: Optional[EmailDispatcher] = None
+            self.file_watcher: Optional[SmartFileWatcher] = None
+            self.inboxes: Dict[str, Dict] = {}
+            return
+        
+        self.email_dispatcher = EmailDispatcher(self.email_sender, self.email_outbox)
+        self.file_watcher = SmartFileWatcher()
+        # Archives des entrées : compression et rétention (advanced.enable_compression / backup_retention_days)
+        archiver = Archiver.from_config(self.config)
+        archiver.roots = self.file_watcher.archiver.roots
+        self.file_watcher.archiver = archiver
+        # Surcharges par inbox : métadonnées du rapport et partenaires destinataires
+        self.inboxes = {
+            name: {'metadata': inbox.metadata, 'partners': inbox.partners}
+            for name, inbox in self.file_watcher.inboxes.items()
+        }
+        for name, settings in self.inboxes.items():
+            # Destinataires introuvables signalés dès le démarrage
+            if settings['partners'] is not None and not self.email_sender.resolve_partners(settings['partners']):
+                logger.warning(f"⚠️ Inbox {name}: aucun partenaire destinataire, ses rapports ne seront envoyés à personne")
+        if self.config['processing'].get('isolation', {}).get('enabled'):
+            self.isolation = IsolatedJobRunner.from_config(
+                self.config, functools.partial(isolated_processor, config_path, self.inboxes))
+        
         logger.info("🚀 AutoProcessor initialisé et prêt")
     
     def _load_config(self, config_path: str) -> dict:
@@ -69,12 +131,37 @@ class AutoProcessor:
             'preferences': {
                 'output_folder': './outputs'
             },
+            'output': {
+                'fsync_policy': 'file',
+                'manifest': 'manifest.jsonl',
+                'summary_db': 'summaries.db'
+            },
             'processing': {
                 'auto_retry': True,
                 'max_retries': 3,
                 'cleanup_after': True,
                 'generate_pdf': True,
-                'send_email': True
+                'send_email': True,
+                'journal_dir': './outputs/journal',
+                'pipeline': {
+                    'parse_workers': 2,
+                    'render_workers': 2,
+                    'email_workers': 2
+                },
+                'isolation': {
+                    'enabled': False,
+                    'workers': 2,
+                    'memory_limit_mb': 4096,  # Espace d'adressage (RLIMIT_AS), pas la mémoire résidente
+                    'max_jobs_per_worker': 20,
+                    'stage_timeouts': {'read': 300, 'process': 600, 'report': 600,
+                                       'pdf': 300, 'email': 120}
+                }
+            },
+            'advanced': {
+                'enable_cache': True,
+                'cache_ttl': 3600,
+                'cache_dir': './cache/stages',
+                'cache_max_size_mb': 500
             },
             'metadata': {
                 'date_paiement': datetime.now().strftime('%d/%m/%Y'),
@@ -102,127 +189,53 @@ class AutoProcessor:
             else:
                 default[key] = value
     
-    def process_files(self, files: Dict[str, str]) -> Dict:
+    def process_files(self, files: Dict[str, str], job_id: Optional[str] = None,
+                      inbox: Optional[str] = None) -> Dict:
         """
         Traite un ensemble de fichiers complet
         
         Args:
             files: Dictionnaire avec les chemins des fichiers
                   {'bulkreport': ..., 'export': ..., 'frais': ...}
+            job_id: Job du journal à reprendre (nouveau job si None)
+            inbox: Inbox d'origine (métadonnées et partenaires propres)
         
         Returns:
             Dictionnaire avec le résultat du traitement
         """
+        if self.isolation is not None:
+            return self._process_isolated(files, job_id, inbox)
+        
         logger.info("="*70)
         logger.info(" DÉBUT DU TRAITEMENT AUTOMATIQUE")
         logger.info("="*70)
         
+        job = self.journal.load(job_id) if job_id else None
+        if job is None:
+            job = self.journal.start(job_id or new_job_id(), files, inbox=inbox)
+        else:
+            logger.info(f"🔁 Reprise du job {job.job_id} à l'étape '{job.next_stage()}'")
+        
         result = {
             'success': False,
             'error': None,
             'report_path': None,
             'pdf_path': None,
             'email_sent': False,
+            'email_queued': False,
             'timestamp': datetime.now(),
-            'stats': {}
+            'stats': {},
+            'job_id': job.job_id
         }
         
         try:
-            # 1. LECTURE DES FICHIERS
-            logger.info("\n📁 ÉTAPE 1: Lecture des fichiers")
-            
-            bulk_df, metadata = self.file_handler.read_bulk_report(files['bulkreport'])
-            logger.info(f"  ✓ BulkReport: {len(bulk_df)} transactions")
-            
-            export_df = self.file_handler.read_export_file(files['export'])
-            logger.info(f"  ✓ Export: {len(export_df)} bénéficiaires")
-            
-            fees_df = None
-            if files.get('frais') and files['frais']:
-                try:
-                    fees_df = self.file_handler.read_fees_file(files['frais'])
-                    logger.info(f"  ✓ Frais: Table chargée")
-                except:
-                    logger.warning(f"  ⚠ Frais: Utilisation du taux par défaut")
-            
-            # 2. TRAITEMENT DES DONNÉES
-            logger.info("\n🔄 ÉTAPE 2: Traitement des données")
-            
-            processed_df, errors = self.data_processor.process_transactions(
-                bulk_df, export_df, fees_df if fees_df is not None else None,
-                self.config['metadata']
-            )
-            
-            logger.info(f"  ✓ {len(processed_df)} transactions traitées")
-            if errors:
-                logger.warning(f"  ⚠ {len(errors)} avertissements")
-            
-            # 3. GÉNÉRATION DU RAPPORT EXCEL
-            logger.info("\n📊 ÉTAPE 3: Génération du rapport Excel")
-            
-            report_name = f"Rapport_AUTO_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            report_path = self.report_generator.generate_report(
-                processed_df,
-                self.config['metadata'],
-                report_name
-            )
-            
-            if report_path is None:
-                raise Exception("Échec de la génération du rapport Excel")
-                
-            result['report_path'] = report_path
-            logger.info(f"  ✓ Rapport généré: {Path(report_path).name}")
-            
-            # Statistiques pour email
-            result['stats'] = {
-                'transaction_count': len(processed_df),
-                'total_amount': processed_df['Amount'].sum() if 'Amount' in processed_df.columns else 0,
-                'total_fees': processed_df['Frais'].sum() if 'Frais' in processed_df.columns else 0,
-                'unique_beneficiaries': processed_df['Beneficiaire'].nunique() if 'Beneficiaire' in processed_df.columns else 0,
-                'date': self.config['metadata']['date_paiement']
-            }
-            
-            # 4. CONVERSION EN PDF
-            if self.config['processing']['generate_pdf']:
-                logger.info("\n📄 ÉTAPE 4: Conversion en PDF")
-                
-                pdf_result = self.pdf_converter.convert_excel_to_pdf(
-                    report_path,
-                    options={
-                        'quality': 'standard',
-                        'orientation': 'portrait',
-                        'fit_to_page': True,
-                        'center_horizontally': True
-                    }
-                )
-                
-                if pdf_result['success']:
-                    result['pdf_path'] = pdf_result['pdf_path']
-                    logger.info(f"  ✓ PDF généré: {Path(pdf_result['pdf_path']).name}")
-                else:
-                    logger.warning(f"  ⚠ Échec conversion PDF: {pdf_result.get('error')}")
+            if self.pipeline is not None and self.pipeline.running:
+                # Mode démon : le job traverse les voies du pipeline avec les autres
+                self.pipeline.submit(job, result).result()
+            else:
+                self._run_with_retries(job, result)
             
-            # 5. ENVOI PAR EMAIL
-            if self.config['processing']['send_email'] and result['pdf_path']:
-                logger.info("\n📧 ÉTAPE 5: Envoi par email")
-                
-                attachments = []
-                if result['pdf_path']:
-                    attachments.append(result['pdf_path'])
-                # Optionnel: ajouter aussi l'Excel
-                # attachments.append(result['report_path'])
-                
-                email_results = self.email_sender.send_to_all_partners(
-                    result['stats'],
-                    attachments
-                )
-                
-                result['email_sent'] = len(email_results['success']) > 0
-                
-                if result['email_sent']:
-                    logger.info(f"  ✓ Emails envoyés: {len(email_results['success'])} destinataires")
-                else:
-                    logger.warning(f"  ⚠ Échec envoi emails")
+            job.finish()
             
             # Succès global
             result['success'] = True
@@ -230,8 +243,9 @@ class AutoProcessor:
             logger.info("\n✅ TRAITEMENT TERMINÉ AVEC SUCCÈS")
             
         except Exception as e:
-            logger.error(f"\n❌ ERREUR: {str(e)}")
-            result['error'] = str(e)
+            logger.error(f"\n❌ ERREUR: {str(e) or type(e).__name__}")
+            logger.info(f"  → Reprise possible: AutoProcessor.resume_job('{job.job_id}')")
+            result['error'] = str(e) or type(e).__name__
             self.processing_stats['failed'] += 1
             
             # Tentative de notification d'erreur
@@ -250,6 +264,281 @@ class AutoProcessor:
         
         return result
     
+    def _process_isolated(self, files: Dict[str, str], job_id: Optional[str],
+                          inbox: Optional[str]) -> Dict:
+        """Exécute le job dans un processus fils (mémoire et durée des étapes bornées)"""
+        job_id = job_id or new_job_id()
+        logger.info(f"🧩 Job {job_id} confié à un processus de travail")
+        result = self.isolation.run(files, job_id=job_id, inbox=inbox)
+        
+        if not result.get('success'):
+            # Fils tué (délai, mémoire) : le job reste reprenable, mais pas au redémarrage
+            job = self.journal.load(job_id)
+            if job is not None and job.status == STATUS_RUNNING:
+                job.fail(result.get('error'))
+            logger.info(f"  → Reprise possible: AutoProcessor.resume_job('{job_id}')")
+        
+        elif result.get('email_queued'):
+            # Email déposé par le fils : envoyé par le dispatcher du démon
+            self._wake_dispatcher()
+        
+        self.processing_stats['total'] += 1
+        self.processing_stats['success' if result.get('success') else 'failed'] += 1
+        self.processing_stats['last_process'] = datetime.now()
+        return result
+    
+    def _wake_dispatcher(self):
+        """Signale un email déposé au dispatcher (aucun dans un processus de travail)"""
+        if self.email_dispatcher is None:
+            return
+        self.email_dispatcher.start()
+        self.email_dispatcher.wake()
+    
+    def _run_with_retries(self, job: JobRecord, result: Dict):
+        """Exécute le job sur le thread appelant ; chaque tentative repart de la première étape non terminée"""
+        processing = self.config['processing']
+        attempts = 1 + (processing.get('max_retries', 0) if processing.get('auto_retry') else 0)
+        for attempt in range(1, attempts + 1):
+            try:
+                self._run_stages(job, result)
+                return
+            except Exception as e:
+                job.fail(e)
+                if attempt == attempts:
+                    raise
+                delay = processing.get('retry_delay', 5)
+                logger.warning(f"🔁 Tentative {attempt}/{attempts} échouée ({e}), "
+                               f"reprise à l'étape '{job.next_stage()}' dans {delay}s")
+                time.sleep(delay)
+    
+    def _run_stages(self, job: JobRecord, result: Dict):
+        """Exécute les étapes non terminées ; les autres restituent leurs résultats du journal"""
+        context = {'keys': {}}
+        self._restore_stages(job, context, result)
+        for stage in STAGES:
+            self._run_stage(job, stage, context, result)
+    
+    def _restore_stages(self, job: JobRecord, context: Dict, result: Dict):
+        """Restitue résultats et clés des étapes déjà terminées"""
+        for stage in STAGES:
+            if job.is_done(stage):
+                result.update(job.artifacts(stage).get('result', {}))
+                context['keys'].update(job.artifacts(stage).get('keys', {}))
+    
+    def _run_stage(self, job: JobRecord, stage: str, context: Dict, result: Dict):
+        if not job.is_done(stage):
+            if self.stage_listener is not None:
+                # Processus fils : l'étape annoncée arme son délai côté démon
+                self.stage_listener(job.job_id, stage)
+            getattr(self, f'_stage_{stage}')(job, context, result)
+    
+    def start_pipeline(self) -> StagePipeline:
+        """Démarre le pipeline des étapes (jobs simultanés, concurrence bornée par voie)"""
+        if self.pipeline is None:
+            self.pipeline = StagePipeline.from_config(self.config, self._run_stage, self._restore_stages)
+        self.pipeline.start()
+        return self.pipeline
+    
+    def _stage_read(self, job: JobRecord, context: Dict, result: Dict):
+        """1. Lecture des fichiers"""
+        logger.info("\n📁 ÉTAPE 1: Lecture des fichiers")
+        files = job.files
+        keys = context['keys']
+        
+        # Lectures simultanées, chacune mémoïsée par le hash du contenu ; les
+        # fichiers pré-lus par le surveillant à leur arrivée sont repris tels quels
+        inputs = self.input_loader.load(files['bulkreport'], files['export'], files.get('frais'))
+        keys.update(inputs.keys)
+        bulk_df, export_df, fees_df = inputs.bulk_df, inputs.export_df, inputs.fees_df
+        logger.info(f"  ✓ BulkReport: {len(bulk_df)} transactions ({inputs.timings['bulkreport']:.2f}s)")
+        logger.info(f"  ✓ Export: {len(export_df)} bénéficiaires ({inputs.timings['export']:.2f}s)")
+        if fees_df is not None:
+            logger.info(f"  ✓ Frais: Table chargée ({inputs.timings['frais']:.2f}s)")
+        elif 'frais' in inputs.errors:
+            logger.warning(f"  ⚠ Frais: Utilisation du taux par défaut")
+        
+        context.update(bulk_df=bulk_df, export_df=export_df, fees_df=fees_df)
+        job.complete('read', keys=dict(keys), timings=inputs.timings, errors=inputs.errors, frames={
+            'bulk': job.save_frame('bulk', bulk_df),
+            'export': job.save_frame('export', export_df),
+            'fees': job.save_frame('fees', fees_df)
+        })
+    
+    def _stage_process(self, job: JobRecord, context: Dict, result: Dict):
+        """2. Traitement des données"""
+        logger.info("\n🔄 ÉTAPE 2: Traitement des données")
+        
+        if 'bulk_df' not in context:
+            context.update(
+                bulk_df=job.load_frame('read', 'bulk'),
+                export_df=job.load_frame('read', 'export'),
+                fees_df=job.load_frame('read', 'fees')
+            )
+        
+        keys = context['keys']
+        processed_df, errors = self.data_processor.process_transactions(
+            context['bulk_df'], context['export_df'], context['fees_df'],
+            self._job_metadata(job),
+            input_keys={name: keys.get(name) for name in ('bulk', 'export', 'fees')}
+        )
+        keys['processed'] = self.data_processor.last_stage_key
+        
+        logger.info(f"  ✓ {len(processed_df)} transactions traitées")
+        if errors:
+            logger.warning(f"  ⚠ {len(errors)} avertissements")
+        
+        context['processed_df'] = processed_df
+        job.complete('process', keys={'processed': keys['processed']},
+                     frames={'processed': job.save_frame('processed', processed_df)})
+    
+    def _stage_report(self, job: JobRecord, context: Dict, result: Dict):
+        """3. Génération du rapport Excel"""
+        logger.info("\n📊 ÉTAPE 3: Génération du rapport Excel")
+        
+        processed_df = context.get('processed_df')
+        if processed_df is None:
+            processed_df = job.load_frame('process', 'processed')
+        
+        # Bloc de rendu construit une seule fois : writers et statistiques le partagent
+        block = RenderBlock.from_dataframe(processed_df)
+        metadata = self._job_metadata(job)
+        
+        report_name = self.output_manager.unique_name('Rapport_AUTO', job.job_id)
+        report_path = self.report_generator.generate_report(
+            block,
+            metadata,
+            report_name,
+            job_id=job.job_id,
+            cache_key=context['keys'].get('processed')
+        )
+        context['keys']['render'] = self.report_generator.last_render_key
+        
+        if report_path is None:
+            raise Exception("Échec de la génération du rapport Excel")
+            
+        result['report_path'] = report_path
+        logger.info(f"  ✓ Rapport généré: {Path(report_path).name}")
+        
+        # Statistiques pour email
+        result['stats'] = {
+            'transaction_count': block.count,
+            'total_amount': block.total_amount,
+            'total_fees': block.total_fees,
+            'unique_beneficiaries': block.unique_beneficiaries,
+            'date': metadata['date_paiement']
+        }
+        
+        # Agrégats quotidiens pour les résumés (un échec ne bloque pas le rapport)
+        try:
+            self.summary_store.record(block, job_id=job.job_id)
+        except Exception as e:
+            logger.warning(f"  ⚠ Agrégats non mis à jour: {e}")
+        
+        job.complete('report', keys={'render': context['keys']['render']},
+                     result={'report_path': report_path, 'stats': result['stats']})
+    
+    def _stage_pdf(self, job: JobRecord, context: Dict, result: Dict):
+        """4. Conversion en PDF"""
+        if not self.config['processing']['generate_pdf']:
+            job.complete('pdf', result={})
+            return
+        
+        logger.info("\n📄 ÉTAPE 4: Conversion en PDF")
+        report_path = result['report_path']
+        
+        # Conversion dans un fichier temporaire, publié seulement si complet
+        pdf_final = Path(report_path).with_name(f"{Path(report_path).stem}_report.pdf")
+        pdf_temp = self.output_manager.temp_path(pdf_final)
+        options = {
+            'quality': 'standard',
+            'orientation': 'portrait',
+            'fit_to_page': True,
+            'center_horizontally': True
+        }
+        
+        # Même rendu Excel + mêmes options : le PDF déjà produit est recopié
+        render_key = context['keys'].get('render')
+        pdf_key = StageCache.key('render_pdf', [render_key, options],
+                                 code_version('monitoring.pdf_converter')) if render_key else None
+        cached_pdf = self.stage_cache.lookup_file('render_pdf', pdf_key, '.pdf') if pdf_key else None
+        
+        if cached_pdf:
+            shutil.copy2(cached_pdf, pdf_temp)
+            pdf_result = {'success': True}
+        else:
+            pdf_result = self.pdf_converter.convert_excel_to_pdf(report_path, str(pdf_temp), options=options)
+            if pdf_result['success'] and pdf_key:
+                self.stage_cache.store_file('render_pdf', pdf_key, str(pdf_temp))
+        
+        if not pdf_result['success']:
+            # Étape non terminée : la prochaine tentative reconvertit le même rapport
+            self.output_manager.discard(pdf_temp)
+            raise Exception(f"Échec conversion PDF: {pdf_result.get('error')}")
+        
+        result['pdf_path'] = self.output_manager.publish(
+            pdf_temp, pdf_final, job_id=job.job_id, kind='pdf'
+        )
+        logger.info(f"  ✓ PDF généré: {pdf_final.name}")
+        job.complete('pdf', result={'pdf_path': result['pdf_path']})
+    
+    def _stage_email(self, job: JobRecord, context: Dict, result: Dict):
+        """5. Envoi par email"""
+        if not (self.config['processing']['send_email'] and result['pdf_path']):
+            job.complete('email', result={})
+            return
+        
+        logger.info("\n📧 ÉTAPE 5: Envoi par email")
+        
+        attachments = []
+        if result['pdf_path']:
+            attachments.append(result['pdf_path'])
+        # Optionnel: ajouter aussi l'Excel
+        # attachments.append(result['report_path'])
+        
+        # Déjà déposé avant un crash : ne pas envoyer deux fois
+        message_id = self.email_outbox.find_job_message(job.job_id)
+        if message_id is None:
+            # Dépôt dans la boîte d'envoi : le dispatcher envoie et réessaie en arrière-plan
+            # (retardé de la fenêtre de digest pour regrouper les rapports d'une rafale)
+            message_id = self.email_outbox.enqueue(
+                result['stats'], attachments, job_id=job.job_id,
+                delay=self.email_delay,
+                recipients=self._job_inbox(job).get('partners')
+            )
+        self._wake_dispatcher()
+        
+        result['email_queued'] = True
+        logger.info(f"  ✓ Email #{message_id} en file d'attente pour les partenaires")
+        job.complete('email', result={'email_queued': True}, message_id=message_id)
+    
+    def resume_job(self, job_id: str) -> Dict:
+        """Relance manuellement un job du journal à partir de sa première étape incomplète"""
+        job = self.journal.load(job_id)
+        if job is None:
+            raise ValueError(f"Job inconnu dans le journal: {job_id}")
+        return self.process_files(job.files, job_id=job_id, inbox=job.inbox)
+    
+    def _job_inbox(self, job: JobRecord) -> Dict:
+        """Paramètres de l'inbox d'origine du job ({} hors monitoring multi-inbox)"""
+        return self.inboxes.get(job.inbox, {})
+    
+    def _job_metadata(self, job: JobRecord) -> Dict:
+        """Métadonnées du rapport : configuration générale surchargée par l'inbox"""
+        return {**self.config['metadata'], **self._job_inbox(job).get('metadata', {})}
+    
+    def recover_jobs(self) -> List[Dict]:
+        """Reprend les jobs interrompus par un arrêt brutal (au démarrage du démon)"""
+        results = []
+        for job in self.journal.in_flight():
+            logger.info(f"♻️ Job interrompu détecté: {job.job_id} (étape '{job.next_stage()}')")
+            if self.file_watcher is not None and job.inbox in self.file_watcher.inboxes:
+                # Entrées encore dans l'inbox : indexées et archivées comme un ensemble
+                # détecté, sinon le scan de l'arriéré les traiterait une seconde fois
+                results.append(self.file_watcher.process_recovered(job.inbox, job.files, job.job_id))
+            else:
+                results.append(self.resume_job(job.job_id))
+        return results
+    
     def _log_summary(self, result: Dict):
         """Affiche un résumé du traitement"""
         logger.info("\n" + "="*70)
@@ -260,7 +549,8 @@ class AutoProcessor:
             logger.info(f"✅ Statut: SUCCÈS")
             logger.info(f"📊 Rapport: {Path(result['report_path']).name if result['report_path'] else 'N/A'}")
             logger.info(f"📄 PDF: {Path(result['pdf_path']).name if result['pdf_path'] else 'N/A'}")
-            logger.info(f"📧 Email: {'Envoyé' if result['email_sent'] else 'Non envoyé'}")
+            email_status = "En file d'envoi" if result['email_queued'] else 'Non envoyé'
+            logger.info(f"📧 Email: {email_status}")
             
             if result['stats']:
                 logger.info(f"\n📈 Statistiques:")
@@ -273,13 +563,30 @@ class AutoProcessor:
         
         logger.info("="*70)
     
+    def send_summary(self, period: str = 'weekly') -> Dict:
+        """
+        Envoie le résumé journalier ou hebdomadaire aux partenaires
+        
+        Args:
+            period: 'daily' ou 'weekly'
+        """
+        if period == 'daily':
+            summary = self.summary_store.daily_summary()
+        else:
+            summary = self.summary_store.weekly_summary()
+        
+        logger.info(f"📅 Résumé {summary['start']} → {summary['end']}: "
+                    f"{summary['reports']} rapport(s), {summary['transaction_count']} transactions")
+        return self.email_sender.send_summary_to_all_partners(summary)
+    
     def start_monitoring(self):
         """Démarre le monitoring automatique du dossier"""
         logger.info("\n🚀 DÉMARRAGE DU MONITORING AUTOMATIQUE")
         logger.info("="*70)
         
-        # Configurer le callback
+        # Configurer les callbacks
         self.file_watcher.set_process_callback(self.process_files)
+        self.file_watcher.set_prefetch_callback(self.prefetcher.prefetch)
         
         # Démarrer le monitoring
         logger.info(f"👁️ Surveillance du dossier: {self.file_watcher.watched_folder}")
@@ -287,7 +594,24 @@ class AutoProcessor:
         logger.info("  → BulkReport.csv + Export.xlsx (+ Frais.xlsx optionnel)")
         logger.info("  → Ctrl+C pour arrêter\n")
         
-        self.file_watcher.start_monitoring()
+        # Le dispatcher reprend aussi les emails restés en attente avant un redémarrage
+        self.email_dispatcher.start()
+        if self.isolation is None:
+            self.start_pipeline()
+        try:
+            # Temporaires des processus disparus, puis jobs interrompus par un arrêt brutal
+            # (reprise à la première étape incomplète)
+            self.output_manager.cleanup_temp_files()
+            self.recover_jobs()
+            self.journal.purge()
+            self.file_watcher.start_monitoring()
+        finally:
+            self.prefetcher.shutdown()
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            if self.isolation is not None:
+                self.isolation.shutdown()
+            self.email_dispatcher.stop()
     
     def get_stats(self) -> Dict:
         """Retourne les statistiques globales"""
@@ -295,10 +619,28 @@ class AutoProcessor:
             'processor': self.processing_stats,
             'pdf_converter': self.pdf_converter.get_stats(),
             'email_sender': self.email_sender.get_stats(),
-            'file_watcher': self.file_watcher.get_stats()
+            'email_outbox': self.email_outbox.get_stats(),
+            'stage_cache': self.stage_cache.stats,
+            'prefetcher': self.prefetcher.stats,
+            'pipeline': self.pipeline.get_stats() if self.pipeline else {},
+            'isolation': self.isolation.get_stats() if self.isolation else {},
+            'file_watcher': self.file_watcher.get_stats() if self.file_watcher else {}
         }
 
 
+def isolated_processor(config_path: str, inboxes: Optional[Dict[str, Dict]] = None) -> 'AutoProcessor':
+    """
+    Processeur d'un processus de travail : mêmes réglages, exécution locale des jobs
+
+    Args:
+        config_path: Configuration du démon
+        inboxes: Surcharges par inbox du démon (métadonnées, partenaires)
+    """
+    processor = AutoProcessor(config_path, worker=True)
+    processor.inboxes = dict(inboxes or {})
+    return processor
+
+
 def main():
     """Point d'entrée principal"""
     print("""
@@ -0,0 +1,57 @@
+"""
+Instantané compact d'un dossier pour la surveillance par scrutation
+Les événements du système de fichiers sont peu fiables sur les partages réseau
+(SMB) : le dossier est relu à intervalle régulier et comparé à l'instantané
+précédent (nom, taille, date de modification, inode) ; seuls les fichiers
+nouveaux ou modifiés sont signalés
+"""
+import os
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# nom -> (taille, mtime en ns, inode)
+Entry = Tuple[int, int, int]
+
+
+class DirectorySnapshot:
+    """Dernier état connu d'un dossier (non récursif)"""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.entries: Dict[str, Entry] = {}
+
+    def scan(self) -> Dict[str, Entry]:
+        """Lecture du dossier en un seul parcours (os.scandir)"""
+        entries = {}
+        try:
+            with os.scandir(self.folder) as iterator:
+                for entry in iterator:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        entries[entry.name] = (stat.st_size, stat.st_mtime_ns, entry.inode())
+                    except OSError:
+                        # Fichier supprimé entre le listing et le stat
+                        continue
+        except OSError as e:
+            logger.warning(f"[WARNING] Dossier illisible {self.folder}: {e}")
+            return dict(self.entries)
+        return entries
+
+    def refresh(self) -> Tuple[List[Path], List[Path]]:
+        """
+        Relit le dossier et met à jour l'instantané
+
+        Returns:
+            (fichiers nouveaux ou modifiés, fichiers disparus)
+        """
+        current = self.scan()
+        previous = self.entries
+        changed = [self.folder / name for name, entry in current.items() if previous.get(name) != entry]
+        removed = [self.folder / name for name in previous.keys() - current.keys()]
+        self.entries = current
+        return changed, removed
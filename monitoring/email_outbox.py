@@ -0,0 +1,384 @@
+"""
+Boîte d'envoi email persistante (SQLite) et dispatcher en arrière-plan
+Les jobs déposent leurs messages et se terminent immédiatement ; le dispatcher
+envoie, réessaie avec un délai exponentiel et survit aux redémarrages
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT,
+    kind TEXT NOT NULL DEFAULT 'report',
+    report_data TEXT NOT NULL,
+    attachments TEXT NOT NULL,
+    recipients TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+"""
+
+
+class EmailOutbox:
+    """File d'attente durable des emails de rapport"""
+
+    def __init__(self, outbox_dir: str = 'outbox', recover: bool = True):
+        """
+        Args:
+            outbox_dir: Dossier de la base et des pièces jointes en attente
+            recover: Remet en attente les messages interrompus en cours d'envoi ;
+                     False pour un processus qui ne fait que déposer (processus
+                     de travail) : les envois du démon ne sont pas touchés
+        """
+        self.outbox_dir = Path(outbox_dir)
+        self.spool_dir = self.outbox_dir / 'spool'
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.outbox_dir / 'outbox.db'
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            if recover:
+                # Messages interrompus en cours d'envoi (crash) : à renvoyer
+                conn.execute("UPDATE outbox SET status = ? WHERE status = ?",
+                             (STATUS_PENDING, STATUS_SENDING))
+
+    @contextmanager
+    def _connect(self):
+        """Connexion courte : une transaction validée puis fermée"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _spool_attachments(self, attachments: List[str]) -> List[str]:
+        """Copie les pièces jointes dans le spool (indépendant de l'archivage des sorties)"""
+        if not attachments:
+            return []
+        target_dir = self.spool_dir / uuid.uuid4().hex[:12]
+        target_dir.mkdir(parents=True, exist_ok=True)
+        spooled = []
+        for file_path in attachments:
+            if os.path.exists(file_path):
+                target = target_dir / Path(file_path).name
+                shutil.copy2(file_path, target)
+                spooled.append(str(target))
+            else:
+                logger.warning(f"⚠️ Pièce jointe introuvable, ignorée: {file_path}")
+        return spooled
+
+    def enqueue(self, report_data: Dict, attachments: List[str] = None,
+                job_id: Optional[str] = None, kind: str = 'report',
+                delay: float = 0, recipients: Optional[List] = None) -> int:
+        """
+        Dépose un message dans la boîte d'envoi
+
+        Args:
+            report_data: Statistiques du rapport (sérialisables en JSON)
+            attachments: Fichiers à joindre (copiés dans le spool)
+            job_id: Identifiant du job d'origine
+            delay: Délai avant le premier envoi (secondes)
+            recipients: Destinataires (emails ou entrées complètes de partenaires,
+                        tous si None) ; seuls les messages de mêmes destinataires
+                        sont regroupés dans un digest
+
+        Returns:
+            Identifiant du message
+        """
+        spooled = self._spool_attachments(attachments or [])
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (job_id, kind, report_data, attachments, recipients, "
+                "next_attempt, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(report_data, default=str, ensure_ascii=False),
+                 json.dumps(spooled), json.dumps(recipients) if recipients else None,
+                 now + delay, now)
+            )
+            message_id = cursor.lastrowid
+        logger.info(f"📮 Email #{message_id} mis en file d'attente ({len(spooled)} pièce(s) jointe(s))")
+        return message_id
+
+    def find_job_message(self, job_id: str) -> Optional[int]:
+        """Message déjà déposé pour ce job (reprise après crash)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM outbox WHERE job_id = ? ORDER BY id LIMIT 1",
+                               (job_id,)).fetchone()
+        return row['id'] if row else None
+
+    def claim_due(self, limit: int = 50, coalesce_window: float = 0) -> List[Dict]:
+        """
+        Réserve les messages dont l'heure d'envoi est atteinte
+
+        Args:
+            limit: Nombre maximum de messages échus
+            coalesce_window: Fenêtre de regroupement (secondes) ; les nouveaux rapports
+                             terminés dans la fenêtre du dernier rapport échu sont
+                             réservés avec lui, même si leur propre délai court encore
+        """
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? AND next_attempt <= ? "
+                "ORDER BY next_attempt, id LIMIT ?",
+                (STATUS_PENDING, time.time(), limit)
+            ).fetchall()
+            fresh = [row for row in rows if self._is_fresh_report(row)]
+            if coalesce_window > 0 and fresh:
+                horizon = max(row['created_at'] for row in fresh) + coalesce_window
+                claimed = {row['id'] for row in rows}
+                rows += [
+                    row for row in conn.execute(
+                        "SELECT * FROM outbox WHERE status = ? AND kind = 'report' "
+                        "AND attempts = 0 AND created_at <= ? ORDER BY id",
+                        (STATUS_PENDING, horizon)
+                    ).fetchall()
+                    if row['id'] not in claimed
+                ]
+            if rows:
+                conn.executemany("UPDATE outbox SET status = ? WHERE id = ?",
+                                 [(STATUS_SENDING, row['id']) for row in rows])
+        return [self._row_to_message(row) for row in rows]
+
+    @staticmethod
+    def _is_fresh_report(row) -> bool:
+        """Rapport jamais tenté (regroupable avec les rapports de mêmes destinataires)"""
+        return row['kind'] == 'report' and row['attempts'] == 0
+
+    @staticmethod
+    def recipients_key(recipients: Optional[List]) -> Optional[str]:
+        """Clé de l'ensemble des destinataires (ordre indifférent, None = tous)"""
+        if recipients is None:
+            return None
+        return json.dumps(sorted(json.dumps(entry, sort_keys=True) for entry in recipients))
+
+    @staticmethod
+    def remaining_recipients(recipients: Optional[List], failed: List[str]) -> List:
+        """Destinataires à relancer : entrées d'origine dont l'email a échoué"""
+        if recipients is None:
+            return list(failed)
+        return [entry for entry in recipients
+                if (entry.get('email') if isinstance(entry, dict) else entry) in failed]
+
+    def _row_to_message(self, row: sqlite3.Row) -> Dict:
+        return {
+            'id': row['id'],
+            'job_id': row['job_id'],
+            'kind': row['kind'],
+            'report_data': json.loads(row['report_data']),
+            'attachments': json.loads(row['attachments']),
+            'recipients': json.loads(row['recipients']) if row['recipients'] else None,
+            'attempts': row['attempts'],
+            'created_at': row['created_at']
+        }
+
+    def mark_sent(self, message_id: int):
+        """Message envoyé : les pièces jointes du spool peuvent être supprimées"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT attachments FROM outbox WHERE id = ?", (message_id,)).fetchone()
+            conn.execute("UPDATE outbox SET status = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                         (STATUS_SENT, time.time(), message_id))
+        if row:
+            self._remove_spool(json.loads(row['attachments']))
+
+    def mark_failed(self, message_id: int, error: str, max_retries: int,
+                    base_delay: float, remaining_recipients: Optional[List] = None) -> bool:
+        """
+        Enregistre un échec et planifie le prochain essai (délai exponentiel)
+
+        Args:
+            remaining_recipients: Destinataires encore à servir (échec partiel)
+
+        Returns:
+            True si un nouvel essai est planifié, False si abandon définitif
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (message_id,)).fetchone()
+            attempts = (row['attempts'] if row else 0) + 1
+            retry = attempts <= max_retries  # Premier essai + max_retries nouveaux essais
+            delay = base_delay * (2 ** (attempts - 1))
+            conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, "
+                "recipients = COALESCE(?, recipients) WHERE id = ?",
+                (STATUS_PENDING if retry else STATUS_FAILED, attempts, time.time() + delay,
+                 error, json.dumps(remaining_recipients) if remaining_recipients else None, message_id)
+            )
+        if retry:
+            logger.warning(f"⚠️ Email #{message_id} en échec (essai {attempts}/{max_retries + 1}), "
+                           f"nouvel essai dans {delay:.0f}s: {error}")
+        else:
+            logger.error(f"❌ Email #{message_id} abandonné après {attempts} essais: {error}")
+        return retry
+
+    def _remove_spool(self, attachments: List[str]):
+        for file_path in attachments:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        for directory in {Path(p).parent for p in attachments}:
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict[str, int]:
+        """Nombre de messages par statut"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        stats = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        stats.update({row['status']: row['n'] for row in rows})
+        return stats
+
+
+class EmailDispatcher:
+    """Vide la boîte d'envoi en arrière-plan via ProfessionalEmailSender"""
+
+    def __init__(self, sender, outbox: EmailOutbox, poll_interval: float = 5):
+        """
+        Args:
+            sender: ProfessionalEmailSender (envoi groupé aux partenaires)
+            outbox: Boîte d'envoi persistante
+            poll_interval: Intervalle de scrutation (secondes)
+        """
+        self.sender = sender
+        self.outbox = outbox
+        self.poll_interval = poll_interval
+
+        settings = sender.config.get('settings', {})
+        self.max_retries = settings.get('max_retries', 3) if settings.get('retry_on_failure', True) else 0
+        self.retry_base_delay = settings.get('retry_base_delay', 30)
+        # Fenêtre de regroupement des rapports en un digest par partenaire (0 = désactivé)
+        self.coalesce_window = settings.get('digest_window_seconds', 0)
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Démarre le thread de dispatch"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='EmailDispatcher', daemon=True)
+        self._thread.start()
+        logger.info("📮 Dispatcher email démarré")
+
+    def stop(self, timeout: float = 30):
+        """Arrête le dispatcher (les messages restants seront envoyés au prochain démarrage)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        logger.info("📮 Dispatcher email arrêté")
+
+    def wake(self):
+        """Signale un nouveau message (évite d'attendre la prochaine scrutation)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.dispatch_pending()
+            except Exception as e:
+                logger.error(f"❌ Erreur dispatcher email: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def dispatch_pending(self) -> int:
+        """Envoie tous les messages échus ; retourne le nombre de messages traités"""
+        messages = self.outbox.claim_due(coalesce_window=self.coalesce_window)
+        count = len(messages)
+
+        # Nouveaux rapports regroupés par ensemble de destinataires : un seul email par partenaire
+        if self.coalesce_window > 0:
+            groups: Dict[Optional[str], List[Dict]] = {}
+            for message in messages:
+                if EmailOutbox._is_fresh_report(message):
+                    groups.setdefault(EmailOutbox.recipients_key(message['recipients']), []).append(message)
+            digest_ids = set()
+            for group in groups.values():
+                if len(group) > 1:
+                    self._dispatch_digest(group)
+                    digest_ids.update(m['id'] for m in group)
+            messages = [m for m in messages if m['id'] not in digest_ids]
+
+        for message in messages:
+            self._dispatch(message)
+        return count
+
+    def _dispatch_digest(self, messages: List[Dict]):
+        """Envoie un digest (mêmes destinataires) ; en cas d'échec chaque rapport est relancé séparément"""
+        ids = ', '.join(f"#{m['id']}" for m in messages)
+        logger.info(f"📬 Digest de {len(messages)} rapports ({ids})")
+        attachments = [path for m in messages for path in m['attachments']]
+        recipients = messages[0]['recipients']
+        try:
+            results = self.sender.send_digest_to_all_partners(
+                [m['report_data'] for m in messages], attachments, recipients=recipients
+            )
+        except Exception as e:
+            for message in messages:
+                self.outbox.mark_failed(message['id'], str(e), self.max_retries, self.retry_base_delay)
+            return
+
+        for message in messages:
+            if results['failed']:
+                self.outbox.mark_failed(
+                    message['id'],
+                    f"{len(results['failed'])} destinataire(s) en échec (digest)",
+                    self.max_retries, self.retry_base_delay,
+                    remaining_recipients=EmailOutbox.remaining_recipients(recipients, results['failed'])
+                )
+            else:
+                self.outbox.mark_sent(message['id'])
+        if not results['failed']:
+            logger.info(f"✅ Digest envoyé ({len(results['success'])} destinataires)")
+
+    def _dispatch(self, message: Dict):
+        try:
+            results = self.sender.send_to_all_partners(
+                message['report_data'],
+                message['attachments'],
+                recipients=message['recipients']
+            )
+        except Exception as e:
+            self.outbox.mark_failed(message['id'], str(e), self.max_retries, self.retry_base_delay)
+            return
+
+        if results['failed']:
+            self.outbox.mark_failed(
+                message['id'],
+                f"{len(results['failed'])} destinataire(s) en échec",
+                self.max_retries, self.retry_base_delay,
+                remaining_recipients=EmailOutbox.remaining_recipients(message['recipients'],
+                                                                      results['failed'])
+            )
+        else:
+            self.outbox.mark_sent(message['id'])
+            logger.info(f"✅ Email #{message['id']} envoyé ({len(results['success'])} destinataires)")
@@ -7,13 +7,17 @@ import logging
 from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 from email.mime.image import MIMEImage
 from email.utils import formatdate, make_msgid
 from typing import List, Optional, Dict
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import base64
+from .smtp_pool import SMTPConnectionPool
+from .attachment_pipeline import AttachmentPipeline, PreparedAttachments, StreamedMessage
+from .email_templates import TemplateRegistry
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +33,14 @@ class ProfessionalEmailSender:
             config_path: Chemin vers la configuration email
         """
         self.config = self._load_config(config_path)
-        self.templates = self._load_templates()
+        # Templates compilés une fois, fichiers de config.templates rechargés si modifiés
+        self.templates = TemplateRegistry(self.config.get('templates'))
         self.email_stats = {
             'sent': 0,
             'failed': 0,
             'last_sent': None
         }
+        self._stats_lock = threading.Lock()
     
     def _load_config(self, config_path: str) -> dict:
         """Charge la configuration email"""
@@ -68,6 +74,9 @@ class ProfessionalEmailSender:
                 'logo_path': 'assets/logo.png',
                 'primary_color': '#2E7D32',
                 'secondary_color': '#66BB6A'
+            },
+            'settings': {
+                'max_parallel_sends': 4
             }
         }
         
@@ -90,122 +99,10 @@ class ProfessionalEmailSender:
             else:
                 default[key] = value
     
-    def _load_templates(self) -> dict:
-        """Charge les templates HTML"""
-        templates = {}
-        
-        # Template par défaut si fichiers non trouvés
-        default_template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background: linear-gradient(135deg, #2E7D32, #66BB6A); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
-                .content { background: #f9f9f9; padding: 30px; border: 1px solid #ddd; border-top: none; }
-                .footer { background: #333; color: white; padding: 20px; text-align: center; font-size: 12px; border-radius: 0 0 10px 10px; }
-                .button { display: inline-block; padding: 12px 30px; background: #2E7D32; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }
-                .stats { background: white; padding: 20px; border-radius: 5px; margin: 20px 0; }
-                .stats-row { display: flex; justify-content: space-between; padding: 10px 0; border-bottom: 1px solid #eee; }
-                .highlight { color: #2E7D32; font-weight: bold; }
-                h1 { margin: 0; }
-                h2 { color: #2E7D32; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>{{title}}</h1>
-                    <p>{{subtitle}}</p>
-                </div>
-                <div class="content">
-                    {{content}}
-                </div>
-                <div class="footer">
-                    <p>© 2025 UGP Reporter - Système Automatique de Rapports</p>
-                    <p>Ce message a été généré automatiquement. Ne pas répondre.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        templates['default'] = default_template
-        
-        # Template rapport prêt
-        templates['report_ready'] = default_template.replace(
-            '{{content}}',
-            """
-            <h2>Rapport de Paiement Généré avec Succès ✅</h2>
-            <p>Bonjour {{recipient_name}},</p>
-            <p>Le rapport de paiement a été généré automatiquement et est disponible en pièce jointe.</p>
-            
-            <div class="stats">
-                <h3>📊 Détails du Rapport</h3>
-                <div class="stats-row">
-                    <span>Date de génération:</span>
-                    <span class="highlight">{{generation_date}}</span>
-                </div>
-                <div class="stats-row">
-                    <span>Nombre de transactions:</span>
-                    <span class="highlight">{{transaction_count}}</span>
-                </div>
-                <div class="stats-row">
-                    <span>Montant total:</span>
-                    <span class="highlight">{{total_amount}} FCFA</span>
-                </div>
-                <div class="stats-row">
-                    <span>Frais totaux:</span>
-                    <span class="highlight">{{total_fees}} FCFA</span>
-                </div>
-                <div class="stats-row">
-                    <span>Bénéficiaires uniques:</span>
-                    <span class="highlight">{{unique_beneficiaries}}</span>
-                </div>
-            </div>
-            
-            <p><strong>📎 Pièces jointes:</strong></p>
-            <ul>
-                <li>Rapport PDF pour impression</li>
-                <li>Rapport Excel (si demandé)</li>
-            </ul>
-            
-            <p>Pour toute question, veuillez contacter le support technique.</p>
-            
-            <center>
-                <a href="#" class="button">Voir le Dashboard</a>
-            </center>
-            """
-        )
-        
-        # Template d'erreur
-        templates['error'] = default_template.replace(
-            '{{content}}',
-            """
-            <h2 style="color: #d32f2f;">⚠️ Erreur lors du Traitement</h2>
-            <p>Bonjour {{recipient_name}},</p>
-            <p>Une erreur s'est produite lors du traitement automatique des fichiers.</p>
-            
-            <div style="background: #ffebee; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                <strong>Détails de l'erreur:</strong><br>
-                {{error_message}}
-            </div>
-            
-            <p><strong>Fichiers concernés:</strong></p>
-            <ul>
-                {{file_list}}
-            </ul>
-            
-            <p>Les fichiers ont été déplacés dans le dossier d'erreur pour vérification manuelle.</p>
-            """
-        )
-        
-        return templates
-    
     def send_report_email(self, recipient: Dict, report_data: Dict, 
-                          attachments: List[str] = None) -> bool:
+                          attachments: List[str] = None,
+                          pipeline: Optional[AttachmentPipeline] = None,
+                          pool: Optional[SMTPConnectionPool] = None) -> bool:
         """
         Envoie un email avec le rapport en pièce jointe
         
@@ -213,94 +110,203 @@ class ProfessionalEmailSender:
             recipient: Dictionnaire avec infos du destinataire
             report_data: Données du rapport pour le template
             attachments: Liste des chemins de fichiers à joindre
+            pipeline: Pièces jointes préparées pour le lot (sinon préparées pour ce seul envoi)
+            pool: Pool de sessions SMTP (sinon une connexion dédiée)
         
         Returns:
             True si succès, False sinon
         """
+        return self._deliver(
+            lambda prepared: self._build_report_message(recipient, report_data, prepared),
+            recipient, attachments, pipeline, pool
+        )
+    
+    def send_digest_email(self, recipient: Dict, reports: List[Dict],
+                          attachments: List[str] = None,
+                          pipeline: Optional[AttachmentPipeline] = None,
+                          pool: Optional[SMTPConnectionPool] = None) -> bool:
+        """
+        Envoie un seul email regroupant plusieurs rapports (digest)
+        
+        Args:
+            recipient: Dictionnaire avec infos du destinataire
+            reports: Données de chaque rapport regroupé
+            attachments: Pièces jointes de tous les rapports
+        """
+        return self._deliver(
+            lambda prepared: self._build_digest_message(recipient, reports, prepared),
+            recipient, attachments, pipeline, pool
+        )
+    
+    def _deliver(self, build_message, recipient: Dict, attachments: List[str] = None,
+                 pipeline: Optional[AttachmentPipeline] = None,
+                 pool: Optional[SMTPConnectionPool] = None) -> bool:
+        """Construit puis envoie un message en tenant les statistiques à jour"""
+        owned_pipeline = pipeline is None
+        if owned_pipeline:
+            pipeline = AttachmentPipeline(self.config.get('settings', {}))
         try:
-            # Créer le message
-            msg = MIMEMultipart('related')
-            msg['From'] = f"{self.config['sender']['name']} <{self.config['sender']['email']}>"
-            msg['To'] = recipient['email']
-            msg['Date'] = formatdate(localtime=True)
-            msg['Subject'] = f"📊 Rapport UGP - {report_data.get('date', datetime.now().strftime('%d/%m/%Y'))}"
-            msg['Message-ID'] = make_msgid()
-            
-            # Ajouter CC si spécifié
-            if recipient.get('cc'):
-                msg['Cc'] = ', '.join(recipient['cc'])
-            
-            # Préparer le contenu HTML
-            html_content = self._render_template('report_ready', {
-                'title': 'Rapport de Paiement UGP',
-                'subtitle': f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
-                'recipient_name': recipient.get('name', 'Partenaire'),
-                'generation_date': datetime.now().strftime('%d/%m/%Y %H:%M'),
-                'transaction_count': report_data.get('transaction_count', 0),
-                'total_amount': f"{report_data.get('total_amount', 0):,.0f}".replace(',', ' '),
-                'total_fees': f"{report_data.get('total_fees', 0):,.0f}".replace(',', ' '),
-                'unique_beneficiaries': report_data.get('unique_beneficiaries', 0)
-            })
-            
-            # Attacher le HTML
-            msg_html = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(msg_html)
-            
-            # Ajouter les pièces jointes
-            if attachments:
-                for file_path in attachments:
-                    if os.path.exists(file_path):
-                        self._attach_file(msg, file_path)
+            msg = build_message(pipeline.prepare(attachments or []))
             
             # Envoyer l'email
-            success = self._send_email(msg, recipient['email'])
+            success = self._send_email(msg, recipient['email'], pool)
+            
+            with self._stats_lock:
+                if success:
+                    self.email_stats['sent'] += 1
+                    self.email_stats['last_sent'] = datetime.now()
+                else:
+                    self.email_stats['failed'] += 1
             
             if success:
-                self.email_stats['sent'] += 1
-                self.email_stats['last_sent'] = datetime.now()
                 logger.info(f"✅ Email envoyé à: {recipient['email']}")
-            else:
-                self.email_stats['failed'] += 1
                 
             return success
             
         except Exception as e:
             logger.error(f"❌ Erreur envoi email: {e}")
-            self.email_stats['failed'] += 1
+            with self._stats_lock:
+                self.email_stats['failed'] += 1
             return False
+        finally:
+            if owned_pipeline:
+                pipeline.cleanup()
     
-    def _render_template(self, template_name: str, data: Dict) -> str:
-        """Rend un template avec les données"""
-        template = self.templates.get(template_name, self.templates['default'])
+    def _new_message(self, recipient: Dict, subject: str) -> MIMEMultipart:
+        """Crée l'enveloppe d'un message (expéditeur, destinataires, sujet)"""
+        msg = MIMEMultipart('related')
+        msg['From'] = f"{self.config['sender']['name']} <{self.config['sender']['email']}>"
+        msg['To'] = recipient['email']
+        msg['Date'] = formatdate(localtime=True)
+        msg['Subject'] = subject
+        msg['Message-ID'] = make_msgid()
         
-        # Remplacer les variables
-        for key, value in data.items():
-            template = template.replace(f'{{{{{key}}}}}', str(value))
+        # Ajouter CC si spécifié
+        if recipient.get('cc'):
+            msg['Cc'] = ', '.join(recipient['cc'])
         
-        return template
+        return msg
     
-    def _attach_file(self, msg: MIMEMultipart, file_path: str):
-        """Attache un fichier au message"""
-        try:
-            file_path = Path(file_path)
-            
-            with open(file_path, 'rb') as f:
-                attach = MIMEApplication(f.read())
-                attach.add_header(
-                    'Content-Disposition',
-                    'attachment',
-                    filename=file_path.name
-                )
-                msg.attach(attach)
-            
-            logger.info(f"  📎 Pièce jointe: {file_path.name}")
-            
-        except Exception as e:
-            logger.warning(f"  ⚠️ Impossible d'attacher: {file_path.name} - {e}")
+    def _finalize(self, msg: MIMEMultipart, html_content: str,
+                  prepared: PreparedAttachments) -> StreamedMessage:
+        """
+        Ajoute le HTML (avec les liens des fichiers trop volumineux) au message
+        
+        Les pièces jointes ne sont pas chargées : elles sont lues depuis le
+        spool du pipeline au moment de l'envoi.
+        """
+        links_html = prepared.links_html()
+        if links_html:
+            if '<div class="footer">' in html_content:
+                html_content = html_content.replace('<div class="footer">', links_html + '<div class="footer">', 1)
+            else:
+                html_content += links_html
+        
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+        return StreamedMessage(msg, prepared.attachments)
+    
+    def _build_report_message(self, recipient: Dict, report_data: Dict,
+                              prepared: PreparedAttachments) -> StreamedMessage:
+        """Construit le message d'un destinataire (seul le HTML est personnalisé)"""
+        msg = self._new_message(
+            recipient,
+            f"📊 Rapport UGP - {report_data.get('date', datetime.now().strftime('%d/%m/%Y'))}"
+        )
+        
+        # Préparer le contenu HTML
+        html_content = self._render_template('report_ready', {
+            'title': 'Rapport de Paiement UGP',
+            'subtitle': f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
+            'recipient_name': recipient.get('name', 'Partenaire'),
+            'generation_date': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'transaction_count': report_data.get('transaction_count', 0),
+            'total_amount': f"{report_data.get('total_amount', 0):,.0f}".replace(',', ' '),
+            'total_fees': f"{report_data.get('total_fees', 0):,.0f}".replace(',', ' '),
+            'unique_beneficiaries': report_data.get('unique_beneficiaries', 0)
+        })
+        
+        # Attacher le HTML et les pièces jointes préparées
+        return self._finalize(msg, html_content, prepared)
+    
+    def _build_digest_message(self, recipient: Dict, reports: List[Dict],
+                              prepared: PreparedAttachments) -> StreamedMessage:
+        """Construit le message regroupant plusieurs rapports (tableau combiné)"""
+        msg = self._new_message(
+            recipient,
+            f"📊 Rapports UGP - {len(reports)} rapports du {datetime.now().strftime('%d/%m/%Y')}"
+        )
+        
+        def fcfa(value):
+            return f"{value:,.0f}".replace(',', ' ')
+        
+        # Une ligne par rapport + ligne de total
+        rows = []
+        for index, report in enumerate(reports, start=1):
+            rows.append(
+                f"<tr><td>{index}</td><td>{report.get('date', '')}</td>"
+                f"<td>{report.get('transaction_count', 0)}</td>"
+                f"<td>{fcfa(report.get('total_amount', 0))}</td>"
+                f"<td>{fcfa(report.get('total_fees', 0))}</td>"
+                f"<td>{report.get('unique_beneficiaries', 0)}</td></tr>"
+            )
+        
+        html_content = self._render_template('digest', {
+            'title': 'Rapports de Paiement UGP',
+            'subtitle': f"{len(reports)} rapports regroupés le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
+            'recipient_name': recipient.get('name', 'Partenaire'),
+            'report_count': len(reports),
+            'report_rows': '\n'.join(rows),
+            'transaction_count': sum(r.get('transaction_count', 0) for r in reports),
+            'total_amount': fcfa(sum(r.get('total_amount', 0) for r in reports)),
+            'total_fees': fcfa(sum(r.get('total_fees', 0) for r in reports))
+        })
+        return self._finalize(msg, html_content, prepared)
     
-    def _send_email(self, msg: MIMEMultipart, recipient: str) -> bool:
-        """Envoie effectivement l'email via SMTP"""
+    def _build_summary_message(self, recipient: Dict, summary: Dict) -> StreamedMessage:
+        """Construit le message de résumé (une ligne par jour agrégé)"""
+        msg = self._new_message(
+            recipient,
+            f"📅 Résumé UGP - du {summary['start']} au {summary['end']}"
+        )
+        
+        def fcfa(value):
+            return f"{value:,.0f}".replace(',', ' ')
+        
+        rows = [
+            f"<tr><td>{day['day']}</td><td>{day['reports']}</td>"
+            f"<td>{day['transaction_count']}</td>"
+            f"<td>{fcfa(day['total_amount'])}</td>"
+            f"<td>{fcfa(day['total_fees'])}</td>"
+            f"<td>~{day['unique_beneficiaries']}</td></tr>"
+            for day in summary['days']
+        ]
+        
+        html_content = self._render_template('weekly_summary', {
+            'title': 'Résumé des Paiements UGP',
+            'subtitle': f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')}",
+            'recipient_name': recipient.get('name', 'Partenaire'),
+            'period_start': summary['start'],
+            'period_end': summary['end'],
+            'day_rows': '\n'.join(rows),
+            'report_count': summary['reports'],
+            'transaction_count': summary['transaction_count'],
+            'total_amount': fcfa(summary['total_amount']),
+            'total_fees': fcfa(summary['total_fees']),
+            'unique_beneficiaries': summary['unique_beneficiaries']
+        })
+        return self._finalize(msg, html_content, PreparedAttachments([], []))
+    
+    def _render_template(self, template_name: str, data: Dict) -> str:
+        """Rend un template avec les données (segments précompilés, un seul join)"""
+        return self.templates.render(template_name, data)
+    
+    def _send_email(self, msg: StreamedMessage, recipient: str,
+                    pool: Optional[SMTPConnectionPool] = None) -> bool:
+        """Envoie effectivement l'email via SMTP (session du pool si fournie)"""
         try:
+            if pool is not None:
+                return pool.send_message(msg)
+            
             # Connexion SMTP
             smtp_config = self.config['smtp']
             
@@ -311,8 +317,8 @@ class ProfessionalEmailSender:
                 # Authentification
                 server.login(smtp_config['username'], smtp_config['password'])
                 
-                # Envoi
-                server.send_message(msg)
+                # Envoi (pièces jointes lues par blocs depuis le spool)
+                msg.send(server)
                 
                 return True
                 
@@ -320,37 +326,123 @@ class ProfessionalEmailSender:
             logger.error(f"❌ Erreur SMTP: {e}")
             return False
     
-    def send_to_all_partners(self, report_data: Dict, attachments: List[str]) -> Dict:
+    def send_to_all_partners(self, report_data: Dict, attachments: List[str],
+                             recipients: Optional[List] = None) -> Dict:
         """
         Envoie le rapport à tous les partenaires configurés
         
         Args:
             report_data: Données du rapport
             attachments: Liste des pièces jointes
+            recipients: Destinataires (emails ou entrées complètes, tous les partenaires
+                        si None ; voir resolve_partners)
         
         Returns:
             Dictionnaire avec les résultats d'envoi
         """
+        def send_partner(partner, partner_attachments, pipeline, pool):
+            return self.send_report_email(partner, report_data, partner_attachments,
+                                          pipeline=pipeline, pool=pool)
+        
+        return self._send_to_partners(send_partner, attachments, recipients)
+    
+    def send_digest_to_all_partners(self, reports: List[Dict], attachments: List[str],
+                                    recipients: Optional[List] = None) -> Dict:
+        """
+        Envoie un digest (plusieurs rapports, un email par partenaire)
+        
+        Args:
+            reports: Données de chaque rapport regroupé
+            attachments: Pièces jointes de tous les rapports
+            recipients: Destinataires (tous les partenaires si None ; voir resolve_partners)
+        """
+        def send_partner(partner, partner_attachments, pipeline, pool):
+            return self.send_digest_email(partner, reports, partner_attachments,
+                                          pipeline=pipeline, pool=pool)
+        
+        return self._send_to_partners(send_partner, attachments, recipients)
+    
+    def send_summary_to_all_partners(self, summary: Dict) -> Dict:
+        """
+        Envoie un résumé journalier/hebdomadaire (sans pièce jointe)
+        
+        Args:
+            summary: Résumé calculé par SummaryStore (daily_summary / weekly_summary)
+        """
+        def send_partner(partner, partner_attachments, pipeline, pool):
+            return self._deliver(
+                lambda prepared: self._build_summary_message(partner, summary),
+                partner, pipeline=pipeline, pool=pool
+            )
+        
+        return self._send_to_partners(send_partner, [])
+    
+    def _partner_attachments(self, partner: Dict, attachments: List[str]) -> List[str]:
+        """Filtre les pièces jointes selon les préférences du partenaire"""
+        partner_attachments = []
+        for attachment in attachments:
+            if '.pdf' in attachment and partner.get('send_pdf', True):
+                partner_attachments.append(attachment)
+            elif '.xlsx' in attachment and partner.get('send_excel', False):
+                partner_attachments.append(attachment)
+        return partner_attachments
+    
+    def resolve_partners(self, recipients: Optional[List] = None) -> List[Dict]:
+        """
+        Partenaires à servir
+
+        Args:
+            recipients: None (tous les partenaires configurés) ou liste d'entrées :
+                        email d'un partenaire configuré, ou entrée complète
+                        {'name', 'email', 'send_pdf', 'send_excel', 'cc'}
+
+        Returns:
+            Entrées complètes des partenaires (une entrée complète surcharge le
+            partenaire configuré de même email)
+        """
+        configured = self.config.get('partners', [])
+        if recipients is None:
+            return list(configured)
+        
+        by_email = {partner['email']: partner for partner in configured}
+        partners = []
+        for entry in recipients:
+            if isinstance(entry, dict) and entry.get('email'):
+                partners.append({**by_email.get(entry['email'], {}), **entry})
+            elif isinstance(entry, str) and entry in by_email:
+                partners.append(by_email[entry])
+            else:
+                logger.warning(f"⚠️ Destinataire inconnu ignoré: {entry}")
+        if not partners:
+            logger.warning(f"⚠️ Aucun destinataire résolu parmi {len(recipients)} entrée(s)")
+        return partners
+    
+    def _send_to_partners(self, send_partner, attachments: List[str],
+                          recipients: Optional[List] = None) -> Dict:
+        """Envoi groupé : sessions SMTP partagées, pièces jointes encodées une fois"""
         results = {
             'success': [],
             'failed': []
         }
         
-        partners = self.config.get('partners', [])
-        logger.info(f"📧 Envoi à {len(partners)} partenaires...")
-        
-        for partner in partners:
-            # Filtrer les pièces jointes selon les préférences
-            partner_attachments = []
-            for attachment in attachments:
-                if '.pdf' in attachment and partner.get('send_pdf', True):
-                    partner_attachments.append(attachment)
-                elif '.xlsx' in attachment and partner.get('send_excel', False):
-                    partner_attachments.append(attachment)
-            
-            # Envoyer
-            success = self.send_report_email(partner, report_data, partner_attachments)
-            
+        partners = self.resolve_partners(recipients)
+        max_workers = max(1, self.config.get('settings', {}).get('max_parallel_sends', 4))
+        logger.info(f"📧 Envoi à {len(partners)} partenaires ({max_workers} en parallèle)...")
+        
+        # Chaque ensemble de pièces jointes est compressé/encodé une seule fois pour le lot,
+        # sessions SMTP partagées par le lot, envois en parallèle bornés
+        with AttachmentPipeline(self.config.get('settings', {})) as pipeline, \
+                SMTPConnectionPool(self.config['smtp'], size=max_workers) as pool:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(executor.map(
+                    lambda partner: send_partner(
+                        partner, self._partner_attachments(partner, attachments),
+                        pipeline, pool
+                    ),
+                    partners
+                ))
+        
+        for partner, success in zip(partners, outcomes):
             if success:
                 results['success'].append(partner['email'])
             else:
@@ -359,6 +451,9 @@ class ProfessionalEmailSender:
         # Résumé
         logger.info(f"📊 Résultat: {len(results['success'])} succès, {len(results['failed'])} échecs")
         
+        results['smtp_sessions'] = pool.stats['connections']
+        results['attachments'] = dict(pipeline.stats)
+        
         return results
     
     def get_stats(self) -> Dict:
@@ -0,0 +1,242 @@
+"""
+Templates HTML des emails, compilés une seule fois
+Les marqueurs {{cle}} sont découpés en segments à la compilation ; le rendu
+se réduit à un seul join. Les fichiers de config.templates sont rechargés
+quand leur date de modification change.
+"""
+import os
+import re
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+# Template par défaut si fichiers non trouvés
+DEFAULT_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #2E7D32, #66BB6A); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border: 1px solid #ddd; border-top: none; }
+        .footer { background: #333; color: white; padding: 20px; text-align: center; font-size: 12px; border-radius: 0 0 10px 10px; }
+        .button { display: inline-block; padding: 12px 30px; background: #2E7D32; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }
+        .stats { background: white; padding: 20px; border-radius: 5px; margin: 20px 0; }
+        .stats-row { display: flex; justify-content: space-between; padding: 10px 0; border-bottom: 1px solid #eee; }
+        .highlight { color: #2E7D32; font-weight: bold; }
+        h1 { margin: 0; }
+        h2 { color: #2E7D32; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>{{title}}</h1>
+            <p>{{subtitle}}</p>
+        </div>
+        <div class="content">
+            {{content}}
+        </div>
+        <div class="footer">
+            <p>© 2025 UGP Reporter - Système Automatique de Rapports</p>
+            <p>Ce message a été généré automatiquement. Ne pas répondre.</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Template rapport prêt
+REPORT_READY_TEMPLATE = DEFAULT_TEMPLATE.replace('{{content}}', """
+<h2>Rapport de Paiement Généré avec Succès ✅</h2>
+<p>Bonjour {{recipient_name}},</p>
+<p>Le rapport de paiement a été généré automatiquement et est disponible en pièce jointe.</p>
+
+<div class="stats">
+    <h3>📊 Détails du Rapport</h3>
+    <div class="stats-row">
+        <span>Date de génération:</span>
+        <span class="highlight">{{generation_date}}</span>
+    </div>
+    <div class="stats-row">
+        <span>Nombre de transactions:</span>
+        <span class="highlight">{{transaction_count}}</span>
+    </div>
+    <div class="stats-row">
+        <span>Montant total:</span>
+        <span class="highlight">{{total_amount}} FCFA</span>
+    </div>
+    <div class="stats-row">
+        <span>Frais totaux:</span>
+        <span class="highlight">{{total_fees}} FCFA</span>
+    </div>
+    <div class="stats-row">
+        <span>Bénéficiaires uniques:</span>
+        <span class="highlight">{{unique_beneficiaries}}</span>
+    </div>
+</div>
+
+<p><strong>📎 Pièces jointes:</strong></p>
+<ul>
+    <li>Rapport PDF pour impression</li>
+    <li>Rapport Excel (si demandé)</li>
+</ul>
+
+<p>Pour toute question, veuillez contacter le support technique.</p>
+
+<center>
+    <a href="#" class="button">Voir le Dashboard</a>
+</center>
+""")
+
+# Template digest (plusieurs rapports regroupés)
+DIGEST_TEMPLATE = DEFAULT_TEMPLATE.replace('{{content}}', """
+<h2>{{report_count}} Rapports de Paiement Générés ✅</h2>
+<p>Bonjour {{recipient_name}},</p>
+<p>Plusieurs rapports ont été générés sur une courte période ; ils sont regroupés dans ce message.</p>
+
+<div class="stats">
+    <h3>📊 Détails des Rapports</h3>
+    <table style="width: 100%; border-collapse: collapse;">
+        <tr><th>#</th><th>Date</th><th>Transactions</th><th>Montant (FCFA)</th><th>Frais (FCFA)</th><th>Bénéficiaires</th></tr>
+        {{report_rows}}
+        <tr class="highlight"><td colspan="2">TOTAL</td><td>{{transaction_count}}</td><td>{{total_amount}}</td><td>{{total_fees}}</td><td></td></tr>
+    </table>
+</div>
+
+<p><strong>📎 Pièces jointes:</strong> les rapports de chaque traitement.</p>
+""")
+
+# Template d'erreur
+ERROR_TEMPLATE = DEFAULT_TEMPLATE.replace('{{content}}', """
+<h2 style="color: #d32f2f;">⚠️ Erreur lors du Traitement</h2>
+<p>Bonjour {{recipient_name}},</p>
+<p>Une erreur s'est produite lors du traitement automatique des fichiers.</p>
+
+<div style="background: #ffebee; padding: 15px; border-radius: 5px; margin: 20px 0;">
+    <strong>Détails de l'erreur:</strong><br>
+    {{error_message}}
+</div>
+
+<p><strong>Fichiers concernés:</strong></p>
+<ul>
+    {{file_list}}
+</ul>
+
+<p>Les fichiers ont été déplacés dans le dossier d'erreur pour vérification manuelle.</p>
+""")
+
+# Template résumé (journalier ou hebdomadaire)
+SUMMARY_TEMPLATE = DEFAULT_TEMPLATE.replace('{{content}}', """
+<h2>Résumé des Paiements du {{period_start}} au {{period_end}} 📅</h2>
+<p>Bonjour {{recipient_name}},</p>
+<p>Voici le récapitulatif des rapports générés sur la période.</p>
+
+<div class="stats">
+    <h3>📊 Totaux par Jour</h3>
+    <table style="width: 100%; border-collapse: collapse;">
+        <tr><th>Jour</th><th>Rapports</th><th>Transactions</th><th>Montant (FCFA)</th><th>Frais (FCFA)</th><th>Bénéficiaires</th></tr>
+        {{day_rows}}
+        <tr class="highlight"><td>TOTAL</td><td>{{report_count}}</td><td>{{transaction_count}}</td><td>{{total_amount}}</td><td>{{total_fees}}</td><td>~{{unique_beneficiaries}}</td></tr>
+    </table>
+</div>
+
+<p>Le nombre de bénéficiaires uniques est une estimation (à ~2 % près).</p>
+""")
+
+BUILTIN_TEMPLATES = {
+    'default': DEFAULT_TEMPLATE,
+    'report_ready': REPORT_READY_TEMPLATE,
+    'digest': DIGEST_TEMPLATE,
+    'error': ERROR_TEMPLATE,
+    'weekly_summary': SUMMARY_TEMPLATE
+}
+
+# Noms de config.templates correspondant à un template intégré
+TEMPLATE_ALIASES = {
+    'error_notification': 'error'
+}
+
+
+class CompiledTemplate:
+    """Template découpé en segments : [texte, clé, texte, clé, ..., texte]"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.segments = PLACEHOLDER.split(source)
+        self.keys = tuple(self.segments[1::2])
+
+    def render(self, data: Dict) -> str:
+        """Rend le template en un seul join (marqueur conservé si la clé manque)"""
+        parts = list(self.segments)
+        for index in range(1, len(parts), 2):
+            key = parts[index]
+            parts[index] = str(data[key]) if key in data else f'{{{{{key}}}}}'
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=64)
+def compile_template(source: str) -> CompiledTemplate:
+    """Compile un template (partagé par tout le processus)"""
+    return CompiledTemplate(source)
+
+
+class TemplateRegistry:
+    """
+    Templates intégrés + fichiers de config.templates
+
+    Un fichier présent remplace le template intégré du même nom ; il est
+    recompilé seulement quand sa date de modification change.
+    """
+
+    def __init__(self, template_files: Optional[Dict[str, str]] = None):
+        self.template_files = {
+            TEMPLATE_ALIASES.get(name, name): path
+            for name, path in (template_files or {}).items()
+        }
+        self._loaded: Dict[str, Tuple[float, CompiledTemplate]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CompiledTemplate:
+        """Template compilé (fichier à jour, sinon intégré, sinon défaut)"""
+        compiled = self._from_file(name)
+        if compiled is not None:
+            return compiled
+        return compile_template(BUILTIN_TEMPLATES.get(name, DEFAULT_TEMPLATE))
+
+    def render(self, name: str, data: Dict) -> str:
+        return self.get(name).render(data)
+
+    def _from_file(self, name: str) -> Optional[CompiledTemplate]:
+        path = self.template_files.get(name)
+        if not path:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                compiled = compile_template(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"⚠️ Template {path} illisible, template intégré utilisé: {e}")
+            return None
+
+        with self._lock:
+            self._loaded[name] = (mtime, compiled)
+        if cached:
+            logger.info(f"🔄 Template rechargé: {path}")
+        return compiled
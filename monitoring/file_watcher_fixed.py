@@ -1,18 +1,32 @@
 """
 Système de monitoring intelligent pour surveillance automatique des dossiers - Version corrigée
+Cœur asyncio : les événements watchdog et les minuteries alimentent une boucle
+unique ; les attentes de stabilité sont des tâches, les traitements (bloquants)
+passent par un pool borné via run_in_executor. Plusieurs inboxes (projets /
+partenaires) sont observées ensemble et partagent ce pool équitablement ;
+les fichiers déjà présents au démarrage sont traités, et les inboxes sur
+partage réseau peuvent être scrutées par instantanés au lieu d'événements ;
+un ensemble identique à un ensemble déjà traité n'est pas retraité ; les
+ensembles en attente sont ordonnés par coût estimé (ou priorité)
 """
 import os
-import time
+import asyncio
 import logging
-import shutil
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import json
-import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-import hashlib
+
+from core.file_handler import FileHandler
+from monitoring.set_correlator import FileSet
+from monitoring.inboxes import Inbox, InboxScheduler, inboxes_from_config
+from monitoring.dir_snapshot import DirectorySnapshot
+from monitoring.archiver import Archiver
+from monitoring.set_index import ProcessedSetIndex, file_digest, set_digest
+from monitoring.job_scheduler import SchedulingPolicy
 
 # Configuration du logger avec UTF-8
 logger = logging.getLogger(__name__)
@@ -33,34 +47,56 @@ class SmartFileWatcher(FileSystemEventHandler):
             config_path: Chemin vers la configuration du monitoring
         """
         self.config = self._load_config(config_path)
-        self.watched_folder = Path(self.config['watched_folder'])
-        self.processed_folder = Path(self.config['processed_folder'])
-        self.error_folder = Path(self.config['error_folder'])
+        
+        # Inboxes surveillées (une seule si la configuration n'a que 'watched_folder') ;
+        # chacune regroupe ses fichiers en ensembles (plusieurs en cours à la fois)
+        self.inboxes: Dict[str, Inbox] = {inbox.name: inbox for inbox in inboxes_from_config(self.config)}
+        primary = next(iter(self.inboxes.values()))
+        self.watched_folder = primary.watched_folder
+        self.processed_folder = primary.processed_folder
+        self.error_folder = primary.error_folder
         
         # Créer les dossiers s'ils n'existent pas
         self._create_folders()
+        self._inbox_by_folder = {inbox.watched_folder.resolve(): inbox for inbox in self.inboxes.values()}
         
-        # État du monitoring
-        self.pending_files = {}
+        # Archivage : déplacement sans copie, compression et rétention
+        # (AutoProcessor le reconfigure depuis sa section 'advanced')
+        self.archiver = Archiver()
+        for inbox in self.inboxes.values():
+            self.archiver.add_root(inbox.processed_folder)
+            self.archiver.add_root(inbox.error_folder)
+        
+        self.file_handler = FileHandler()
         self.processing_queue = []
-        self.file_checksums = {}
+        # Empreintes par chemin, valables tant que taille et date de modification sont inchangées
+        self.file_checksums: Dict[Path, tuple] = {}
+        # Ensembles déjà traités : un ensemble redéposé reprend le résultat précédent
+        self.set_index = (ProcessedSetIndex(self.config['dedup_index'])
+                          if self.config.get('deduplicate', True) else None)
         self.last_check = datetime.now()
         
-        # Patterns de fichiers requis
-        self.required_patterns = {
-            'bulkreport': self.config['patterns']['bulkreport'],
-            'export': self.config['patterns']['export'],
-            'frais': self.config['patterns'].get('frais', ['frais'])
-        }
-        
         # Callback pour traitement
         self.process_callback = None
+        # Callback de pré-lecture (type, chemin) appelé dès qu'un fichier est stable
+        self.prefetch_callback = None
         
-        # Thread de vérification périodique
-        self.check_thread = threading.Thread(target=self._periodic_check, daemon=True)
-        self.check_thread.start()
+        # Boucle asyncio (créée par run) : attentes de stabilité par fichier,
+        # file des ensembles complets et pool des traitements bloquants
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._settling: Dict[Path, asyncio.Task] = {}
+        self._snapshots: Dict[str, DirectorySnapshot] = {
+            name: DirectorySnapshot(inbox.watched_folder) for name, inbox in self.inboxes.items()
+        }
+        self.scheduler = InboxScheduler(list(self.inboxes.values()),
+                                        SchedulingPolicy.from_config(self.config))
+        self._job_ready: Optional[asyncio.Condition] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self.max_concurrent_jobs = self.config.get('max_concurrent_jobs', 4)
         
-        logger.info(f"[INFO] Monitoring initialisé sur: {self.watched_folder}")
+        for inbox in self.inboxes.values():
+            logger.info(f"[INFO] Monitoring initialisé sur: {inbox.watched_folder} ({inbox.name})")
     
     def _load_config(self, config_path: str) -> dict:
         """Charge la configuration du monitoring"""
@@ -77,6 +113,22 @@ class SmartFileWatcher(FileSystemEventHandler):
             },
             'auto_process': True,
             'archive_processed': True,
+            'max_concurrent_jobs': 4,
+            'correlation_window': 600,
+            'orphan_timeout': 3600,
+            # [{'name', 'watched_folder', 'processed_folder', 'error_folder', 'patterns',
+            #   'metadata', 'partners', 'max_concurrent'}] ; vide = 'watched_folder' seul
+            'inboxes': [],
+            # Fichiers déjà présents au démarrage ; scrutation (SMB) au lieu des événements
+            'scan_backlog': True,
+            'polling': False,
+            'poll_interval': 5,
+            # Index des ensembles traités (empreinte du contenu)
+            'deduplicate': True,
+            'dedup_index': './outputs/processed_sets.db',
+            # Ordre des ensembles en attente : 'sjf' (plus court d'abord), 'fifo',
+            # 'priority' (étiquette 'prio1' / 'urgent' dans le nom) ; vieillissement en secondes
+            'scheduling': {'policy': 'sjf', 'aging': 60, 'default_priority': 5},
             'send_notifications': True
         }
         
@@ -92,225 +144,365 @@ class SmartFileWatcher(FileSystemEventHandler):
     
     def _create_folders(self):
         """Crée les dossiers nécessaires"""
-        for folder in [self.watched_folder, self.processed_folder, self.error_folder]:
-            folder.mkdir(parents=True, exist_ok=True)
-            logger.info(f"[OK] Dossier vérifié: {folder}")
+        for inbox in self.inboxes.values():
+            inbox.create_folders()
     
     def on_created(self, event):
-        """Déclenché lors de la création d'un fichier"""
+        """Déclenché lors de la création d'un fichier (thread watchdog)"""
         if not event.is_directory:
-            self._handle_new_file(event.src_path)
+            self._post(event.src_path)
     
     def on_modified(self, event):
-        """Déclenché lors de la modification d'un fichier"""
+        """Déclenché lors de la modification d'un fichier (thread watchdog)"""
         if not event.is_directory:
-            self._handle_new_file(event.src_path)
+            self._post(event.src_path)
+    
+    def _post(self, file_path: str):
+        """Transmet l'événement à la boucle (aucun traitement sur le thread watchdog)"""
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._handle_new_file, file_path)
     
     def _handle_new_file(self, file_path: str):
-        """Gère l'arrivée d'un nouveau fichier"""
+        """Gère l'arrivée d'un nouveau fichier (relance l'attente de stabilité)"""
         file_path = Path(file_path)
         
         # Ignorer les fichiers temporaires
         if file_path.name.startswith('~') or file_path.name.startswith('.'):
             return
         
+        inbox = self._inbox_by_folder.get(file_path.parent.resolve())
+        if inbox is None:
+            return
+        
+        # Un nouvel événement sur le fichier (écriture en cours) relance l'attente
+        previous = self._settling.pop(file_path, None)
+        if previous is not None:
+            previous.cancel()
+        task = asyncio.ensure_future(self._settle(inbox, file_path))
+        self._settling[file_path] = task
+        task.add_done_callback(lambda t, path=file_path: self._settled(path, t))
+    
+    def _settled(self, file_path: Path, task: asyncio.Task):
+        if self._settling.get(file_path) is task:
+            del self._settling[file_path]
+    
+    async def _settle(self, inbox: Inbox, file_path: Path):
+        """Attend que le fichier soit stable puis le rattache à un ensemble en cours"""
         # Vérifier si le fichier est stable (pas en cours d'écriture)
-        if not self._is_file_stable(file_path):
+        if not await self._is_file_stable(file_path):
             return
         
-        logger.info(f"[NEW FILE] Nouveau fichier détecté: {file_path.name}")
+        logger.info(f"[NEW FILE] Nouveau fichier détecté: {file_path.name} ({inbox.name})")
         
         # Identifier le type de fichier
-        file_type = self._identify_file_type(file_path)
+        file_type = inbox.identify(file_path)
         if file_type:
-            self.pending_files[file_type] = {
-                'path': file_path,
-                'timestamp': datetime.now(),
-                'checksum': self._calculate_checksum(file_path)
-            }
+            checksum = await self.loop.run_in_executor(None, self._calculate_checksum, file_path)
+            # Le nom du plan (en-tête du BulkReport) sert aussi à apparier les fichiers
+            plan_name = None
+            if file_type == 'bulkreport':
+                plan_name = await self.loop.run_in_executor(None, self._read_plan_name, file_path)
             logger.info(f"  -> Identifié comme: {file_type}")
             
-            # Vérifier si on a tous les fichiers requis
-            self._check_complete_set()
+            # Lire le fichier sans attendre le reste de l'ensemble
+            if self.prefetch_callback:
+                try:
+                    self.prefetch_callback(file_type, str(file_path))
+                except Exception as e:
+                    logger.warning(f"[WARNING] Pré-lecture impossible: {e}")
+            
+            # Vérifier si l'ensemble du fichier est complet
+            complete = inbox.correlator.add(file_type, file_path, checksum, plan_name)
+            if complete is not None:
+                # Coût estimé (taille et début du BulkReport) pour l'ordonnancement
+                estimate = await self.loop.run_in_executor(
+                    None, self.scheduler.policy.estimate, complete.as_job_files())
+                self._check_complete_set(inbox, complete, **estimate)
     
-    def _is_file_stable(self, file_path: Path) -> bool:
+    async def _is_file_stable(self, file_path: Path) -> bool:
         """Vérifie si un fichier est stable (fini d'être écrit)"""
         try:
             # Attendre un peu
-            time.sleep(self.config['file_stability_time'])
+            await asyncio.sleep(self.config['file_stability_time'])
             
             # Vérifier que la taille n'a pas changé
             initial_size = file_path.stat().st_size
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
             final_size = file_path.stat().st_size
             
             return initial_size == final_size and initial_size > 0
-        except:
+        except OSError:
             return False
     
-    def _identify_file_type(self, file_path: Path) -> Optional[str]:
-        """Identifie le type de fichier basé sur les patterns"""
-        filename_lower = file_path.name.lower()
-        
-        for file_type, patterns in self.required_patterns.items():
-            for pattern in patterns:
-                if pattern.lower() in filename_lower:
-                    return file_type
-        
-        return None
+    def _calculate_checksum(self, file_path: Path) -> Optional[str]:
+        """Checksum SHA256 d'un fichier stable (recalculé seulement si le fichier a changé)"""
+        try:
+            stat = file_path.stat()
+            cached = self.file_checksums.get(file_path)
+            if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                return cached[2]
+            checksum = file_digest(file_path)
+        except OSError as e:
+            logger.warning(f"[WARNING] Checksum impossible {file_path.name}: {e}")
+            return None
+        self.file_checksums[file_path] = (stat.st_size, stat.st_mtime_ns, checksum)
+        return checksum
     
-    def _calculate_checksum(self, file_path: Path) -> str:
-        """Calcule le checksum SHA256 d'un fichier"""
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+    def _read_plan_name(self, file_path: Path) -> Optional[str]:
+        """Nom du plan lu dans l'en-tête du BulkReport (None si illisible)"""
+        try:
+            return self.file_handler.read_bulk_metadata(str(file_path)).get('plan_name')
+        except Exception:
+            return None
     
-    def _check_complete_set(self):
-        """Vérifie si on a un ensemble complet de fichiers"""
-        required = ['bulkreport', 'export']  # 'frais' est optionnel
-        
-        if all(req in self.pending_files for req in required):
-            logger.info("[COMPLETE] Ensemble complet détecté! Lancement du traitement...")
+    def _check_complete_set(self, inbox: Inbox, file_set: FileSet, cost: int = 0, priority: int = 0):
+        """Lance le traitement d'un ensemble complet de fichiers"""
+        if file_set.is_complete():
+            logger.info(f"[COMPLETE] Ensemble complet détecté ({file_set})! Lancement du traitement...")
             
             # Préparer les fichiers pour traitement
-            files_to_process = {
-                'bulkreport': str(self.pending_files['bulkreport']['path']),
-                'export': str(self.pending_files['export']['path']),
-                'frais': str(self.pending_files['frais']['path']) if 'frais' in self.pending_files else None
-            }
+            files_to_process = file_set.as_job_files()
+            digest = set_digest(file_set.checksums(), inbox.name)
+            for entry in file_set.files.values():
+                self.file_checksums.pop(entry['path'], None)
             
             # Ajouter à la queue de traitement
             self.processing_queue.append({
                 'id': datetime.now().strftime('%Y%m%d_%H%M%S'),
+                'inbox': inbox.name,
                 'files': files_to_process,
                 'timestamp': datetime.now()
             })
             
-            # Déclencher le callback de traitement
+            # Déclencher le traitement (pris en charge par un worker de la boucle)
             if self.process_callback:
-                threading.Thread(
-                    target=self._process_with_callback,
-                    args=(files_to_process,),
-                    daemon=True
-                ).start()
-            
-            # Nettoyer les fichiers pending
-            self.pending_files.clear()
+                self.scheduler.push(inbox, {'files': files_to_process, 'digest': digest},
+                                    cost=cost, priority=priority)
+                asyncio.ensure_future(self._notify_workers())
+    
+    async def _notify_workers(self):
+        async with self._job_ready:
+            self._job_ready.notify_all()
+    
+    async def _job_worker(self):
+        """Prend le prochain ensemble (inboxes servies à tour de rôle) et le traite"""
+        while True:
+            async with self._job_ready:
+                item = self.scheduler.pop()
+                while item is None:
+                    await self._job_ready.wait()
+                    item = self.scheduler.pop()
+            inbox, job = item
+            try:
+                await self.loop.run_in_executor(self._executor, self._process_with_callback,
+                                                inbox, job['files'], job['digest'])
+            finally:
+                # Un slot de l'inbox se libère : un ensemble en attente peut partir
+                self.scheduler.done(inbox)
+                await self._notify_workers()
     
-    def _process_with_callback(self, files: Dict[str, str]):
-        """Exécute le callback de traitement avec gestion d'erreur"""
+    def _process_with_callback(self, inbox: Inbox, files: Dict[str, str],
+                               digest: Optional[str] = None,
+                               job_id: Optional[str] = None) -> Optional[Dict]:
+        """Exécute le callback de traitement avec gestion d'erreur (thread du pool)"""
         try:
-            logger.info("[PROCESSING] Début du traitement automatique...")
-            result = self.process_callback(files)
+            previous = self._previous_outcome(digest)
+            if previous is not None:
+                logger.info(f"[DUPLICATE] Ensemble identique déjà traité (job {previous.get('job_id')}), "
+                            f"rapport: {previous.get('report_path')}")
+                self._archive_processed_files(files, inbox)
+                return previous
+            
+            logger.info(f"[PROCESSING] Début du traitement automatique ({inbox.name})...")
+            if job_id is None:
+                result = self.process_callback(files, inbox=inbox.name)
+            else:
+                result = self.process_callback(files, inbox=inbox.name, job_id=job_id)
             
             if result['success']:
                 logger.info("[SUCCESS] Traitement réussi!")
-                self._archive_processed_files(files)
+                self._record_processed_set(digest, files, inbox, result)
+                self._archive_processed_files(files, inbox)
             else:
                 logger.error(f"[ERROR] Erreur de traitement: {result.get('error')}")
-                self._move_to_error_folder(files)
+                self._move_to_error_folder(files, inbox)
                 
         except Exception as e:
             logger.error(f"[EXCEPTION] Exception lors du traitement: {e}")
-            self._move_to_error_folder(files)
+            self._move_to_error_folder(files, inbox)
+            return None
+        return result
     
-    def _archive_processed_files(self, files: Dict[str, str]):
-        """Archive les fichiers traités avec succès en utilisant shutil pour éviter les erreurs de permission"""
+    def process_recovered(self, inbox_name: str, files: Dict[str, Optional[str]],
+                          job_id: str) -> Optional[Dict]:
+        """
+        Reprend un job interrompu (journal) par le même circuit qu'un ensemble
+        détecté : index des ensembles et archivage, pour que l'arriéré du
+        dossier ne retraite pas ses fichiers au démarrage
+        """
+        inbox = self.inboxes[inbox_name]
+        paths = [Path(path) for path in files.values() if path]
+        checksums = {file_type: self._calculate_checksum(Path(path))
+                     for file_type, path in files.items() if path}
+        digest = set_digest(checksums, inbox.name)
+        for path in paths:
+            self.file_checksums.pop(path, None)
+        logger.info(f"[RECOVER] Reprise du job {job_id} ({inbox.name})")
+        return self._process_with_callback(inbox, files, digest, job_id=job_id)
+    
+    def _previous_outcome(self, digest: Optional[str]) -> Optional[Dict]:
+        """Résultat d'un traitement précédent du même ensemble (None si inconnu)"""
+        if self.set_index is None or digest is None:
+            return None
+        try:
+            return self.set_index.lookup(digest)
+        except Exception as e:
+            logger.warning(f"[WARNING] Index des ensembles illisible: {e}")
+            return None
+    
+    def _record_processed_set(self, digest: Optional[str], files: Dict[str, str],
+                              inbox: Inbox, result: Dict):
+        if self.set_index is None or digest is None:
+            return
+        try:
+            self.set_index.record(digest, files, result, inbox=inbox.name)
+        except Exception as e:
+            logger.warning(f"[WARNING] Ensemble non indexé: {e}")
+    
+    def _archive_processed_files(self, files: Dict[str, str], inbox: Inbox):
+        """Archive les fichiers traités avec succès (déplacement, compression en arrière-plan)"""
         if not self.config['archive_processed']:
             return
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        archive_folder = self.processed_folder / timestamp
-        archive_folder.mkdir(exist_ok=True)
-        
-        for file_type, file_path in files.items():
-            if file_path and os.path.exists(file_path):
-                try:
-                    source = Path(file_path)
-                    dest = archive_folder / source.name
-                    
-                    # Utiliser shutil.copy2 au lieu de rename pour éviter les problèmes de permission
-                    shutil.copy2(source, dest)
-                    
-                    # Essayer de supprimer l'original après copie réussie
-                    try:
-                        os.remove(source)
-                    except:
-                        logger.warning(f"  [WARNING] Impossible de supprimer: {source.name} (fichier peut-être encore ouvert)")
-                    
-                    logger.info(f"  [ARCHIVED] {source.name} -> {archive_folder.name}/")
-                except Exception as e:
-                    logger.warning(f"  [WARNING] Erreur archivage {file_type}: {e}")
+        self.archiver.archive(files, inbox.processed_folder)
     
-    def _move_to_error_folder(self, files: Dict[str, str]):
-        """Déplace les fichiers en erreur en utilisant shutil"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        error_folder = self.error_folder / timestamp
-        error_folder.mkdir(exist_ok=True)
-        
-        for file_type, file_path in files.items():
-            if file_path and os.path.exists(file_path):
-                try:
-                    source = Path(file_path)
-                    dest = error_folder / source.name
-                    
-                    # Utiliser shutil.copy2 pour éviter les erreurs
-                    shutil.copy2(source, dest)
-                    
-                    # Essayer de supprimer l'original
-                    try:
-                        os.remove(source)
-                    except:
-                        pass
-                    
-                    logger.warning(f"  [ERROR MOVED] {source.name}")
-                except Exception as e:
-                    logger.error(f"  [ERROR] Impossible de déplacer {file_type}: {e}")
+    def _move_to_error_folder(self, files: Dict[str, str], inbox: Inbox):
+        """Déplace les fichiers en erreur"""
+        folder = self.archiver.archive(files, inbox.error_folder)
+        if folder is not None:
+            logger.warning(f"  [ERROR MOVED] {', '.join(Path(p).name for p in files.values() if p)}")
     
-    def _periodic_check(self):
+    async def _periodic_check(self):
         """Vérification périodique des fichiers orphelins"""
         while True:
-            time.sleep(self.config['check_interval'])
+            await asyncio.sleep(self.config['check_interval'])
+            self.last_check = datetime.now()
             
-            # Nettoyer les fichiers pending trop vieux (> 1 heure)
-            cutoff_time = datetime.now() - timedelta(hours=1)
+            # Abandonner les ensembles incomplets trop vieux (> 1 heure)
+            for inbox in self.inboxes.values():
+                inbox.correlator.evict()
             
-            for file_type in list(self.pending_files.keys()):
-                if self.pending_files[file_type]['timestamp'] < cutoff_time:
-                    logger.info(f"[CLEANUP] Nettoyage fichier orphelin: {file_type}")
-                    del self.pending_files[file_type]
+            # Archives au-delà de la rétention (au plus une fois par heure)
+            await self.loop.run_in_executor(None, self.archiver.prune_if_due)
     
     def set_process_callback(self, callback):
-        """Définit la fonction callback pour le traitement"""
+        """Définit la fonction callback pour le traitement : callback(files, inbox=nom[, job_id=id])"""
         self.process_callback = callback
         logger.info("[OK] Callback de traitement configuré")
     
-    def start_monitoring(self):
-        """Démarre le monitoring du dossier"""
+    def set_prefetch_callback(self, callback):
+        """Définit la fonction de pré-lecture appelée à l'arrivée de chaque fichier"""
+        self.prefetch_callback = callback
+    
+    async def run(self):
+        """Boucle du monitoring : événements, vérification périodique et traitements"""
+        self.loop = asyncio.get_running_loop()
+        self._job_ready = asyncio.Condition()
+        self._stopped = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_jobs,
+                                            thread_name_prefix='watcher-job')
+        tasks = [asyncio.ensure_future(self._periodic_check())]
+        tasks += [asyncio.ensure_future(self._job_worker()) for _ in range(self.max_concurrent_jobs)]
+        
+        # Un seul observateur pour les inboxes à événements, une tâche par inbox scrutée
         observer = Observer()
-        observer.schedule(self, str(self.watched_folder), recursive=False)
+        for inbox in self.inboxes.values():
+            if inbox.poll:
+                tasks.append(asyncio.ensure_future(self._poll(inbox)))
+                logger.info(f"[MONITORING] Scrutation toutes les {inbox.poll_interval}s: "
+                            f"{inbox.watched_folder} ({inbox.name})")
+            else:
+                observer.schedule(self, str(inbox.watched_folder), recursive=False)
+                logger.info(f"[MONITORING] Actif sur: {inbox.watched_folder} ({inbox.name})")
         observer.start()
         
-        logger.info(f"[MONITORING] Actif sur: {self.watched_folder}")
+        # Instantané initial : l'arriéré du dossier passe par le circuit normal
+        await self._scan_backlog()
+
         logger.info("  -> En attente de fichiers...")
         
         try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
+            await self._stopped.wait()
+        finally:
             observer.stop()
+            # Annulation : attentes de stabilité et workers ; un traitement déjà
+            # lancé dans le pool va jusqu'au bout (pas d'interruption à mi-rapport)
+            for task in tasks + list(self._settling.values()):
+                task.cancel()
+            await asyncio.gather(*tasks, *self._settling.values(), return_exceptions=True)
+            self._settling.clear()
+            await self.loop.run_in_executor(None, observer.join)
+            # Attente des traitements en cours hors de la boucle (elle reste réactive)
+            await self.loop.run_in_executor(None, self._executor.shutdown, True)
+            await self.loop.run_in_executor(None, self.archiver.stop)
+            self.loop = None
+            logger.info("[STOP] Monitoring arrêté")
+    
+    async def _scan_backlog(self):
+        """Fichiers déjà présents au démarrage, du plus ancien au plus récent"""
+        backlog = 0
+        for name, snapshot in self._snapshots.items():
+            await self.loop.run_in_executor(None, snapshot.refresh)
+            if not self.config.get('scan_backlog', True):
+                continue
+            for file_name, _ in sorted(snapshot.entries.items(), key=lambda item: item[1][1]):
+                self._handle_new_file(str(snapshot.folder / file_name))
+                backlog += 1
+        if backlog:
+            logger.info(f"[BACKLOG] {backlog} fichier(s) déjà présent(s) pris en charge")
+    
+    async def _poll(self, inbox: Inbox):
+        """Scrutation d'une inbox : différence entre deux instantanés du dossier"""
+        snapshot = self._snapshots[inbox.name]
+        while True:
+            await asyncio.sleep(inbox.poll_interval)
+            changed, _ = await self.loop.run_in_executor(None, snapshot.refresh)
+            for file_path in changed:
+                self._handle_new_file(str(file_path))
+    
+    def stop(self):
+        """Arrête le monitoring (appelable depuis n'importe quel thread)"""
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._stopped.set)
+    
+    def start_monitoring(self):
+        """Démarre le monitoring du dossier (bloquant jusqu'à Ctrl+C ou stop())"""
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
             logger.info("[STOP] Monitoring arrêté")
-        
-        observer.join()
     
     def get_stats(self) -> dict:
         """Retourne les statistiques du monitoring"""
         return {
             'watched_folder': str(self.watched_folder),
-            'pending_files': len(self.pending_files),
+            'inboxes': {
+                name: {
+                    'watched_folder': str(inbox.watched_folder),
+                    'pending_sets': len(inbox.correlator.open_sets),
+                    'queued_jobs': len(self.scheduler.queues[name]),
+                    'running_jobs': self.scheduler.running[name]
+                }
+                for name, inbox in self.inboxes.items()
+            },
+            'pending_files': sum(inbox.correlator.pending_count() for inbox in self.inboxes.values()),
             'queue_size': len(self.processing_queue),
+            'settling_files': len(self._settling),
+            'queued_jobs': self.scheduler.queued(),
+            'scheduling': self.scheduler.policy.name,
+            'archiver': dict(self.archiver.stats),
+            'processed_sets': self.set_index.get_stats() if self.set_index else None,
             'last_check': self.last_check.isoformat(),
-            'status': 'running'
+            'status': 'running' if self.loop else 'stopped'
         }
@@ -0,0 +1,128 @@
+"""
+Dossiers d'arrivée (inboxes) surveillés par un même démon
+Chaque inbox a ses dossiers, ses motifs, ses métadonnées (libelle, projet,
+budget) et ses partenaires ; toutes alimentent un pool de traitement partagé
+où chaque inbox est servie à tour de rôle, dans la limite de sa concurrence ;
+dans une inbox, la politique d'ordonnancement choisit le prochain ensemble
+"""
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from monitoring.set_correlator import SetCorrelator
+from monitoring.job_scheduler import QueuedJob, SchedulingPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INBOX = 'default'
+
+
+class Inbox:
+    """Dossier d'arrivée et ses paramètres propres"""
+
+    def __init__(self, name: str, config: dict, defaults: dict):
+        """
+        Args:
+            name: Nom de l'inbox (projet / partenaire)
+            config: Définition de l'inbox (surcharge les valeurs par défaut)
+            defaults: Configuration générale du monitoring
+        """
+        self.name = name
+        self.watched_folder = Path(config.get('watched_folder', defaults['watched_folder']))
+        self.processed_folder = Path(config.get('processed_folder', defaults['processed_folder']))
+        self.error_folder = Path(config.get('error_folder', defaults['error_folder']))
+        self.patterns = {
+            'bulkreport': defaults['patterns']['bulkreport'],
+            'export': defaults['patterns']['export'],
+            'frais': defaults['patterns'].get('frais', ['frais'])
+        }
+        self.patterns.update(config.get('patterns', {}))
+        # Métadonnées du rapport et partenaires destinataires (None = tous) : email d'un
+        # partenaire configuré ou entrée complète {'name', 'email', 'send_pdf', 'send_excel'}
+        self.metadata: Dict = dict(config.get('metadata', {}))
+        self.partners: Optional[List] = config.get('partners')
+        # Traitements simultanés de l'inbox (par défaut : tout le pool partagé)
+        default_cap = defaults.get('inbox_max_concurrent', defaults.get('max_concurrent_jobs', 4))
+        self.max_concurrent = max(1, config.get('max_concurrent', default_cap))
+        # Scrutation périodique (partages réseau) au lieu des événements watchdog
+        self.poll = bool(config.get('poll', defaults.get('polling', False)))
+        self.poll_interval = config.get('poll_interval', defaults.get('poll_interval', 5))
+        self.correlator = SetCorrelator(
+            self.patterns,
+            window=config.get('correlation_window', defaults.get('correlation_window', 600)),
+            orphan_timeout=config.get('orphan_timeout', defaults.get('orphan_timeout', 3600))
+        )
+
+    def create_folders(self):
+        for folder in [self.watched_folder, self.processed_folder, self.error_folder]:
+            folder.mkdir(parents=True, exist_ok=True)
+            logger.info(f"[OK] Dossier vérifié: {folder}")
+
+    def identify(self, file_path: Path) -> Optional[str]:
+        """Identifie le type de fichier basé sur les patterns de l'inbox"""
+        filename_lower = file_path.name.lower()
+        for file_type, patterns in self.patterns.items():
+            for pattern in patterns:
+                if pattern.lower() in filename_lower:
+                    return file_type
+        return None
+
+    def __repr__(self):
+        return f"Inbox({self.name}: {self.watched_folder})"
+
+
+def inboxes_from_config(config: dict) -> List[Inbox]:
+    """
+    Inboxes de la configuration ('inboxes'), ou une seule inbox construite
+    depuis 'watched_folder' pour les configurations existantes
+    """
+    definitions = config.get('inboxes') or [{'name': DEFAULT_INBOX}]
+    inboxes = []
+    for index, definition in enumerate(definitions):
+        name = definition.get('name') or f"inbox{index + 1}"
+        if any(inbox.name == name for inbox in inboxes):
+            raise ValueError(f"Nom d'inbox en double: {name}")
+        inboxes.append(Inbox(name, definition, config))
+    return inboxes
+
+
+class InboxScheduler:
+    """
+    Files d'attente par inbox servies à tour de rôle
+
+    Une inbox qui dépose cent ensembles n'empêche pas les autres d'être
+    traitées ; chaque inbox ne dépasse pas son nombre de traitements simultanés.
+    Dans une inbox, un gros fichier de fin de mois ne bloque pas les petits
+    rapports quotidiens (plus court d'abord, avec vieillissement).
+    """
+
+    def __init__(self, inboxes: List[Inbox], policy: Optional[SchedulingPolicy] = None):
+        self.inboxes = {inbox.name: inbox for inbox in inboxes}
+        self.policy = policy or SchedulingPolicy('fifo')
+        self.queues: Dict[str, List[QueuedJob]] = {name: [] for name in self.inboxes}
+        self.running: Dict[str, int] = {name: 0 for name in self.inboxes}
+        self._order: Deque[str] = deque(self.inboxes)
+
+    def push(self, inbox: Inbox, job: Dict, cost: int = 0, priority: int = 0):
+        self.queues[inbox.name].append(QueuedJob(job, cost, priority))
+
+    def pop(self) -> Optional[Tuple[Inbox, Dict]]:
+        """Prochain ensemble à traiter (None si aucune inbox n'est éligible)"""
+        for _ in range(len(self._order)):
+            name = self._order[0]
+            self._order.rotate(-1)
+            queue = self.queues[name]
+            if queue and self.running[name] < self.inboxes[name].max_concurrent:
+                self.running[name] += 1
+                queued = queue.pop(self.policy.select(queue))
+                if queue:
+                    logger.debug(f"[SCHEDULER] {name}: {queued} choisi ({len(queue)} en attente)")
+                return self.inboxes[name], queued.job
+        return None
+
+    def done(self, inbox: Inbox):
+        self.running[inbox.name] -= 1
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
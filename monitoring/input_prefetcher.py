@@ -0,0 +1,134 @@
+"""
+Pré-lecture spéculative des fichiers d'entrée
+Chaque fichier est lu (puis le format détecté / l'Export indexé) dès qu'il est
+stable dans le dossier surveillé, sans attendre l'ensemble complet ; le
+traitement récupère ensuite ces résultats au lieu de relire les fichiers
+"""
+import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+from core.input_loader import READ_METHODS
+from core.smart_processor import SmartProcessor
+from core.stage_cache import StageCache, code_version, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Type de fichier -> étape du cache
+PARSE_STAGES = {
+    'bulkreport': 'parse_bulk',
+    'export': 'parse_export',
+    'frais': 'parse_fees'
+}
+
+
+def _signature(path: str) -> Optional[Tuple[str, int, int]]:
+    """Identité d'un fichier : un fichier remplacé ou modifié n'est pas réutilisé"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+class InputPrefetcher:
+    """Lectures anticipées en arrière-plan, remises au traitement une seule fois"""
+
+    def __init__(self, file_handler, stage_cache: StageCache, max_workers: int = 2,
+                 max_entries: int = 6):
+        """
+        Args:
+            file_handler: FileHandler utilisé pour la lecture
+            stage_cache: Cache des étapes (détection / index de l'Export y sont conservés)
+            max_workers: Lectures simultanées
+            max_entries: Résultats conservés en attente du traitement
+        """
+        self.file_handler = file_handler
+        self.stage_cache = stage_cache
+        self.max_entries = max_entries
+        # Instance dédiée : la détection tourne en parallèle d'un traitement en cours
+        self.smart_processor = SmartProcessor()
+        self.smart_processor.stage_cache = stage_cache
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers = max_workers
+        self._pending: 'OrderedDict[Tuple[str, int, int], Future]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'prefetched': 0, 'used': 0, 'discarded': 0}
+
+    def parse(self, file_type: str, path: str) -> Tuple[Any, str]:
+        """
+        Lecture mémoïsée d'un fichier d'entrée
+
+        Returns:
+            (résultat de la lecture, clé de l'étape)
+        """
+        return self.stage_cache.run(
+            PARSE_STAGES[file_type], [file_fingerprint(path)],
+            lambda: getattr(self.file_handler, READ_METHODS[file_type])(path),
+            code_version('core.file_handler', 'core.csv_parser_robust')
+        )
+
+    def prefetch(self, file_type: str, path: str):
+        """Lance la lecture d'un fichier stable (appelé par le surveillant)"""
+        if file_type not in PARSE_STAGES:
+            return
+        signature = _signature(path)
+        if signature is None:
+            return
+        with self._lock:
+            if signature in self._pending:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix='prefetch')
+            self._pending[signature] = self._executor.submit(self._warm, file_type, path)
+            self.stats['prefetched'] += 1
+            while len(self._pending) > self.max_entries:
+                _, dropped = self._pending.popitem(last=False)
+                dropped.cancel()
+                self.stats['discarded'] += 1
+        logger.info(f"  ⏩ Pré-lecture lancée: {os.path.basename(path)} ({file_type})")
+
+    def _warm(self, file_type: str, path: str) -> Tuple[Any, str]:
+        """Lecture puis étapes qui ne dépendent que de ce fichier"""
+        value, key = self.parse(file_type, path)
+        # Détection et index ne sont réutilisables que via le cache des étapes
+        if not self.stage_cache.enabled:
+            return value, key
+        if file_type == 'bulkreport':
+            self.smart_processor.detect(value[0], key)
+        elif file_type == 'export':
+            self.smart_processor.index_export(value, key)
+        return value, key
+
+    def take(self, file_type: str, path: Optional[str]) -> Tuple[Any, str]:
+        """
+        Résultat de la pré-lecture si le fichier n'a pas changé depuis, sinon lecture
+
+        Une pré-lecture encore en cours est attendue plutôt que recommencée ;
+        une pré-lecture en échec est refaite ici pour remonter l'erreur normalement.
+        """
+        signature = _signature(path) if path else None
+        with self._lock:
+            future = self._pending.pop(signature, None) if signature else None
+        if future is not None and not future.cancelled():
+            try:
+                value = future.result()
+                self.stats['used'] += 1
+                logger.info(f"  ⚡ Pré-lecture utilisée: {os.path.basename(path)}")
+                return value
+            except Exception as e:
+                logger.warning(f"  ⚠ Pré-lecture en échec ({os.path.basename(path)}): {e}")
+        return self.parse(file_type, path)
+
+    def shutdown(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
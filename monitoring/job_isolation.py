@@ -0,0 +1,227 @@
+"""
+Exécution isolée des jobs dans des processus de travail
+Un BulkReport pathologique, un Export géant ou un rendu bloqué ne touchent
+plus le démon : chaque job s'exécute dans un processus fils (espace d'adressage
+borné par resource.setrlimit, délai maximal par étape), tué et remplacé au besoin.
+Les fils sont recyclés après N jobs ; seuls les messages d'étape et le
+résultat (chemins, statistiques) traversent le pipe, les DataFrames restent
+dans le journal et le cache sur disque
+"""
+import time
+import logging
+import threading
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Délai maximal par étape (secondes)
+DEFAULT_STAGE_TIMEOUTS = {'read': 300, 'process': 600, 'report': 600, 'pdf': 300, 'email': 120}
+
+
+def _apply_memory_limit(memory_limit_mb: Optional[int]):
+    """
+    Borne l'espace d'adressage du processus (RLIMIT_AS ; POSIX, sans effet sous Windows)
+
+    Il ne s'agit pas de la mémoire résidente : les arènes par thread de la libc
+    (numpy, openpyxl, pools de threads) réservent de l'espace virtuel jamais
+    utilisé. La limite doit donc laisser une large marge au-dessus de la mémoire
+    réellement consommée par le plus gros job (environ deux fois), sinon un job
+    sain échoue en MemoryError.
+    """
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        logger.warning("⚠️ Limite mémoire non supportée sur cette plateforme (module resource absent)")
+        return
+    limit = int(memory_limit_mb) * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _worker_main(conn, factory: Callable, memory_limit_mb: Optional[int]):
+    """Boucle du processus fils : un job reçu, ses étapes signalées, son résultat renvoyé"""
+    _apply_memory_limit(memory_limit_mb)
+    processor = factory()
+    processor.stage_listener = lambda job_id, stage: conn.send(('stage', stage))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        files, job_id, inbox = message
+        try:
+            result = processor.process_files(files, job_id=job_id, inbox=inbox)
+        except BaseException as e:
+            # MemoryError au-delà de la limite : le job échoue, le fils reste utilisable
+            result = {'success': False, 'error': f"{type(e).__name__}: {e}", 'job_id': job_id}
+        conn.send(('result', result))
+
+
+class Worker:
+    """Processus fils et son extrémité du pipe"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+
+class IsolatedJobRunner:
+    """Pool de processus fils exécutant les jobs avec limites de mémoire et de temps"""
+
+    def __init__(self, factory: Callable, workers: int = 2, memory_limit_mb: Optional[int] = None,
+                 stage_timeouts: Optional[Dict[str, float]] = None, start_timeout: float = 120,
+                 max_jobs_per_worker: int = 20):
+        """
+        Args:
+            factory: Fonction (importable, sans argument) construisant le processeur dans le fils
+            workers: Nombre de processus fils
+            memory_limit_mb: Espace d'adressage (virtuel, pas la mémoire résidente)
+                             maximal d'un fils (None = illimité) ; voir _apply_memory_limit
+            stage_timeouts: Délai maximal par étape (secondes)
+            start_timeout: Délai avant la première étape (démarrage du fils compris)
+            max_jobs_per_worker: Jobs avant recyclage du fils (fragmentation mémoire)
+        """
+        self.factory = factory
+        self.workers = max(1, workers)
+        self.memory_limit_mb = memory_limit_mb
+        self.stage_timeouts = {**DEFAULT_STAGE_TIMEOUTS, **(stage_timeouts or {})}
+        self.start_timeout = start_timeout
+        self.max_jobs_per_worker = max(1, max_jobs_per_worker)
+        # 'spawn' : même comportement sous Windows et Linux, aucun état hérité du démon
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = threading.Semaphore(self.workers)
+        self._idle: List[Worker] = []
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'spawned': 0, 'recycled': 0, 'timeouts': 0, 'crashes': 0}
+
+    @classmethod
+    def from_config(cls, config: dict, factory: Callable) -> 'IsolatedJobRunner':
+        """Construit le pool depuis processing.isolation"""
+        settings = config.get('processing', {}).get('isolation', {})
+        return cls(
+            factory,
+            workers=settings.get('workers', 2),
+            memory_limit_mb=settings.get('memory_limit_mb'),
+            stage_timeouts=settings.get('stage_timeouts'),
+            start_timeout=settings.get('start_timeout', 120),
+            max_jobs_per_worker=settings.get('max_jobs_per_worker', 20)
+        )
+
+    def run(self, files: Dict[str, str], job_id: str, inbox: Optional[str] = None) -> Dict:
+        """
+        Exécute un job dans un processus fils (bloquant jusqu'au résultat)
+
+        Returns:
+            Résultat du traitement ; en cas de dépassement de délai ou de fin
+            brutale du fils, un résultat en échec (le fils est remplacé)
+        """
+        with self._slots:
+            worker = self._acquire()
+            try:
+                worker.conn.send((files, job_id, inbox))
+                result = self._wait_result(worker, job_id)
+            except (OSError, EOFError) as e:
+                result = self._lost(worker, job_id, f"Processus de travail perdu: {e}")
+            self._count('jobs')
+            if worker.process.is_alive():
+                worker.jobs += 1
+                self._release(worker)
+            return result
+
+    def _wait_result(self, worker: Worker, job_id: str) -> Dict:
+        """Attend le résultat ; chaque étape annoncée relance son propre délai"""
+        stage, timeout = None, self.start_timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not worker.conn.poll(remaining):
+                self._count('timeouts')
+                self._kill(worker)
+                where = f"l'étape '{stage}'" if stage else "le démarrage du job"
+                logger.error(f"⏱️ Job {job_id}: délai de {timeout:.0f}s dépassé pendant {where}, "
+                             f"processus {worker.pid} arrêté")
+                return {'success': False, 'job_id': job_id, 'stage': stage,
+                        'error': f"Délai dépassé ({timeout:.0f}s) pendant {where}"}
+            kind, payload = worker.conn.recv()
+            if kind == 'result':
+                return payload
+            stage = payload
+            timeout = self.stage_timeouts.get(stage, self.start_timeout)
+            deadline = time.monotonic() + timeout
+
+    def _lost(self, worker: Worker, job_id: str, error: str) -> Dict:
+        self._count('crashes')
+        self._kill(worker)
+        logger.error(f"💥 Job {job_id}: {error} (code {worker.process.exitcode})")
+        return {'success': False, 'job_id': job_id, 'error': error}
+
+    def _acquire(self) -> Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+        return self._spawn()
+
+    def _release(self, worker: Worker):
+        """Remet le fils dans le pool, ou le recycle après max_jobs_per_worker jobs"""
+        if worker.jobs >= self.max_jobs_per_worker:
+            self._count('recycled')
+            self._retire(worker)
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def _spawn(self) -> Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, name='job-worker', daemon=True,
+                                        args=(child_conn, self.factory, self.memory_limit_mb))
+        process.start()
+        child_conn.close()
+        self._count('spawned')
+        logger.info(f"🧩 Processus de travail démarré (pid {process.pid})")
+        return Worker(process, parent_conn)
+
+    def _retire(self, worker: Worker, timeout: float = 10):
+        """Arrêt normal : le fils termine sa boucle"""
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+        worker.process.join(timeout)
+        if worker.process.is_alive():
+            self._kill(worker)
+        worker.conn.close()
+
+    @staticmethod
+    def _kill(worker: Worker):
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def shutdown(self):
+        """Arrête les processus fils inactifs"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._retire(worker)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'idle_workers': len(self._idle)}
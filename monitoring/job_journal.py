@@ -0,0 +1,179 @@
+"""
+Journal des jobs de traitement
+Chaque job enregistre ses étapes terminées et leurs artefacts (DataFrames lus,
+rapport, PDF, email) ; une reprise repart de la première étape incomplète
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Étapes du traitement, dans l'ordre
+STAGES = ('read', 'process', 'report', 'pdf', 'email')
+
+STATUS_RUNNING = 'running'
+STATUS_FAILED = 'failed'
+STATUS_DONE = 'done'
+
+
+class JobRecord:
+    """Entrée du journal pour un job (sauvegardée à chaque changement)"""
+
+    def __init__(self, journal: 'JobJournal', data: Dict[str, Any]):
+        self.journal = journal
+        self.data = data
+
+    @property
+    def job_id(self) -> str:
+        return self.data['job_id']
+
+    @property
+    def files(self) -> Dict[str, str]:
+        return self.data['files']
+
+    @property
+    def status(self) -> str:
+        return self.data['status']
+
+    @property
+    def inbox(self) -> Optional[str]:
+        """Inbox d'origine des fichiers (métadonnées et partenaires propres)"""
+        return self.data.get('inbox')
+
+    @property
+    def frames_dir(self) -> Path:
+        return self.journal.journal_dir / self.job_id
+
+    def is_done(self, stage: str) -> bool:
+        return stage in self.data['stages']
+
+    def artifacts(self, stage: str) -> Dict[str, Any]:
+        return self.data['stages'].get(stage, {})
+
+    def next_stage(self) -> Optional[str]:
+        """Première étape non terminée (None si le job est complet)"""
+        for stage in STAGES:
+            if not self.is_done(stage):
+                return stage
+        return None
+
+    def complete(self, stage: str, **artifacts):
+        """Marque une étape terminée avec ses artefacts (sérialisables en JSON)"""
+        artifacts['completed_at'] = time.time()
+        self.data['stages'][stage] = artifacts
+        self.data['status'] = STATUS_RUNNING
+        self.save()
+        logger.debug(f"  📓 Étape '{stage}' enregistrée ({self.job_id})")
+
+    def fail(self, error: str):
+        self.data['status'] = STATUS_FAILED
+        self.data['attempts'] += 1
+        self.data['last_error'] = str(error)
+        self.save()
+
+    def finish(self):
+        """Job terminé : les DataFrames intermédiaires ne servent plus"""
+        self.data['status'] = STATUS_DONE
+        self.data['finished_at'] = time.time()
+        self.save()
+        shutil.rmtree(self.frames_dir, ignore_errors=True)
+
+    def save_frame(self, name: str, df: Optional[pd.DataFrame]) -> Optional[str]:
+        """Sauvegarde un DataFrame intermédiaire (pickle) et retourne son chemin"""
+        if df is None:
+            return None
+        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        path = self.frames_dir / f"{name}.pkl"
+        df.to_pickle(path)
+        return str(path)
+
+    def load_frame(self, stage: str, name: str) -> Optional[pd.DataFrame]:
+        """Recharge un DataFrame enregistré par une étape terminée"""
+        path = self.artifacts(stage).get('frames', {}).get(name)
+        return pd.read_pickle(path) if path else None
+
+    def save(self):
+        self.journal._write(self.data)
+
+
+class JobJournal:
+    """Journal JSON des jobs (un fichier par job, écrit atomiquement)"""
+
+    def __init__(self, journal_dir: str = './outputs/journal'):
+        """
+        Args:
+            journal_dir: Dossier des fichiers du journal
+        """
+        self.journal_dir = Path(journal_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str) -> Path:
+        return self.journal_dir / f"{job_id}.json"
+
+    def _write(self, data: Dict[str, Any]):
+        """Écrit l'entrée dans un fichier temporaire puis le remplace (jamais à moitié écrit)"""
+        data['updated_at'] = time.time()
+        path = self._path(data['job_id'])
+        temp_path = path.with_suffix('.json.tmp')
+        with self._lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(temp_path, path)
+
+    def start(self, job_id: str, files: Dict[str, str], inbox: Optional[str] = None) -> JobRecord:
+        """Ouvre l'entrée d'un nouveau job"""
+        record = JobRecord(self, {
+            'job_id': job_id,
+            'files': files,
+            'inbox': inbox,
+            'status': STATUS_RUNNING,
+            'stages': {},
+            'attempts': 0,
+            'last_error': None,
+            'created_at': time.time()
+        })
+        record.save()
+        return record
+
+    def load(self, job_id: str) -> Optional[JobRecord]:
+        path = self._path(job_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return JobRecord(self, json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Entrée de journal illisible {path.name}: {e}")
+            return None
+
+    def jobs(self, status: Optional[str] = None) -> List[JobRecord]:
+        """Entrées du journal (filtrées par statut), des plus anciennes aux plus récentes"""
+        records = []
+        for path in self.journal_dir.glob('*.json'):
+            record = self.load(path.stem)
+            if record and (status is None or record.status == status):
+                records.append(record)
+        return sorted(records, key=lambda r: r.data.get('created_at', 0))
+
+    def in_flight(self) -> List[JobRecord]:
+        """Jobs interrompus en cours de traitement (crash du processus)"""
+        return self.jobs(STATUS_RUNNING)
+
+    def purge(self, older_than_days: float = 30) -> int:
+        """Supprime les entrées des jobs terminés depuis plus de N jours"""
+        cutoff = time.time() - older_than_days * 86400
+        removed = 0
+        for record in self.jobs(STATUS_DONE):
+            if record.data.get('finished_at', 0) < cutoff:
+                self._path(record.job_id).unlink(missing_ok=True)
+                removed += 1
+        return removed
@@ -0,0 +1,131 @@
+"""
+Ordonnancement des ensembles en attente de traitement
+Le coût d'un job est estimé en lignes à partir de la taille du BulkReport et
+d'un comptage des lignes de son début ; la politique (plus court d'abord,
+FIFO ou priorité lue dans le nom du fichier) choisit le prochain job de
+chaque inbox, et le vieillissement garantit qu'aucun job n'attend indéfiniment
+"""
+import re
+import time
+import logging
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Début du fichier lu pour estimer la longueur moyenne d'une ligne
+PREFIX_BYTES = 64 * 1024
+
+# Fichiers binaires (xlsx) : octets par ligne, estimation grossière
+BINARY_BYTES_PER_ROW = 60
+
+POLICIES = ('sjf', 'fifo', 'priority')
+
+# Étiquette de priorité dans un nom de fichier : 'prio1', 'prio-2', 'priority_0', 'urgent'
+_PRIORITY_TAG = re.compile(r'(?<![a-z0-9])(?:prio(?:rity)?[-_]?(\d+)|(urgent))(?![a-z0-9])')
+
+
+def estimate_rows(file_path: Path) -> int:
+    """
+    Nombre de lignes estimé d'un fichier sans le lire en entier
+
+    Le début du fichier (PREFIX_BYTES) donne la longueur moyenne d'une ligne,
+    extrapolée à la taille totale ; un petit fichier est compté exactement.
+    """
+    try:
+        size = Path(file_path).stat().st_size
+        with open(file_path, 'rb') as f:
+            prefix = f.read(PREFIX_BYTES)
+    except OSError:
+        return 0
+    if not prefix:
+        return 0
+    if b'\0' in prefix:
+        return max(1, size // BINARY_BYTES_PER_ROW)
+    lines = prefix.count(b'\n') + (0 if prefix.endswith(b'\n') else 1)
+    if size <= len(prefix):
+        return lines
+    return int(size * lines / len(prefix))
+
+
+def filename_priority(file_names: List[str], default: int) -> int:
+    """Priorité indiquée dans les noms des fichiers (0 = la plus haute), sinon default"""
+    found = []
+    for name in file_names:
+        for level, urgent in _PRIORITY_TAG.findall(Path(name).stem.lower()):
+            found.append(0 if urgent else int(level))
+    return min(found) if found else default
+
+
+class QueuedJob:
+    """Job en attente avec son coût estimé et sa priorité"""
+
+    _seq = itertools.count()
+
+    def __init__(self, job: Dict, cost: int = 0, priority: int = 0,
+                 enqueued_at: Optional[float] = None):
+        self.job = job
+        self.cost = cost
+        self.priority = priority
+        self.enqueued_at = enqueued_at if enqueued_at is not None else time.monotonic()
+        self.seq = next(self._seq)
+
+    def __repr__(self):
+        return f"QueuedJob(cost={self.cost}, priority={self.priority})"
+
+
+class SchedulingPolicy:
+    """Ordre de sortie des jobs en attente"""
+
+    def __init__(self, name: str = 'sjf', aging: float = 60, default_priority: int = 5):
+        """
+        Args:
+            name: 'sjf' (plus court d'abord), 'fifo' ou 'priority' (étiquette du nom)
+            aging: Vieillissement (secondes) : en SJF le coût d'un job est divisé
+                   par deux, en 'priority' sa priorité gagne un niveau, à chaque
+                   période d'attente (0 = pas de vieillissement)
+            default_priority: Priorité des fichiers sans étiquette
+        """
+        if name not in POLICIES:
+            raise ValueError(f"Politique d'ordonnancement inconnue: {name} ({', '.join(POLICIES)})")
+        self.name = name
+        self.aging = aging
+        self.default_priority = default_priority
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> 'SchedulingPolicy':
+        """Construit la politique depuis la section 'scheduling' de la configuration"""
+        settings = (config or {}).get('scheduling', {})
+        return cls(
+            name=str(settings.get('policy', 'sjf')).lower(),
+            aging=settings.get('aging', 60),
+            default_priority=settings.get('default_priority', 5)
+        )
+
+    def estimate(self, files: Dict[str, Optional[str]]) -> Dict[str, int]:
+        """Coût (lignes du BulkReport) et priorité d'un ensemble (appel bloquant)"""
+        bulk = files.get('bulkreport')
+        return {
+            'cost': estimate_rows(Path(bulk)) if bulk and self.name == 'sjf' else 0,
+            'priority': filename_priority([path for path in files.values() if path],
+                                          self.default_priority)
+        }
+
+    def _waited_periods(self, queued: QueuedJob, now: float) -> float:
+        return (now - queued.enqueued_at) / self.aging if self.aging else 0
+
+    def key(self, queued: QueuedJob, now: float) -> tuple:
+        """Clé de tri : la plus petite sort en premier, à arrivée égale dans l'ordre FIFO"""
+        if self.name == 'sjf':
+            return (queued.cost * 0.5 ** self._waited_periods(queued, now), queued.seq)
+        if self.name == 'priority':
+            return (queued.priority - self._waited_periods(queued, now), queued.seq)
+        return (queued.seq,)
+
+    def select(self, queue: List[QueuedJob], now: Optional[float] = None) -> int:
+        """Indice du prochain job de la file"""
+        if self.name == 'fifo' or len(queue) == 1:
+            return 0
+        now = now if now is not None else time.monotonic()
+        return min(range(len(queue)), key=lambda index: self.key(queue[index], now))
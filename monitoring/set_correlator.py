@@ -0,0 +1,141 @@
+"""
+Corrélation des fichiers entrants en ensembles (BulkReport + Export + Frais)
+Plusieurs ensembles peuvent être en cours simultanément : un fichier rejoint
+l'ensemble dont le nom (ou le nom du plan lu dans l'en-tête du BulkReport)
+partage un identifiant, sinon le plus ancien ensemble incomplet ouvert dans
+la fenêtre de corrélation ; aucun fichier en attente n'est écrasé
+"""
+import re
+import itertools
+import logging
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fichiers nécessaires au traitement ('frais' est optionnel)
+REQUIRED_TYPES = ('bulkreport', 'export')
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def name_tokens(text: str, ignored: Iterable[str] = ()) -> FrozenSet[str]:
+    """Identifiants d'un nom : mots alphanumériques hors motifs de type ('bulk', 'export'...)"""
+    ignored = [pattern.lower() for pattern in ignored]
+    return frozenset(
+        token for token in _TOKEN.findall(text.lower())
+        if not any(pattern in token for pattern in ignored)
+    )
+
+
+class FileSet:
+    """Ensemble de fichiers en cours de constitution"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, opened_at: datetime):
+        self.set_id = next(self._ids)
+        self.opened_at = opened_at
+        self.files: Dict[str, Dict] = {}
+        self.tokens: FrozenSet[str] = frozenset()
+        self.plan_name: Optional[str] = None
+
+    def is_complete(self) -> bool:
+        return all(file_type in self.files for file_type in REQUIRED_TYPES)
+
+    def as_job_files(self) -> Dict[str, Optional[str]]:
+        """Chemins au format attendu par le traitement"""
+        return {file_type: str(self.files[file_type]['path']) if file_type in self.files else None
+                for file_type in ('bulkreport', 'export', 'frais')}
+
+    def checksums(self) -> Dict[str, Optional[str]]:
+        """Empreinte de chaque fichier de l'ensemble, par type"""
+        return {file_type: entry['checksum'] for file_type, entry in self.files.items()}
+
+    def __repr__(self):
+        return f"FileSet#{self.set_id}({', '.join(sorted(self.files))})"
+
+
+class SetCorrelator:
+    """Regroupe les fichiers stables en ensembles complets"""
+
+    def __init__(self, patterns: Dict[str, List[str]], window: float = 600,
+                 orphan_timeout: float = 3600):
+        """
+        Args:
+            patterns: Motifs des noms de fichiers par type (ignorés dans les identifiants)
+            window: Fenêtre d'arrivée (secondes) pour associer des fichiers sans identifiant commun
+            orphan_timeout: Âge (secondes) au-delà duquel un ensemble incomplet est abandonné
+        """
+        self.ignored = [pattern for values in patterns.values() for pattern in values]
+        self.window = timedelta(seconds=window)
+        self.orphan_timeout = timedelta(seconds=orphan_timeout)
+        self.open_sets: List[FileSet] = []
+
+    def add(self, file_type: str, path: Path, checksum: Optional[str] = None,
+            plan_name: Optional[str] = None, now: Optional[datetime] = None) -> Optional[FileSet]:
+        """
+        Ajoute un fichier stable
+
+        Returns:
+            L'ensemble devenu complet (retiré des ensembles en cours), sinon None
+        """
+        now = now or datetime.now()
+        path = Path(path)
+        entry = {'path': path, 'timestamp': now, 'checksum': checksum}
+        tokens = name_tokens(path.stem, self.ignored)
+        if plan_name:
+            tokens |= name_tokens(plan_name, self.ignored)
+
+        file_set = self._owner(path) or self._match(file_type, tokens, now)
+        if file_set is None:
+            file_set = FileSet(now)
+            self.open_sets.append(file_set)
+        file_set.files[file_type] = entry
+        file_set.tokens |= tokens
+        if plan_name:
+            file_set.plan_name = plan_name
+        logger.info(f"  -> {path.name} ajouté à {file_set} "
+                    f"({len(self.open_sets)} ensemble(s) en cours)")
+
+        if file_set.is_complete():
+            self.open_sets.remove(file_set)
+            return file_set
+        return None
+
+    def _owner(self, path: Path) -> Optional[FileSet]:
+        """Ensemble contenant déjà ce fichier (réécrit en place)"""
+        for file_set in self.open_sets:
+            if any(entry['path'] == path for entry in file_set.files.values()):
+                return file_set
+        return None
+
+    def _match(self, file_type: str, tokens: FrozenSet[str], now: datetime) -> Optional[FileSet]:
+        """Ensemble incomplet auquel rattacher le fichier"""
+        candidates = [s for s in self.open_sets if file_type not in s.files]
+
+        # 1. Identifiant commun (nom de fichier ou nom du plan) : le plus de mots partagés
+        if tokens:
+            scored = [(len(tokens & s.tokens), -s.set_id, s) for s in candidates if tokens & s.tokens]
+            if scored:
+                return max(scored)[2]
+
+        # 2. Fenêtre d'arrivée : le plus ancien ensemble récent, de préférence
+        #    un ensemble dont les identifiants ne contredisent pas ceux du fichier
+        recent = [s for s in candidates if now - s.opened_at <= self.window]
+        if recent:
+            return min(recent, key=lambda s: (bool(tokens and s.tokens), s.opened_at, s.set_id))
+        return None
+
+    def evict(self, now: Optional[datetime] = None) -> List[FileSet]:
+        """Abandonne les ensembles incomplets plus vieux que orphan_timeout"""
+        cutoff = (now or datetime.now()) - self.orphan_timeout
+        expired = [s for s in self.open_sets if s.opened_at < cutoff]
+        for file_set in expired:
+            self.open_sets.remove(file_set)
+            logger.info(f"[CLEANUP] Nettoyage ensemble orphelin: {file_set}")
+        return expired
+
+    def pending_count(self) -> int:
+        return sum(len(s.files) for s in self.open_sets)
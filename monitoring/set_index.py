@@ -0,0 +1,137 @@
+"""
+Index persistant des ensembles déjà traités (empreinte du contenu)
+Chaque fichier stable est haché une seule fois (SHA-256, lectures de 1 Mo) ;
+l'empreinte d'un ensemble combine l'inbox et les empreintes de ses fichiers.
+Un ensemble identique redéposé reprend le rapport, le PDF et l'email du
+traitement précédent au lieu d'être retraité
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Taille des lectures pour le hachage des fichiers
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Champs du résultat conservés pour un ensemble redéposé
+OUTCOME_FIELDS = ('job_id', 'report_path', 'pdf_path', 'email_sent', 'email_queued', 'stats')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_sets (
+    digest TEXT PRIMARY KEY,
+    inbox TEXT,
+    files TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    processed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def file_digest(file_path: Path) -> str:
+    """SHA-256 d'un fichier, lu par blocs de HASH_BUFFER_SIZE dans un tampon réutilisé"""
+    sha256_hash = hashlib.sha256()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        for size in iter(lambda: f.readinto(buffer), 0):
+            sha256_hash.update(view[:size])
+    return sha256_hash.hexdigest()
+
+
+def set_digest(checksums: Dict[str, Optional[str]], inbox: Optional[str] = None) -> Optional[str]:
+    """
+    Empreinte d'un ensemble : inbox + empreinte de chaque fichier par type
+
+    Returns:
+        None si un fichier de l'ensemble n'a pas pu être haché
+    """
+    if not checksums or any(checksum is None for checksum in checksums.values()):
+        return None
+    parts = [f"inbox={inbox or ''}"] + [f"{file_type}={checksums[file_type]}"
+                                        for file_type in sorted(checksums)]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ProcessedSetIndex:
+    """Ensembles traités avec succès et leur résultat (SQLite)"""
+
+    def __init__(self, db_path: str = './outputs/processed_sets.db'):
+        """
+        Args:
+            db_path: Base SQLite de l'index
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connexion courte : une transaction validée puis fermée"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, digest: str) -> Optional[Dict]:
+        """
+        Résultat du traitement précédent d'un ensemble identique
+
+        Returns:
+            Le résultat enregistré, ou None si l'ensemble est inconnu ou si
+            son rapport n'existe plus (l'ensemble est alors retraité)
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT * FROM processed_sets WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            outcome = json.loads(row['outcome'])
+            report_path = outcome.get('report_path')
+            if report_path and not os.path.exists(report_path):
+                logger.info(f"[DEDUP] Rapport précédent introuvable ({report_path}), ensemble retraité")
+                conn.execute("DELETE FROM processed_sets WHERE digest = ?", (digest,))
+                return None
+            conn.execute("UPDATE processed_sets SET hits = hits + 1 WHERE digest = ?", (digest,))
+        outcome['processed_at'] = row['processed_at']
+        return outcome
+
+    def record(self, digest: str, files: Dict[str, Optional[str]], result: Dict,
+               inbox: Optional[str] = None):
+        """Enregistre le résultat d'un ensemble traité avec succès"""
+        outcome = {field: result.get(field) for field in OUTCOME_FIELDS if field in result}
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO processed_sets (digest, inbox, files, outcome, processed_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET inbox = excluded.inbox, files = excluded.files, "
+                "outcome = excluded.outcome, processed_at = excluded.processed_at",
+                (digest, inbox, json.dumps(files, ensure_ascii=False),
+                 json.dumps(outcome, ensure_ascii=False, default=str), time.time())
+            )
+
+    def purge(self, older_than_days: float = 30) -> int:
+        """Oublie les ensembles traités depuis plus de N jours"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM processed_sets WHERE processed_at < ?", (cutoff,)).rowcount
+
+    def get_stats(self) -> Dict:
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) AS sets, COALESCE(SUM(hits), 0) AS hits "
+                               "FROM processed_sets").fetchone()
+        return {'sets': row['sets'], 'duplicates_skipped': row['hits']}
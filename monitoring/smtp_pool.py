@@ -0,0 +1,153 @@
+"""
+Pool de connexions SMTP authentifiées
+Une session (connexion + STARTTLS + login) est réutilisée pour tout un lot d'envois
+au lieu d'être rouverte pour chaque destinataire
+"""
+import queue
+import smtplib
+import logging
+import threading
+from typing import Dict, Optional
+from email.message import Message
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Pool borné de sessions SMTP partagées par les threads d'envoi"""
+
+    def __init__(self, smtp_config: Dict, size: int = 4, timeout: float = 30):
+        """
+        Args:
+            smtp_config: Section 'smtp' de la configuration email
+            size: Nombre maximum de sessions ouvertes simultanément
+            timeout: Timeout réseau des sessions (secondes)
+        """
+        self.smtp_config = smtp_config
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all = []
+        self.stats = {
+            'connections': 0,
+            'messages': 0,
+            'reconnects': 0
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        """Ouvre et authentifie une nouvelle session"""
+        config = self.smtp_config
+        server = smtplib.SMTP(config['server'], config['port'], timeout=self.timeout)
+        if config.get('use_tls', True):
+            server.starttls()
+        if config.get('username'):
+            server.login(config['username'], config['password'])
+
+        with self._lock:
+            self.stats['connections'] += 1
+            self._all.append(server)
+        logger.debug(f"  🔌 Session SMTP ouverte ({self.stats['connections']})")
+        return server
+
+    def _discard(self, server: smtplib.SMTP):
+        """Ferme une session devenue inutilisable"""
+        with self._lock:
+            if server in self._all:
+                self._all.remove(server)
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def _acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server: Optional[smtplib.SMTP]):
+        if server is not None:
+            self._idle.put(server)
+        self._slots.release()
+
+    def send_message(self, msg) -> bool:
+        """
+        Envoie un message sur une session du pool
+
+        Accepte un Message du package email ou un message préparé pour
+        l'envoi par blocs (méthode send(server)). Une session coupée par
+        le serveur est rouverte une fois avant d'abandonner ; un refus du
+        serveur (destinataire, expéditeur, contenu) n'est jamais renvoyé.
+        """
+        server = self._acquire()
+        try:
+            try:
+                self._transmit(server, msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # SMTPException hérite d'OSError : un refus n'est pas une coupure
+                raise
+            except (smtplib.SMTPServerDisconnected, ConnectionError, OSError):
+                self._discard(server)
+                server = None
+                server = self._connect()
+                with self._lock:
+                    self.stats['reconnects'] += 1
+                self._transmit(server, msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+            if getattr(e, 'smtp_code', None) == 421:
+                # 421 : le serveur ferme la session
+                self._discard(server)
+                self._release(None)
+                raise
+            # Refus du destinataire ou du message : la session reste valide
+            self._release(server)
+            raise
+        except Exception:
+            if server is not None:
+                self._discard(server)
+            self._release(None)
+            raise
+
+        with self._lock:
+            self.stats['messages'] += 1
+        self._release(server)
+        return True
+
+    @staticmethod
+    def _transmit(server: smtplib.SMTP, msg):
+        if isinstance(msg, Message):
+            server.send_message(msg)
+        else:
+            msg.send(server)
+
+    def close(self):
+        """Termine proprement toutes les sessions ouvertes"""
+        with self._lock:
+            servers, self._all = self._all, []
+        while not self._idle.empty():
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for server in servers:
+            try:
+                server.quit()
+            except Exception:
+                try:
+                    server.close()
+                except Exception:
+                    pass
@@ -0,0 +1,235 @@
+"""
+Pipeline des étapes du traitement automatique
+Les étapes sont regroupées en voies (lecture/traitement, rendu Excel, PDF,
+email), chacune avec sa file d'attente et son nombre de workers : le job N+1
+est lu pendant que le job N est converti en PDF, et le débit sur une file de
+jobs tend vers celui de la voie la plus lente
+"""
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from monitoring.job_journal import JobRecord
+
+logger = logging.getLogger(__name__)
+
+# Voies par défaut : (nom, étapes du journal, clé de configuration du nombre de workers)
+DEFAULT_LANES = (
+    ('parse', ('read', 'process'), 'parse_workers'),
+    ('render', ('report',), 'render_workers'),
+    ('pdf', ('pdf',), None),                   # Excel/COM : un seul slot
+    ('email', ('email',), 'email_workers')
+)
+
+
+class Lane:
+    """Voie du pipeline : une file d'attente et ses workers"""
+
+    def __init__(self, name: str, stages: Tuple[str, ...], workers: int = 1):
+        self.name = name
+        self.stages = stages
+        self.workers = max(1, int(workers))
+        self.queue: 'queue.Queue[Optional[PipelineItem]]' = queue.Queue()
+        self.threads: List[threading.Thread] = []
+        self.busy = 0
+        self.completed = 0
+        # Accepte de nouveaux jobs (fermée à l'arrêt, avant d'être vidée)
+        self.open = False
+
+
+class PipelineItem:
+    """Job en circulation dans le pipeline"""
+
+    def __init__(self, job: JobRecord, result: Dict):
+        self.job = job
+        self.result = result
+        self.context: Dict = {'keys': {}}
+        self.future: Future = Future()
+        self.attempt = 1
+        # Nouvelle tentative planifiée (annulée à l'arrêt du pipeline)
+        self.timer: Optional[threading.Timer] = None
+        self.settled = False
+
+
+class StagePipeline:
+    """Exécute les étapes des jobs dans des voies à concurrence bornée"""
+
+    def __init__(self, lanes: List[Lane],
+                 run_stage: Callable[[JobRecord, str, Dict, Dict], None],
+                 restore: Callable[[JobRecord, Dict, Dict], None],
+                 attempts: int = 1, retry_delay: float = 0):
+        """
+        Args:
+            lanes: Voies dans l'ordre des étapes
+            run_stage: Exécute une étape (job, étape, contexte, résultat)
+            restore: Restitue contexte et résultat des étapes déjà terminées
+            attempts: Tentatives par job (chacune repart de la première étape incomplète)
+            retry_delay: Attente avant une nouvelle tentative (secondes)
+        """
+        self.lanes = lanes
+        self.run_stage = run_stage
+        self.restore = restore
+        self.attempts = max(1, attempts)
+        self.retry_delay = retry_delay
+        self._lane_of = {stage: lane for lane in lanes for stage in lane.stages}
+        self._lock = threading.Lock()
+        self.running = False
+        # Jobs soumis dont le Future n'est pas encore résolu
+        self._items = set()
+
+    @classmethod
+    def from_config(cls, config: dict, run_stage, restore) -> 'StagePipeline':
+        """Construit le pipeline depuis la section 'processing' de la configuration"""
+        processing = config.get('processing', {})
+        settings = processing.get('pipeline', {})
+        lanes = [Lane(name, stages, settings.get(setting, 2) if setting else 1)
+                 for name, stages, setting in DEFAULT_LANES]
+        attempts = 1 + (processing.get('max_retries', 0) if processing.get('auto_retry') else 0)
+        return cls(lanes, run_stage, restore, attempts=attempts,
+                   retry_delay=processing.get('retry_delay', 5))
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+            for lane in self.lanes:
+                lane.open = True
+                for index in range(lane.workers):
+                    thread = threading.Thread(target=self._worker, args=(lane,),
+                                              name=f"pipeline-{lane.name}-{index}", daemon=True)
+                    thread.start()
+                    lane.threads.append(thread)
+        logger.info("🏭 Pipeline démarré: " + ", ".join(
+            f"{lane.name}×{lane.workers}" for lane in self.lanes))
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Arrête les workers une fois les jobs déjà en file terminés
+
+        Les nouvelles tentatives planifiées sont annulées ; tout job non terminé
+        (tentative annulée, délai d'arrêt dépassé) échoue avec « Pipeline arrêté »
+        et reste reprenable depuis le journal
+        """
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            timers = [item.timer for item in self._items if item.timer is not None]
+        for timer in timers:
+            timer.cancel()
+        # Les voies sont vidées dans l'ordre : un job encore en amont atteint les suivantes
+        for lane in self.lanes:
+            with self._lock:
+                lane.open = False
+            for _ in lane.threads:
+                lane.queue.put(None)
+            for thread in lane.threads:
+                thread.join(timeout)
+            lane.threads.clear()
+        with self._lock:
+            pending, self._items = self._items, set()
+        for item in pending:
+            self._settle(item, error=RuntimeError("Pipeline arrêté"))
+
+    def submit(self, job: JobRecord, result: Dict) -> Future:
+        """Place un job dans la voie de sa première étape incomplète"""
+        item = PipelineItem(job, result)
+        with self._lock:
+            if not self.running:
+                raise RuntimeError("Pipeline arrêté")
+            self._items.add(item)
+        self.restore(job, item.context, item.result)
+        self._dispatch(item)
+        return item.future
+
+    def _dispatch(self, item: PipelineItem):
+        """Place le job dans la voie de son étape suivante (refusé si la voie est fermée)"""
+        stage = item.job.next_stage()
+        if stage is None:
+            self._settle(item, result=item.result)
+            return
+        lane = self._lane_of[stage]
+        with self._lock:
+            accepted = lane.open
+            if accepted:
+                lane.queue.put(item)
+        if not accepted:
+            self._settle(item, error=RuntimeError("Pipeline arrêté"))
+
+    def _settle(self, item: PipelineItem, result: Optional[Dict] = None,
+                error: Optional[BaseException] = None):
+        """Résout le Future du job une seule fois (fin normale, échec ou arrêt)"""
+        with self._lock:
+            self._items.discard(item)
+            if item.settled:
+                return
+            item.settled = True
+        if error is not None:
+            item.future.set_exception(error)
+        else:
+            item.future.set_result(result)
+
+    def _worker(self, lane: Lane):
+        while True:
+            item = lane.queue.get()
+            if item is None:
+                return
+            if item.settled:
+                # Déjà résolu par l'arrêt (délai dépassé) : rien à exécuter
+                continue
+            with self._lock:
+                lane.busy += 1
+            try:
+                for stage in lane.stages:
+                    if not item.job.is_done(stage):
+                        self.run_stage(item.job, stage, item.context, item.result)
+            except Exception as e:
+                self._failed(item, e)
+            else:
+                self._dispatch(item)
+            finally:
+                with self._lock:
+                    lane.busy -= 1
+                    lane.completed += 1
+
+    def _failed(self, item: PipelineItem, error: Exception):
+        """Nouvelle tentative à la première étape incomplète, sans bloquer la voie"""
+        item.job.fail(error)
+        if item.attempt >= self.attempts:
+            self._settle(item, error=error)
+            return
+        logger.warning(f"🔁 Tentative {item.attempt}/{self.attempts} échouée ({error}), "
+                       f"reprise à l'étape '{item.job.next_stage()}' dans {self.retry_delay}s")
+        item.attempt += 1
+        item.context = {'keys': {}}
+        self.restore(item.job, item.context, item.result)
+        timer = threading.Timer(self.retry_delay, self._retry, args=(item,))
+        timer.daemon = True
+        with self._lock:
+            if not self.running:
+                timer = None
+            else:
+                item.timer = timer
+                timer.start()
+        if timer is None:
+            self._settle(item, error=RuntimeError("Pipeline arrêté"))
+
+    def _retry(self, item: PipelineItem):
+        """Nouvelle tentative échue : refusée si le pipeline s'est arrêté entre-temps"""
+        with self._lock:
+            item.timer = None
+            running = self.running
+        if running:
+            self._dispatch(item)
+        else:
+            self._settle(item, error=RuntimeError("Pipeline arrêté"))
+
+    def get_stats(self) -> Dict:
+        """Occupation des voies (jobs en attente, en cours, traités)"""
+        with self._lock:
+            return {lane.name: {'queued': lane.queue.qsize(), 'busy': lane.busy,
+                                'workers': lane.workers, 'completed': lane.completed}
+                    for lane in self.lanes}
@@ -0,0 +1,244 @@
+"""
+Agrégats quotidiens incrémentaux pour les résumés journaliers et hebdomadaires
+Chaque traitement ajoute ses totaux par jour (nombre, montants, frais) et un
+sketch HyperLogLog des bénéficiaires ; un résumé se calcule en O(jours)
+sans relire les rapports archivés
+"""
+import math
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 2^12 registres : ~1,6 % d'erreur type, 4 Ko par jour
+HLL_PRECISION = 12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day TEXT PRIMARY KEY,
+    reports INTEGER NOT NULL DEFAULT 0,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    amount INTEGER NOT NULL DEFAULT 0,
+    fees INTEGER NOT NULL DEFAULT 0,
+    beneficiaries BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS recorded_jobs (
+    job_id TEXT PRIMARY KEY,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+class HyperLogLog:
+    """Estimation du nombre d'éléments distincts en mémoire constante (fusionnable)"""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytes] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f"Sketch de {len(self.registers)} registres, {self.size} attendus")
+
+    def add(self, value: str):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog'):
+        """Union des deux ensembles (maximum registre par registre)"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Petites cardinalités : comptage linéaire
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+def _day_key(value) -> Optional[str]:
+    """
+    Jour ISO (AAAA-MM-JJ) d'une date du rapport ('09/09/2025 10:15', '09-09-2025',
+    horodatage ISO, datetime / pd.Timestamp)
+
+    Returns:
+        None si la date est illisible
+    """
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    if isinstance(value, datetime):
+        return None if pd.isna(value) else value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return datetime.strptime(text[:10], '%d/%m/%Y').date().isoformat()
+    except ValueError:
+        pass
+    try:
+        # Année en tête : jamais lue jour d'abord
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        pass
+    parsed = pd.to_datetime(text, dayfirst=True, errors='coerce')
+    return None if pd.isna(parsed) else parsed.date().isoformat()
+
+
+class SummaryStore:
+    """Totaux par jour mis à jour à chaque traitement (SQLite)"""
+
+    def __init__(self, db_path: str = './outputs/summaries.db'):
+        """
+        Args:
+            db_path: Base SQLite des agrégats
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> 'SummaryStore':
+        """Base placée dans le dossier de sortie (output.summary_db)"""
+        config = config or {}
+        output_dir = config.get('preferences', {}).get('output_folder', './outputs')
+        return cls(str(Path(output_dir) / config.get('output', {}).get('summary_db', 'summaries.db')))
+
+    @contextmanager
+    def _connect(self):
+        """Connexion courte : une transaction validée puis fermée"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, block, job_id: Optional[str] = None) -> int:
+        """
+        Ajoute les transactions d'un rapport aux totaux de leurs jours
+
+        Args:
+            block: RenderBlock du traitement
+            job_id: Identifiant du job (un job n'est compté qu'une fois)
+
+        Returns:
+            Nombre de jours mis à jour
+        """
+        today = date.today().isoformat()
+        days: Dict[str, Dict] = {}
+        unreadable = 0
+        for raw_date, amount, fees, beneficiary in zip(
+                block.column('Date'), block.column('Amount'),
+                block.column('Frais'), block.column('Beneficiaire')):
+            day_key = _day_key(raw_date)
+            if day_key is None:
+                unreadable += 1
+                day_key = today
+            day = days.setdefault(day_key, {
+                'transactions': 0, 'amount': 0, 'fees': 0, 'sketch': HyperLogLog()
+            })
+            day['transactions'] += 1
+            day['amount'] += amount
+            day['fees'] += fees
+            if beneficiary:
+                day['sketch'].add(beneficiary)
+
+        if unreadable:
+            logger.warning(f"⚠️ {unreadable} date(s) illisible(s), comptée(s) le {today}")
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            if job_id:
+                if conn.execute("SELECT 1 FROM recorded_jobs WHERE job_id = ?", (job_id,)).fetchone():
+                    logger.info(f"📈 Job {job_id} déjà agrégé, ignoré")
+                    return 0
+                conn.execute("INSERT INTO recorded_jobs (job_id, recorded_at) VALUES (?, ?)", (job_id, now))
+
+            for day_key, totals in days.items():
+                row = conn.execute("SELECT beneficiaries FROM daily_totals WHERE day = ?",
+                                   (day_key,)).fetchone()
+                sketch = totals['sketch']
+                if row is not None:
+                    sketch.merge(HyperLogLog(registers=row['beneficiaries']))
+                conn.execute(
+                    "INSERT INTO daily_totals (day, reports, transactions, amount, fees, beneficiaries, updated_at) "
+                    "VALUES (?, 1, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET reports = reports + 1, "
+                    "transactions = transactions + excluded.transactions, "
+                    "amount = amount + excluded.amount, fees = fees + excluded.fees, "
+                    "beneficiaries = excluded.beneficiaries, updated_at = excluded.updated_at",
+                    (day_key, totals['transactions'], totals['amount'], totals['fees'],
+                     sketch.to_bytes(), now)
+                )
+
+        logger.info(f"📈 Agrégats mis à jour: {len(days)} jour(s)")
+        return len(days)
+
+    def _summarize(self, first_day: date, last_day: date) -> Dict:
+        """Totaux de la période [first_day, last_day] (une ligne lue par jour)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM daily_totals WHERE day BETWEEN ? AND ? ORDER BY day",
+                (first_day.isoformat(), last_day.isoformat())
+            ).fetchall()
+
+        sketch = HyperLogLog()
+        days: List[Dict] = []
+        for row in rows:
+            day_sketch = HyperLogLog(registers=row['beneficiaries'])
+            sketch.merge(day_sketch)
+            days.append({
+                'day': row['day'],
+                'reports': row['reports'],
+                'transaction_count': row['transactions'],
+                'total_amount': row['amount'],
+                'total_fees': row['fees'],
+                'unique_beneficiaries': day_sketch.count()
+            })
+
+        return {
+            'start': first_day.isoformat(),
+            'end': last_day.isoformat(),
+            'days': days,
+            'reports': sum(d['reports'] for d in days),
+            'transaction_count': sum(d['transaction_count'] for d in days),
+            'total_amount': sum(d['total_amount'] for d in days),
+            'total_fees': sum(d['total_fees'] for d in days),
+            'unique_beneficiaries': sketch.count()
+        }
+
+    def daily_summary(self, day: Optional[date] = None) -> Dict:
+        """Résumé d'une journée (aujourd'hui par défaut)"""
+        day = day or date.today()
+        return self._summarize(day, day)
+
+    def weekly_summary(self, end_day: Optional[date] = None, days: int = 7) -> Dict:
+        """Résumé des `days` derniers jours jusqu'à end_day inclus"""
+        end_day = end_day or date.today()
+        return self._summarize(end_day - timedelta(days=days - 1), end_day)
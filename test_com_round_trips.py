@@ -0,0 +1,296 @@
+"""
+Test du nombre d'allers-retours COM des writers Excel (exécutable sous Linux)
+Un faux objet COM enregistre chaque appel : lecture/écriture de propriété ou méthode
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Les modules Windows ne sont pas disponibles hors Windows : on les remplace
+from tests_support import stub_windows_modules
+stub_windows_modules('xlwings')
+
+import pandas as pd
+from core.excel_smart_writer import ExcelSmartWriter
+from core.excel_com_filler import ExcelCOMFiller
+from core.xlwings_filler import XlwingsFiller
+from core.render_block import RenderBlock
+from core.excel_range_batch import AMOUNT_FORMAT, format_thousands
+
+
+class Recorder:
+    """Compte les allers-retours et garde le contenu de la feuille"""
+
+    def __init__(self):
+        self.trips = 0
+        self.grid = {}
+
+    def get(self, row, col):
+        return self.grid.get((row, col))
+
+    def insert_rows(self, first_row, count):
+        self.grid = {
+            ((r + count) if r >= first_row else r, c): v
+            for (r, c), v in self.grid.items()
+        }
+
+
+class FakeCOMObject:
+    """Objet COM générique : chaque accès coûte un aller-retour"""
+
+    def __init__(self, recorder):
+        object.__setattr__(self, '_recorder', recorder)
+
+    def __getattr__(self, name):
+        self._recorder.trips += 1
+        return FakeCOMObject(self._recorder)
+
+    def __setattr__(self, name, value):
+        self._recorder.trips += 1
+
+    def __call__(self, *args, **kwargs):
+        self._recorder.trips += 1
+        return FakeCOMObject(self._recorder)
+
+
+class FakeRange(FakeCOMObject):
+    """Plage rectangulaire dont la propriété Value lit/écrit la grille"""
+
+    def __init__(self, recorder, first_row, first_col, last_row, last_col):
+        super().__init__(recorder)
+        object.__setattr__(self, 'bounds', (first_row, first_col, last_row, last_col))
+
+    def __getattr__(self, name):
+        first_row, first_col, last_row, last_col = self.bounds
+        if name == 'Value':
+            self._recorder.trips += 1
+            if (first_row, first_col) == (last_row, last_col):
+                return self._recorder.get(first_row, first_col)
+            return tuple(
+                tuple(self._recorder.get(r, c) for c in range(first_col, last_col + 1))
+                for r in range(first_row, last_row + 1)
+            )
+        if name == 'Insert':
+            def insert(*args):
+                self._recorder.trips += 1
+                self._recorder.insert_rows(first_row, last_row - first_row + 1)
+            return insert
+        return super().__getattr__(name)
+
+    def __setattr__(self, name, value):
+        if name == 'Value':
+            first_row, first_col, _, _ = self.bounds
+            rows = value if isinstance(value, (list, tuple)) else [[value]]
+            for i, row in enumerate(rows):
+                for j, cell in enumerate(row):
+                    self._recorder.grid[(first_row + i, first_col + j)] = cell
+        self._recorder.trips += 1
+
+
+class FakeComSheet(FakeCOMObject):
+    """Feuille Excel vue par win32com : Cells, Range, Rows"""
+
+    def Cells(self, row, col):
+        self._recorder.trips += 1
+        return FakeRange(self._recorder, row, col, row, col)
+
+    def Rows(self, row):
+        self._recorder.trips += 1
+        return FakeRange(self._recorder, row, 1, row, 16384)
+
+    def Range(self, first, last):
+        self._recorder.trips += 1
+        first_row, first_col, _, _ = first.bounds
+        _, _, last_row, last_col = last.bounds
+        return FakeRange(self._recorder, first_row, first_col, last_row, last_col)
+
+
+class FakeXwRange:
+    """Plage xlwings : chaque lecture/écriture de .value coûte un aller-retour"""
+
+    def __init__(self, recorder, first, last=None):
+        self.recorder = recorder
+        self.first = first
+        self.last = last or first
+        self.number_format = None
+
+    def options(self, **kwargs):
+        return self
+
+    @property
+    def value(self):
+        self.recorder.trips += 1
+        return [
+            [self.recorder.get(r, c) for c in range(self.first[1], self.last[1] + 1)]
+            for r in range(self.first[0], self.last[0] + 1)
+        ]
+
+    @value.setter
+    def value(self, value):
+        self.recorder.trips += 1
+        rows = value if isinstance(value, list) else [[value]]
+        for i, row in enumerate(rows):
+            for j, cell in enumerate(row):
+                self.recorder.grid[(self.first[0] + i, self.first[1] + j)] = cell
+
+
+class FakeXwSheet:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def range(self, first, last=None):
+        return FakeXwRange(self.recorder, first, last)
+
+
+def make_transactions(count):
+    return pd.DataFrame({
+        'Date': [f'09/09/2025 10:{i % 60:02d}' for i in range(count)],
+        'TransactionID': [f'CI{i:08d}' for i in range(count)],
+        'Type': ['PAIEMENT'] * count,
+        'Status': ['Succes,'] * count,
+        'Amount': [491741.0 + i for i in range(count)],
+        'Frais': [8261 + i for i in range(count)],
+        'De': ['UGP'] * count,
+        'Vers': [f'2359677{i:04d}' for i in range(count)],
+        'Beneficiaire': [f'BENEFICIAIRE {i}' for i in range(count)]
+    })
+
+
+def make_header_grid(recorder, header_row):
+    headers = ['Date', 'N° Transaction', 'Type', 'Statut', 'Montant',
+               'Frais ONG', 'De', 'Vers', 'Bénéficiaire']
+    for col, header in enumerate(headers, start=1):
+        recorder.grid[(header_row, col)] = header
+
+
+def smart_writer_trips(count):
+    recorder = Recorder()
+    writer = ExcelSmartWriter()
+    writer.sheet = FakeComSheet(recorder)
+    writer.excel = FakeCOMObject(recorder)
+    assert writer.write_transactions(make_transactions(count))
+    return recorder
+
+
+def com_filler_trips(count):
+    recorder = Recorder()
+    make_header_grid(recorder, 8)
+    ExcelCOMFiller()._fill_transactions_com(FakeComSheet(recorder), make_transactions(count))
+    return recorder
+
+
+def xlwings_filler_trips(count):
+    recorder = Recorder()
+    make_header_grid(recorder, 8)
+    XlwingsFiller()._fill_transactions_xlwings(FakeXwSheet(recorder), make_transactions(count))
+    return recorder
+
+
+def test_smart_writer_round_trips_constant():
+    """Le nombre d'allers-retours ne dépend plus du nombre de transactions"""
+    small = smart_writer_trips(10)
+    large = smart_writer_trips(500)
+    assert small.trips == large.trips
+
+    # Contenu écrit : ligne 12 = première transaction, colonnes B à J
+    assert large.get(12, 3) == 'CI00000000'
+    assert large.get(12, 5) == 'Success'
+    assert large.get(12, 6) == 491741
+    assert large.get(12, 9) == '96770000'
+    assert large.get(12 + 499, 10) == 'BENEFICIAIRE 499'
+
+
+def test_com_filler_round_trips_constant():
+    small = com_filler_trips(10)
+    large = com_filler_trips(500)
+    assert small.trips == large.trips
+    assert large.get(9, 2) == 'CI00000000'
+    assert large.get(9 + 499, 9) == 'BENEFICIAIRE 499'
+    assert large.get(9 + 500 + 1, 4) == 'TOTAL:'
+
+
+def test_xlwings_filler_round_trips_constant():
+    small = xlwings_filler_trips(10)
+    large = xlwings_filler_trips(500)
+    assert small.trips == large.trips
+    assert large.get(9, 5) == 491741
+    assert large.get(9 + 499, 9) == 'BENEFICIAIRE 499'
+
+
+def test_render_block_cleanup():
+    """Le bloc de rendu nettoie une seule fois statut, préfixe pays et montants"""
+    df = make_transactions(3)
+    df.loc[1, 'Vers'] = '66235000'
+    df.loc[2, 'Amount'] = float('nan')
+    block = RenderBlock.from_dataframe(df)
+
+    assert block.column('Status') == ['Success'] * 3
+    assert block.column('Vers')[0] == '96770000'
+    assert block.column('Vers')[1] == '66235000'  # 235 au milieu conservé
+    assert block.column('Amount') == [491741, 491742, 0]
+    assert block.formatted('Amount')[0] == '491 741'
+    assert block.total_amount == 983483
+    assert block.total_depense == block.total_amount + block.total_fees
+    assert block.unique_beneficiaries == 3
+    assert RenderBlock.ensure(block) is block
+
+
+def test_writers_accept_render_block():
+    """Un bloc construit une fois est consommé tel quel par les writers"""
+    block = RenderBlock.from_dataframe(make_transactions(20))
+    recorder = Recorder()
+    make_header_grid(recorder, 8)
+    ExcelCOMFiller()._fill_transactions_com(FakeComSheet(recorder), block)
+    assert recorder.get(9, 4) == 'Success'
+    assert recorder.get(9 + 20 + 1, 5) == block.total_amount
+
+
+def render_number_format(value, number_format):
+    """Affichage Excel d'un entier positif pour un format de chiffres ('#', '0') et littéraux"""
+    digits = list(str(value))
+    placeholders = [i for i, char in enumerate(number_format) if char in '#0']
+    out = []
+    for i in range(len(number_format) - 1, -1, -1):
+        char = number_format[i]
+        if char not in '#0':
+            out.append(char)
+        elif i == placeholders[0]:
+            # Le premier chiffre du format reçoit tous les chiffres restants
+            out.append(''.join(digits) or ('0' if char == '0' else ''))
+            digits = []
+        else:
+            out.append(digits.pop() if digits else ('0' if char == '0' else ''))
+    return ''.join(reversed(out))
+
+
+def test_amount_format_groups_millions_and_beyond():
+    """Chaque groupe de milliers séparé, au-delà du million (totaux des rapports)"""
+    assert render_number_format(1234567, '# ##0') == '1234 567'   # ancien format
+    for value in (1000000, 1234567, 5000000, 987654321, 12345678901):
+        assert render_number_format(value, AMOUNT_FORMAT).strip() == format_thousands(value)
+    assert render_number_format(1000000, AMOUNT_FORMAT).strip() == '1 000 000'
+    assert render_number_format(950, AMOUNT_FORMAT).strip() == '950'
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST DES ALLERS-RETOURS COM")
+    print("=" * 70)
+
+    for label, run in [('ExcelSmartWriter', smart_writer_trips),
+                       ('ExcelCOMFiller', com_filler_trips),
+                       ('XlwingsFiller', xlwings_filler_trips)]:
+        for count in (10, 100, 500):
+            recorder = run(count)
+            # Ancien mode : ~4 appels par cellule (Value, alignement, gras, bordures)
+            print(f"  • {label:<18} {count:>4} transactions → {recorder.trips:>4} allers-retours "
+                  f"(cellule par cellule: ~{count * 9 * 4})")
+
+    test_smart_writer_round_trips_constant()
+    test_com_filler_round_trips_constant()
+    test_xlwings_filler_round_trips_constant()
+    test_render_block_cleanup()
+    test_writers_accept_render_block()
+    test_amount_format_groups_millions_and_beyond()
+    print("\n✅ Nombre d'allers-retours indépendant du nombre de transactions")
+    print("=" * 70)
@@ -0,0 +1,383 @@
+"""
+Test / benchmark de l'envoi groupé avec sessions SMTP mutualisées
+Un mini serveur SMTP local (puits) compte les connexions, logins et messages
+"""
+import sys
+import os
+import time
+import tempfile
+import zipfile
+import threading
+import socketserver
+from email import message_from_bytes
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Windows factices et dossier logs/ (avant core / monitoring)
+import tests_support  # noqa: F401
+
+from monitoring.email_sender import ProfessionalEmailSender
+from monitoring.email_outbox import EmailOutbox, EmailDispatcher
+from monitoring.attachment_pipeline import AttachmentPipeline
+from monitoring.email_templates import TemplateRegistry, BUILTIN_TEMPLATES
+from monitoring.smtp_pool import SMTPConnectionPool
+
+
+class SinkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Implémente le strict minimum du protocole SMTP (sans TLS)"""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        stats = self.server.stats
+        with stats.lock:
+            stats.connections += 1
+        self.reply('220 sink ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ')[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-sink')
+                self.reply('250-AUTH PLAIN LOGIN')
+                self.reply('250 SIZE 52428800')
+            elif verb == 'HELO':
+                self.reply('250 sink')
+            elif verb == 'AUTH':
+                with stats.lock:
+                    stats.logins += 1
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == 'RCPT' and 'refuse' in command.lower():
+                self.reply('550 5.1.1 No such user')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b'.\r\n', b''):
+                        break
+                    data.append(chunk)
+                with stats.lock:
+                    stats.messages.append(b''.join(data))
+                self.reply('250 OK queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.stats = SinkStats()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def make_sender(port, partner_count, workers):
+    sender = ProfessionalEmailSender(config_path='inexistant.json')
+    sender.config['smtp'] = {
+        'server': '127.0.0.1', 'port': port, 'use_tls': False,
+        'username': 'ugp', 'password': 'secret'
+    }
+    sender.config['settings'] = {'max_parallel_sends': workers}
+    sender.config['partners'] = [
+        {'name': f'Partenaire {i}', 'email': f'partenaire{i}@ugp.td', 'cc': [], 'send_pdf': True}
+        for i in range(partner_count)
+    ]
+    return sender
+
+
+def make_pdf(size=200 * 1024):
+    handle, path = tempfile.mkstemp(suffix='.pdf')
+    with os.fdopen(handle, 'wb') as f:
+        f.write(b'%PDF-1.4\n' + os.urandom(size))
+    return path
+
+
+REPORT_DATA = {'transaction_count': 3, 'total_amount': 1500000, 'total_fees': 25200,
+               'unique_beneficiaries': 3, 'date': '09/09/2025'}
+
+
+def run_batch(partner_count=120, workers=4):
+    sink = SMTPSink()
+    pdf_path = make_pdf()
+    try:
+        sender = make_sender(sink.server_address[1], partner_count, workers)
+        start = time.time()
+        results = sender.send_to_all_partners(REPORT_DATA, [pdf_path])
+        elapsed = time.time() - start
+        return sink.stats, results, elapsed
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        os.remove(pdf_path)
+
+
+def test_batch_reuses_sessions():
+    """120 partenaires : au plus une session authentifiée par worker"""
+    stats, results, _ = run_batch(partner_count=120, workers=4)
+    assert len(results['success']) == 120
+    assert not results['failed']
+    assert len(stats.messages) == 120
+    assert stats.connections <= 4
+    assert stats.logins == stats.connections
+
+
+def test_attachment_encoded_once():
+    """La pièce jointe est lue/encodée une fois, quel que soit le nombre de partenaires"""
+    sender = make_sender(1, 10, 2)
+    pdf_path = make_pdf()
+    sender._send_email = lambda msg, recipient, pool=None: True
+    try:
+        results = sender.send_to_all_partners(REPORT_DATA, [pdf_path])
+    finally:
+        os.remove(pdf_path)
+    assert len(results['success']) == 10
+    assert results['attachments']['encoded'] == 1
+
+
+def test_streamed_attachment_round_trip():
+    """Le contenu encodé par blocs se décode à l'identique côté destinataire"""
+    sink = SMTPSink()
+    pdf_path = make_pdf(size=3 * 1024 * 1024 + 17)
+    try:
+        sender = make_sender(sink.server_address[1], 1, 1)
+        assert sender.send_report_email(sender.config['partners'][0], REPORT_DATA, [pdf_path])
+        message = message_from_bytes(sink.stats.messages[0])
+        parts = [part for part in message.walk() if part.get_filename()]
+        assert len(parts) == 1
+        with open(pdf_path, 'rb') as f:
+            assert parts[0].get_payload(decode=True) == f.read()
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        os.remove(pdf_path)
+
+
+def test_oversized_attachment_replaced_by_link():
+    """Au-delà de la taille maximale, le fichier est remplacé par un lien local"""
+    link_dir = tempfile.mkdtemp()
+    pdf_path = make_pdf(size=300 * 1024)
+    settings = {'max_attachment_size_mb': 0.1, 'compress_attachments': True,
+                'oversize_link_dir': link_dir}
+    try:
+        with AttachmentPipeline(settings) as pipeline:
+            prepared = pipeline.prepare([pdf_path])
+            # Contenu aléatoire : le ZIP reste trop gros, un lien le remplace
+            assert prepared.attachments == []
+            assert len(prepared.links) == 1
+            assert prepared.links[0][1].startswith('file://')
+            assert pipeline.stats == {'encoded': 0, 'zipped': 1, 'linked': 1}
+        assert os.listdir(link_dir)
+
+        # Autre rapport de même nom : copie distincte, le premier lien reste valide
+        first_link = prepared.links[0][1]
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + os.urandom(300 * 1024))
+        with AttachmentPipeline(settings) as pipeline:
+            second_link = pipeline.prepare([pdf_path]).links[0][1]
+        assert second_link != first_link
+        assert os.path.basename(second_link) == os.path.basename(first_link)
+        assert len(os.listdir(link_dir)) == 2
+    finally:
+        os.remove(pdf_path)
+
+
+def test_template_compiled_and_hot_reloaded():
+    """Rendu identique à l'ancien remplacement clé par clé, fichier rechargé par mtime"""
+    data = {'title': 'Rapport', 'recipient_name': 'Partenaire 1', 'total_amount': '1 500 000'}
+    expected = BUILTIN_TEMPLATES['report_ready']
+    for key, value in data.items():
+        expected = expected.replace(f'{{{{{key}}}}}', str(value))
+    assert TemplateRegistry().render('report_ready', data) == expected
+
+    handle, path = tempfile.mkstemp(suffix='.html')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write('<p>Semaine {{week}}</p>')
+    try:
+        registry = TemplateRegistry({'weekly_summary': path})
+        assert registry.render('weekly_summary', {'week': 37}) == '<p>Semaine 37</p>'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('<h1>Semaine {{week}}</h1>')
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        assert registry.render('weekly_summary', {'week': 38}) == '<h1>Semaine 38</h1>'
+    finally:
+        os.remove(path)
+
+
+class FlakySender:
+    """Échoue pour un partenaire au premier passage, puis réussit"""
+
+    def __init__(self):
+        self.config = {'settings': {'max_retries': 3, 'retry_base_delay': 0}}
+        self.calls = []
+
+    def send_to_all_partners(self, report_data, attachments, recipients=None):
+        self.calls.append(recipients)
+        if len(self.calls) == 1:
+            return {'success': ['a@ugp.td'], 'failed': ['b@ugp.td']}
+        return {'success': recipients or [], 'failed': []}
+
+
+def test_outbox_survives_restart_and_retries():
+    """Le message persiste sur disque et seuls les destinataires en échec sont relancés"""
+    outbox_dir = tempfile.mkdtemp()
+    pdf_path = make_pdf()
+    try:
+        message_id = EmailOutbox(outbox_dir).enqueue(REPORT_DATA, [pdf_path], job_id='job1')
+
+        # Nouvelle instance = redémarrage du processus
+        outbox = EmailOutbox(outbox_dir)
+        sender = FlakySender()
+        dispatcher = EmailDispatcher(sender, outbox)
+        assert dispatcher.dispatch_pending() == 1
+        assert outbox.get_stats()['pending'] == 1
+        assert dispatcher.dispatch_pending() == 1
+        assert sender.calls == [None, ['b@ugp.td']]
+        assert outbox.get_stats()['sent'] == 1
+        assert message_id == 1
+    finally:
+        os.remove(pdf_path)
+
+
+def test_digest_coalesces_burst():
+    """Trois rapports dans la fenêtre : un seul email par partenaire"""
+    sink = SMTPSink()
+    outbox_dir = tempfile.mkdtemp()
+    pdf_paths = [make_pdf() for _ in range(3)]
+    try:
+        sender = make_sender(sink.server_address[1], 5, 2)
+        sender.config['settings']['digest_window_seconds'] = 60
+        outbox = EmailOutbox(outbox_dir)
+        dispatcher = EmailDispatcher(sender, outbox)
+
+        # Le premier rapport est échu, les deux suivants sont encore dans la fenêtre
+        outbox.enqueue(REPORT_DATA, [pdf_paths[0]])
+        for pdf_path in pdf_paths[1:]:
+            outbox.enqueue(REPORT_DATA, [pdf_path], delay=60)
+
+        assert dispatcher.dispatch_pending() == 3
+        assert len(sink.stats.messages) == 5
+        assert outbox.get_stats()['sent'] == 3
+        # Chaque email porte les trois rapports du digest, compressés dans un seul ZIP
+        for raw in sink.stats.messages:
+            parts = [part for part in message_from_bytes(raw).walk() if part.get_filename()]
+            assert len(parts) == 1 and parts[0].get_content_type() == 'application/zip'
+            archive_path = os.path.join(outbox_dir, 'digest.zip')
+            with open(archive_path, 'wb') as f:
+                f.write(parts[0].get_payload(decode=True))
+            with zipfile.ZipFile(archive_path) as archive:
+                assert len(archive.namelist()) == 3
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        for pdf_path in pdf_paths:
+            os.remove(pdf_path)
+
+
+def test_inbox_partners_and_digest_per_recipient_set():
+    """Entrées complètes par inbox ; digest par ensemble de destinataires"""
+    sink = SMTPSink()
+    outbox_dir = tempfile.mkdtemp()
+    pdf_paths = [make_pdf() for _ in range(4)]
+    try:
+        sender = make_sender(sink.server_address[1], 3, 2)
+        sender.config['settings']['digest_window_seconds'] = 60
+        pnds = [{'name': 'PNDS', 'email': 'pnds@example.org', 'send_pdf': True},
+                'partenaire0@ugp.td']
+        resolved = sender.resolve_partners(pnds + ['inconnu@ugp.td'])
+        assert [p['email'] for p in resolved] == ['pnds@example.org', 'partenaire0@ugp.td']
+        assert resolved[1]['name'] == 'Partenaire 0'
+        assert sender.resolve_partners(['inconnu@ugp.td']) == []
+
+        outbox = EmailOutbox(outbox_dir)
+        dispatcher = EmailDispatcher(sender, outbox)
+        outbox.enqueue(REPORT_DATA, [pdf_paths[0]], recipients=pnds)
+        outbox.enqueue(REPORT_DATA, [pdf_paths[1]], recipients=list(reversed(pnds)), delay=60)
+        outbox.enqueue(REPORT_DATA, [pdf_paths[2]], delay=60)
+        outbox.enqueue(REPORT_DATA, [pdf_paths[3]], delay=60)
+
+        assert dispatcher.dispatch_pending() == 4
+        assert outbox.get_stats()['sent'] == 4
+        # Un digest pour l'inbox (2 destinataires), un pour tous les partenaires (3)
+        to = sorted(message_from_bytes(raw)['To'] for raw in sink.stats.messages)
+        assert len(to) == 5
+        assert sum('pnds@example.org' in address for address in to) == 1
+        assert sum('partenaire0@ugp.td' in address for address in to) == 2
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        for pdf_path in pdf_paths:
+            os.remove(pdf_path)
+
+
+def test_refused_recipient_keeps_session_without_resend():
+    """Destinataire refusé : ni reconnexion ni renvoi, la session sert au message suivant"""
+    import smtplib
+    from email.message import EmailMessage
+    sink = SMTPSink()
+    try:
+        pool = SMTPConnectionPool({'server': '127.0.0.1', 'port': sink.server_address[1],
+                                   'use_tls': False}, size=1)
+
+        def message(to):
+            msg = EmailMessage()
+            msg['From'], msg['To'], msg['Subject'] = 'ugp@ugp.td', to, 'Rapport'
+            msg.set_content('corps')
+            return msg
+
+        try:
+            pool.send_message(message('refuse@ugp.td'))
+            assert False, "refus attendu"
+        except smtplib.SMTPRecipientsRefused:
+            pass
+        assert pool.stats['reconnects'] == 0
+        assert sink.stats.messages == []
+
+        assert pool.send_message(message('partenaire@ugp.td'))
+        assert pool.stats['connections'] == 1 and sink.stats.connections == 1
+        assert len(sink.stats.messages) == 1
+        pool.close()
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" BENCHMARK ENVOI EMAIL (puits SMTP local)")
+    print("=" * 70)
+
+    for partner_count, workers in ((120, 1), (120, 4), (250, 8)):
+        stats, results, elapsed = run_batch(partner_count, workers)
+        print(f"  • {partner_count} partenaires, {workers} worker(s): {elapsed:.2f}s — "
+              f"{stats.connections} session(s), {stats.logins} login(s), "
+              f"{len(stats.messages)} message(s), {len(results['failed'])} échec(s)")
+
+    test_batch_reuses_sessions()
+    test_attachment_encoded_once()
+    test_streamed_attachment_round_trip()
+    test_oversized_attachment_replaced_by_link()
+    test_template_compiled_and_hot_reloaded()
+    test_outbox_survives_restart_and_retries()
+    test_digest_coalesces_burst()
+    test_inbox_partners_and_digest_per_recipient_set()
+    test_refused_recipient_keeps_session_without_resend()
+    print("\n✅ Sessions SMTP réutilisées et pièces jointes encodées une seule fois (par blocs)")
+    print("=" * 70)
@@ -0,0 +1,417 @@
+"""
+Test du cœur asyncio du surveillant de dossiers
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Windows factices et dossier logs/ (avant core / monitoring)
+import tests_support  # noqa: F401
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from monitoring.file_watcher_fixed import SmartFileWatcher
+from monitoring.set_correlator import SetCorrelator
+from monitoring.inboxes import InboxScheduler, inboxes_from_config
+from monitoring.dir_snapshot import DirectorySnapshot
+from monitoring import archiver as archiver_module
+from monitoring.archiver import Archiver
+from monitoring.job_scheduler import QueuedJob, SchedulingPolicy, estimate_rows, filename_priority
+
+PATTERNS = {'bulkreport': ['bulkreport', 'bulk'], 'export': ['export'], 'frais': ['frais']}
+
+
+def make_watcher(**overrides):
+    root = tempfile.mkdtemp()
+    config = {
+        'watched_folder': os.path.join(root, 'inbox'),
+        'processed_folder': os.path.join(root, 'processed'),
+        'error_folder': os.path.join(root, 'errors'),
+        'check_interval': 0.2,
+        'file_stability_time': 0.1,
+        'archive_processed': True,
+        'dedup_index': os.path.join(root, 'processed_sets.db')
+    }
+    config.update(overrides)
+    config_path = os.path.join(root, 'monitoring_config.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return SmartFileWatcher(config_path)
+
+
+def run_in_background(watcher):
+    thread = threading.Thread(target=watcher.start_monitoring, daemon=True)
+    thread.start()
+    deadline = time.time() + 5
+    while watcher.loop is None and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    return thread
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def drop(folder, name, content=b'data'):
+    with open(os.path.join(folder, name), 'wb') as f:
+        f.write(content)
+
+
+def test_complete_set_processed_and_archived():
+    """Ensemble complet : un seul traitement, fichiers archivés, arrêt propre"""
+    watcher = make_watcher()
+    processed, prefetched = [], []
+    watcher.set_process_callback(lambda files, inbox=None: processed.append(files) or {'success': True})
+    watcher.set_prefetch_callback(lambda file_type, path: prefetched.append(file_type))
+    thread = run_in_background(watcher)
+
+    inbox = str(watcher.watched_folder)
+    drop(inbox, 'BulkReport.csv')
+    drop(inbox, 'Export.xlsx')
+    assert wait_for(lambda: len(processed) == 1)
+    assert sorted(prefetched) == ['bulkreport', 'export']
+    assert processed[0]['frais'] is None
+    assert wait_for(lambda: not os.listdir(inbox))
+
+    watcher.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert watcher.get_stats()['status'] == 'stopped'
+
+
+def test_failed_processing_moves_files_to_errors():
+    """Échec du traitement : fichiers déplacés dans le dossier d'erreurs"""
+    watcher = make_watcher()
+    watcher.set_process_callback(lambda files, inbox=None: {'success': False, 'error': 'boom'})
+    thread = run_in_background(watcher)
+
+    drop(str(watcher.watched_folder), 'bulk_0909.csv')
+    drop(str(watcher.watched_folder), 'export_0909.xlsx')
+    assert wait_for(lambda: any(watcher.error_folder.iterdir()))
+    watcher.stop()
+    thread.join(5)
+
+
+def test_correlator_keeps_concurrent_sets_apart():
+    """Deux BulkReports avant leurs Exports : aucun écrasement, appariement par nom ou plan"""
+    correlator = SetCorrelator(PATTERNS)
+    t0 = datetime(2025, 9, 9, 10, 0)
+    assert correlator.add('bulkreport', Path('BulkReport_UGP_0909.csv'), now=t0) is None
+    assert correlator.add('bulkreport', Path('BulkReport.csv'), plan_name='PNDS Lot 2',
+                          now=t0 + timedelta(seconds=5)) is None
+    assert len(correlator.open_sets) == 2
+
+    # Nom du plan de l'en-tête du second BulkReport
+    second = correlator.add('export', Path('Export_PNDS_lot2.xlsx'), now=t0 + timedelta(seconds=10))
+    assert second.as_job_files()['bulkreport'] == 'BulkReport.csv'
+    # Identifiant du nom de fichier
+    first = correlator.add('export', Path('export-ugp-0909.xlsx'), now=t0 + timedelta(seconds=15))
+    assert first.as_job_files()['bulkreport'] == 'BulkReport_UGP_0909.csv'
+    assert correlator.open_sets == []
+
+
+def test_correlator_arrival_window_and_orphans():
+    """Fichiers sans identifiant : fenêtre d'arrivée ; ensembles trop vieux abandonnés"""
+    correlator = SetCorrelator(PATTERNS, window=60, orphan_timeout=3600)
+    t0 = datetime(2025, 9, 9, 10, 0)
+    correlator.add('bulkreport', Path('BulkReport.csv'), now=t0)
+    correlator.add('frais', Path('Frais.xlsx'), now=t0 + timedelta(seconds=30))
+    assert len(correlator.open_sets) == 1
+
+    done = correlator.add('export', Path('Export.xlsx'), now=t0 + timedelta(seconds=50))
+    assert done.as_job_files() == {'bulkreport': 'BulkReport.csv', 'export': 'Export.xlsx',
+                                   'frais': 'Frais.xlsx'}
+
+    # Hors fenêtre de l'ensemble précédent : nouvel ensemble, abandonné après une heure
+    correlator.add('bulkreport', Path('BulkReport.csv'), now=t0 + timedelta(seconds=100))
+    correlator.add('frais', Path('Frais.xlsx'), now=t0 + timedelta(seconds=300))
+    assert len(correlator.open_sets) == 2
+    assert correlator.evict(now=t0 + timedelta(minutes=30)) == []
+    assert len(correlator.evict(now=t0 + timedelta(hours=2))) == 2
+    assert correlator.open_sets == []
+
+
+def test_scheduler_round_robin_with_caps():
+    """Une inbox en rafale n'affame pas les autres ; plafond de concurrence par inbox"""
+    root = tempfile.mkdtemp()
+    config = {
+        'watched_folder': root, 'processed_folder': root, 'error_folder': root,
+        'patterns': PATTERNS, 'max_concurrent_jobs': 4,
+        'inboxes': [{'name': 'ugp', 'max_concurrent': 1}, {'name': 'pnds', 'max_concurrent': 2}]
+    }
+    ugp, pnds = inboxes_from_config(config)
+    scheduler = InboxScheduler([ugp, pnds])
+    for i in range(5):
+        scheduler.push(ugp, {'set': f'ugp{i}'})
+    scheduler.push(pnds, {'set': 'pnds0'})
+    scheduler.push(pnds, {'set': 'pnds1'})
+
+    order = [scheduler.pop()[1]['set'] for _ in range(3)]
+    assert order == ['ugp0', 'pnds0', 'pnds1']
+    assert scheduler.pop() is None            # ugp plafonnée à 1, pnds vide
+    scheduler.done(ugp)
+    assert scheduler.pop()[1]['set'] == 'ugp1'
+    assert scheduler.queued() == 3
+
+
+def test_shortest_job_first_with_aging_and_priority_tags():
+    """Petits rapports avant le gros fichier de fin de mois, sans le laisser attendre indéfiniment"""
+    folder = tempfile.mkdtemp()
+    drop(folder, 'bulk_small.csv', b'header\n' + b'row;1;2\n' * 50)
+    drop(folder, 'bulk_month_end.csv', b'header\n' + b'row;1;2\n' * 300000)
+    assert estimate_rows(Path(folder) / 'bulk_small.csv') == 51
+    assert abs(estimate_rows(Path(folder) / 'bulk_month_end.csv') - 300001) < 3000
+
+    assert filename_priority(['BulkReport_prio1_0909.csv', 'Export.xlsx'], 5) == 1
+    assert filename_priority(['Export_URGENT.xlsx'], 5) == 0
+    assert filename_priority(['BulkReport_prior.csv'], 5) == 5
+
+    policy = SchedulingPolicy('sjf', aging=60)
+    scheduler = InboxScheduler(inboxes_from_config({
+        'watched_folder': folder, 'processed_folder': folder, 'error_folder': folder,
+        'patterns': PATTERNS, 'max_concurrent_jobs': 1}), policy)
+    inbox = scheduler.inboxes['default']
+    big = policy.estimate({'bulkreport': os.path.join(folder, 'bulk_month_end.csv')})
+    small = policy.estimate({'bulkreport': os.path.join(folder, 'bulk_small.csv')})
+    scheduler.push(inbox, {'set': 'month_end'}, **big)
+    for i in range(3):
+        scheduler.push(inbox, {'set': f'daily{i}'}, **small)
+    order = []
+    for _ in range(4):
+        order.append(scheduler.pop()[1]['set'])
+        scheduler.done(inbox)
+    assert order == ['daily0', 'daily1', 'daily2', 'month_end']
+
+    # Vieillissement : après une longue attente le gros job passe devant un nouveau petit
+    scheduler.push(inbox, {'set': 'month_end'}, **big)
+    scheduler.queues['default'][0].enqueued_at -= 20 * 60
+    scheduler.push(inbox, {'set': 'daily3'}, **small)
+    assert scheduler.pop()[1]['set'] == 'month_end'
+
+    priority = SchedulingPolicy('priority', aging=0)
+    queue = [QueuedJob({}, priority=5), QueuedJob({}, priority=1), QueuedJob({}, priority=1)]
+    assert priority.select(queue) == 1
+
+
+def test_multiple_inboxes_share_one_observer():
+    """Deux inboxes surveillées ensemble : le traitement reçoit l'inbox d'origine"""
+    root = tempfile.mkdtemp()
+    watcher = make_watcher(inboxes=[
+        {'name': 'ugp', 'watched_folder': os.path.join(root, 'ugp'),
+         'metadata': {'projet': 'UGP'}},
+        {'name': 'pnds', 'watched_folder': os.path.join(root, 'pnds'),
+         'processed_folder': os.path.join(root, 'pnds_done'), 'partners': ['pnds@example.org']}
+    ])
+    assert watcher.inboxes['ugp'].metadata == {'projet': 'UGP'}
+    processed = []
+    watcher.set_process_callback(lambda files, inbox=None: processed.append(inbox) or {'success': True})
+    thread = run_in_background(watcher)
+
+    for name in ('ugp', 'pnds'):
+        drop(os.path.join(root, name), 'BulkReport.csv')
+        drop(os.path.join(root, name), 'Export.xlsx')
+    assert wait_for(lambda: len(processed) == 2)
+    assert sorted(processed) == ['pnds', 'ugp']
+    assert wait_for(lambda: os.path.isdir(os.path.join(root, 'pnds_done'))
+                    and len(os.listdir(os.path.join(root, 'pnds_done'))) == 1)
+    watcher.stop()
+    thread.join(5)
+
+
+def test_startup_backlog_and_polling_mode():
+    """Fichiers présents au démarrage traités ; inbox scrutée sans événements"""
+    watcher = make_watcher(polling=True, poll_interval=0.2)
+    inbox = str(watcher.watched_folder)
+    drop(inbox, 'BulkReport.csv')
+    drop(inbox, 'Export.xlsx')
+    processed = []
+    watcher.set_process_callback(lambda files, inbox=None: processed.append(files) or {'success': True})
+    thread = run_in_background(watcher)
+
+    assert wait_for(lambda: len(processed) == 1)
+    drop(inbox, 'BulkReport_2.csv', b'bulk 2')
+    drop(inbox, 'Export_2.xlsx', b'export 2')
+    assert wait_for(lambda: len(processed) == 2)
+    assert processed[1]['bulkreport'].endswith('BulkReport_2.csv')
+    watcher.stop()
+    thread.join(5)
+
+
+def test_redropped_identical_set_not_reprocessed():
+    """Ensemble identique redéposé : résultat précédent repris, fichiers archivés"""
+    watcher = make_watcher()
+    processed = []
+    watcher.set_process_callback(lambda files, inbox=None: processed.append(files) or {
+        'success': True, 'job_id': f"job{len(processed)}", 'report_path': None, 'email_sent': True})
+    thread = run_in_background(watcher)
+
+    inbox = str(watcher.watched_folder)
+    drop(inbox, 'BulkReport.csv', b'bulk' * 300000)
+    drop(inbox, 'Export.xlsx', b'export')
+    assert wait_for(lambda: len(processed) == 1 and not os.listdir(inbox))
+
+    # Même contenu sous d'autres noms : aucun nouveau traitement
+    drop(inbox, 'BulkReport_copie.csv', b'bulk' * 300000)
+    drop(inbox, 'Export_copie.xlsx', b'export')
+    assert wait_for(lambda: not os.listdir(inbox))
+    assert len(processed) == 1
+    assert watcher.get_stats()['processed_sets'] == {'sets': 1, 'duplicates_skipped': 1}
+
+    # Contenu différent : traité normalement
+    drop(inbox, 'BulkReport.csv', b'bulk v2')
+    drop(inbox, 'Export.xlsx', b'export')
+    assert wait_for(lambda: len(processed) == 2)
+    watcher.stop()
+    thread.join(5)
+
+
+def test_recovered_job_indexed_and_archived_before_backlog():
+    """Job repris du journal : archivé et indexé, l'arriéré ne le retraite pas"""
+    watcher = make_watcher()
+    inbox = str(watcher.watched_folder)
+    drop(inbox, 'BulkReport.csv', b'bulk')
+    drop(inbox, 'Export.xlsx', b'export')
+    files = {'bulkreport': os.path.join(inbox, 'BulkReport.csv'),
+             'export': os.path.join(inbox, 'Export.xlsx'), 'frais': None}
+    calls = []
+
+    def process(files, inbox=None, job_id=None):
+        calls.append(job_id)
+        return {'success': True, 'job_id': job_id or f"job{len(calls)}", 'report_path': None}
+
+    watcher.set_process_callback(process)
+    result = watcher.process_recovered('default', files, 'job_crash')
+    assert result['success'] and calls == ['job_crash']
+    assert not os.listdir(inbox)
+    assert watcher.get_stats()['processed_sets']['sets'] == 1
+
+    # Même ensemble encore présent au démarrage (archivage impossible) : repris de l'index
+    drop(inbox, 'BulkReport.csv', b'bulk')
+    drop(inbox, 'Export.xlsx', b'export')
+    thread = run_in_background(watcher)
+    assert wait_for(lambda: not os.listdir(inbox))
+    assert calls == ['job_crash']
+    watcher.stop()
+    thread.join(5)
+
+
+def test_stop_keeps_loop_responsive_while_jobs_finish():
+    """Arrêt pendant un traitement : la boucle répond encore, le traitement va jusqu'au bout"""
+    watcher = make_watcher()
+    started, release = threading.Event(), threading.Event()
+    processed = []
+
+    def process(files, inbox=None):
+        started.set()
+        release.wait(10)
+        processed.append(files)
+        return {'success': True}
+
+    watcher.set_process_callback(process)
+    thread = run_in_background(watcher)
+    inbox = str(watcher.watched_folder)
+    drop(inbox, 'BulkReport.csv')
+    drop(inbox, 'Export.xlsx')
+    assert started.wait(5)
+
+    loop = watcher.loop
+    watcher.stop()
+    time.sleep(0.3)
+    answered = threading.Event()
+    loop.call_soon_threadsafe(answered.set)
+    assert answered.wait(2)
+    assert thread.is_alive() and not processed
+
+    release.set()
+    thread.join(5)
+    assert not thread.is_alive() and len(processed) == 1
+
+
+def test_snapshot_diff_on_large_folder():
+    """Seuls les fichiers nouveaux ou modifiés sont signalés, même sur des milliers d'entrées"""
+    folder = tempfile.mkdtemp()
+    for i in range(3000):
+        drop(folder, f"old_{i}.csv", b'x')
+    snapshot = DirectorySnapshot(folder)
+    changed, removed = snapshot.refresh()
+    assert len(changed) == 3000 and removed == []
+
+    drop(folder, 'Export.xlsx')
+    drop(folder, 'old_7.csv', b'xyz')
+    os.remove(os.path.join(folder, 'old_8.csv'))
+    start = time.time()
+    changed, removed = snapshot.refresh()
+    assert sorted(p.name for p in changed) == ['Export.xlsx', 'old_7.csv']
+    assert [p.name for p in removed] == ['old_8.csv']
+    assert time.time() - start < 1
+
+
+def test_archiver_moves_compresses_and_prunes():
+    """Déplacement sans copie, copie seulement entre volumes, zip en arrière-plan, rétention"""
+    import errno
+    import zipfile
+    inbox, processed = tempfile.mkdtemp(), tempfile.mkdtemp()
+    drop(inbox, 'BulkReport.csv', b'bulk' * 1000)
+    drop(inbox, 'Export.xlsx', b'export')
+    archiver = Archiver(compress=True, retention_days=30)
+    files = {'bulkreport': os.path.join(inbox, 'BulkReport.csv'),
+             'export': os.path.join(inbox, 'Export.xlsx'), 'frais': None}
+
+    # Export sur un autre volume : os.replace échoue en EXDEV
+    real_replace = os.replace
+
+    def cross_device(source, target):
+        if str(source).endswith('Export.xlsx'):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        return real_replace(source, target)
+
+    archiver_module.os.replace = cross_device
+    try:
+        folder = archiver.archive(files, processed)
+    finally:
+        archiver_module.os.replace = real_replace
+    archiver.flush()
+
+    assert os.listdir(inbox) == []
+    assert (archiver.stats['moved'], archiver.stats['copied']) == (1, 1)
+    assert archiver.stats['compressed'] == 1
+    assert not folder.exists()
+    with zipfile.ZipFile(folder.with_suffix('.zip')) as archive:
+        assert sorted(archive.namelist()) == ['BulkReport.csv', 'Export.xlsx']
+
+    old = os.path.join(processed, '20200101_000000.zip')
+    drop(processed, '20200101_000000.zip')
+    os.utime(old, (time.time() - 40 * 86400,) * 2)
+    assert archiver.prune() == 1
+    assert os.listdir(processed) == [folder.with_suffix('.zip').name]
+    archiver.stop()
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST SURVEILLANT ASYNCIO")
+    print("=" * 70)
+    test_complete_set_processed_and_archived()
+    test_failed_processing_moves_files_to_errors()
+    test_correlator_keeps_concurrent_sets_apart()
+    test_correlator_arrival_window_and_orphans()
+    test_scheduler_round_robin_with_caps()
+    test_shortest_job_first_with_aging_and_priority_tags()
+    test_multiple_inboxes_share_one_observer()
+    test_startup_backlog_and_polling_mode()
+    test_redropped_identical_set_not_reprocessed()
+    test_recovered_job_indexed_and_archived_before_backlog()
+    test_stop_keeps_loop_responsive_while_jobs_finish()
+    test_snapshot_diff_on_large_folder()
+    test_archiver_moves_compresses_and_prunes()
+    print("\n✅ Événements, traitement et arrêt OK")
+    print("=" * 70)
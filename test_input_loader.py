@@ -0,0 +1,63 @@
+"""
+Test du chargement simultané des fichiers d'entrée
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from core.input_loader import InputLoader
+
+
+class SlowFileHandler:
+    """Chaque lecture prend 0,3 s ; la table des frais est illisible"""
+
+    def read_bulk_report(self, path):
+        time.sleep(0.3)
+        return pd.DataFrame({'Amount': [100000]}), {'plan_name': 'PLAN'}
+
+    def read_export_file(self, path):
+        time.sleep(0.3)
+        return pd.DataFrame({'Nom': ['ALI']})
+
+    def read_fees_file(self, path):
+        time.sleep(0.3)
+        raise ValueError("Frais.xlsx corrompu")
+
+
+def test_files_loaded_concurrently():
+    """Durée du chargement = lecture la plus lente, erreur des frais rapportée"""
+    start = time.perf_counter()
+    inputs = InputLoader(SlowFileHandler()).load('BulkReport.csv', 'Export.xlsx', 'Frais.xlsx')
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.6
+    assert len(inputs.bulk_df) == 1 and inputs.bulk_metadata['plan_name'] == 'PLAN'
+    assert inputs.fees_df is None
+    assert 'corrompu' in inputs.errors['frais']
+    assert set(inputs.timings) == {'bulkreport', 'export', 'frais'}
+    assert all(t >= 0.3 for t in inputs.timings.values())
+
+
+def test_required_file_error_raised():
+    """Un Export illisible fait échouer le chargement avec l'erreur d'origine"""
+    handler = SlowFileHandler()
+    handler.read_export_file = lambda path: (_ for _ in ()).throw(FileNotFoundError(path))
+    try:
+        InputLoader(handler).load('BulkReport.csv', 'Export.xlsx')
+    except FileNotFoundError as e:
+        assert 'Export.xlsx' in str(e)
+    else:
+        raise AssertionError("FileNotFoundError attendue")
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST CHARGEMENT SIMULTANÉ DES ENTRÉES")
+    print("=" * 70)
+    test_files_loaded_concurrently()
+    test_required_file_error_raised()
+    print("\n✅ Chargement en parallèle OK")
+    print("=" * 70)
@@ -0,0 +1,121 @@
+"""
+Test de l'exécution isolée des jobs dans des processus de travail
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import functools
+import subprocess
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Windows factices et dossier logs/ (avant core / monitoring)
+from tests_support import windows_stubs_on_path
+
+from core.input_loader import InputLoader
+from core.output_manager import HOST_TAG, TEMP_PREFIX
+from monitoring.auto_processor import isolated_processor
+from monitoring.email_outbox import EmailOutbox
+from monitoring.job_isolation import IsolatedJobRunner
+from test_job_journal import CountingFileHandler, make_processor, FILES
+
+
+class MisbehavingFileHandler(CountingFileHandler):
+    """BulkReport 'hang' : lecture sans fin ; 'hog' : allocation démesurée"""
+
+    def read_bulk_report(self, path):
+        if 'hang' in path:
+            time.sleep(60)
+        if 'hog' in path:
+            bytearray(2 * 1024 ** 3)
+        return super().read_bulk_report(path)
+
+
+def isolated_fake_processor():
+    """Processeur construit dans le processus fils"""
+    processor = make_processor(max_retries=0, pdf_failures=0)
+    processor.file_handler = MisbehavingFileHandler()
+    processor.input_loader = InputLoader(processor.file_handler)
+    return processor
+
+
+def test_isolated_jobs_time_limits_memory_and_recycling():
+    """Fils tué sur délai dépassé, MemoryError contenue, recyclage après N jobs"""
+    with windows_stubs_on_path():
+        runner = IsolatedJobRunner(isolated_fake_processor, workers=1, memory_limit_mb=1024,
+                                   stage_timeouts={'read': 1}, start_timeout=60, max_jobs_per_worker=2)
+        ok = runner.run(FILES, job_id='job_ok')
+        assert ok['success'] and ok['job_id'] == 'job_ok' and ok['report_path']
+
+        hung = runner.run({**FILES, 'bulkreport': 'hang.csv'}, job_id='job_hang')
+        assert not hung['success'] and hung['stage'] == 'read'
+        assert 'Délai dépassé' in hung['error']
+
+        if sys.platform != 'win32':
+            hog = runner.run({**FILES, 'bulkreport': 'hog.csv'}, job_id='job_hog')
+            assert not hog['success'] and 'MemoryError' in hog['error']
+
+        for index in range(2):
+            assert runner.run(FILES, job_id=f"job_{index}")['success']
+        stats = runner.get_stats()
+        runner.shutdown()
+    assert stats['timeouts'] == 1 and stats['recycled'] >= 1
+    assert stats['spawned'] >= 3
+
+
+def test_worker_leaves_daemon_outbox_and_temp_files_alone():
+    """Processeur d'un fils : ni reprise de la boîte d'envoi, ni nettoyage des temporaires"""
+    cwd = os.getcwd()
+    root = tempfile.mkdtemp()
+    os.chdir(root)
+    try:
+        os.makedirs('logs')
+        config_path = os.path.join(root, 'auto_processor_config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({'processing': {'auto_retry': False, 'send_email': False}}, f)
+
+        # Message en cours d'envoi par le dispatcher du démon
+        outbox = EmailOutbox('outbox')
+        outbox.enqueue({'transaction_count': 1})
+        assert len(outbox.claim_due()) == 1
+
+        # Temporaire d'un processus disparu : nettoyé par le démon seulement
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        os.makedirs('outputs')
+        orphan = os.path.join('outputs', f"{TEMP_PREFIX}{HOST_TAG}-{dead.pid}_abcd1234_crash.xlsx")
+        open(orphan, 'wb').close()
+
+        with windows_stubs_on_path():
+            runner = IsolatedJobRunner(functools.partial(isolated_processor, config_path, {}),
+                                       workers=1, start_timeout=120)
+            result = runner.run({'bulkreport': 'absent.csv', 'export': 'absent.xlsx', 'frais': None},
+                                job_id='job_absent')
+            stats = runner.get_stats()
+            runner.shutdown()
+
+        # Le fils a démarré et traité le job (en échec : fichiers absents)
+        assert not result['success'] and result['job_id'] == 'job_absent'
+        assert stats['crashes'] == 0 and stats['timeouts'] == 0
+        assert outbox.get_stats()['sending'] == 1
+        assert os.path.exists(orphan)
+
+        # Processeur allégé : ni surveillant ni dispatcher, statistiques disponibles
+        worker = isolated_processor(config_path, {})
+        assert worker.file_watcher is None and worker.email_dispatcher is None
+        assert worker.get_stats()['file_watcher'] == {}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST EXÉCUTION ISOLÉE DES JOBS")
+    print("=" * 70)
+    test_isolated_jobs_time_limits_memory_and_recycling()
+    test_worker_leaves_daemon_outbox_and_temp_files_alone()
+    print("\n✅ Limites, recyclage et processus de travail allégés OK")
+    print("=" * 70)
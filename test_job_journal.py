@@ -0,0 +1,330 @@
+"""
+Test du journal des jobs : reprise à la première étape incomplète
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Windows factices et dossier logs/ (avant core / monitoring)
+import tests_support  # noqa: F401
+
+import pandas as pd
+
+from core.output_manager import OutputManager
+from core.stage_cache import StageCache
+from core.input_loader import InputLoader
+from core.data_processor import DataProcessor
+from monitoring.auto_processor import AutoProcessor
+from monitoring.job_journal import JobJournal, STATUS_DONE, STATUS_FAILED
+from monitoring.input_prefetcher import InputPrefetcher
+from monitoring.stage_pipeline import StagePipeline, Lane
+
+
+class CountingFileHandler:
+    def __init__(self):
+        self.reads = 0
+
+    def read_bulk_report(self, path):
+        self.reads += 1
+        return pd.DataFrame({'Amount': [100000, 250000]}), {}
+
+    def read_export_file(self, path):
+        return pd.DataFrame({'Nom': ['ALI', 'BOB']})
+
+    def read_fees_file(self, path):
+        return None
+
+
+class CountingProcessor:
+    def __init__(self):
+        self.runs = 0
+        self.last_stage_key = None
+
+    def process_transactions(self, bulk_df, export_df, fees_df, metadata, input_keys=None):
+        self.runs += 1
+        return pd.DataFrame({'Date': ['09/09/2025 10:00'] * 2, 'Amount': bulk_df['Amount'],
+                             'Frais': [1500, 3000], 'Beneficiaire': export_df['Nom']}), []
+
+
+class FakeReportGenerator:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.renders = 0
+        self.last_render_key = None
+
+    def generate_report(self, block, metadata, name, job_id=None, cache_key=None):
+        self.renders += 1
+        path = os.path.join(self.output_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'xlsx')
+        return path
+
+
+class FlakyPDFConverter:
+    """Échoue aux `failures` premières conversions"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def convert_excel_to_pdf(self, excel_path, pdf_path, options=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return {'success': False, 'error': 'Excel occupé'}
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF')
+        return {'success': True}
+
+
+class NullSummaryStore:
+    def record(self, block, job_id=None):
+        return 0
+
+
+def make_processor(max_retries, pdf_failures):
+    output_dir = tempfile.mkdtemp()
+    processor = AutoProcessor.__new__(AutoProcessor)
+    processor.config = {
+        'processing': {'auto_retry': True, 'max_retries': max_retries, 'retry_delay': 0,
+                       'generate_pdf': True, 'send_email': False},
+        'metadata': {'date_paiement': '09/09/2025'}
+    }
+    processor.file_handler = CountingFileHandler()
+    processor.data_processor = CountingProcessor()
+    processor.report_generator = FakeReportGenerator(output_dir)
+    processor.output_manager = OutputManager(output_dir)
+    processor.pdf_converter = FlakyPDFConverter(pdf_failures)
+    processor.summary_store = NullSummaryStore()
+    processor.stage_cache = StageCache(os.path.join(output_dir, 'cache'), enabled=False)
+    processor.prefetcher = InputPrefetcher(processor.file_handler, processor.stage_cache)
+    processor.input_loader = InputLoader(processor.file_handler, reader=processor.prefetcher.take)
+    processor.pipeline = None
+    processor.stage_listener = None
+    processor.isolation = None
+    processor.email_dispatcher = None
+    processor.inboxes = {}
+    processor.journal = JobJournal(os.path.join(output_dir, 'journal'))
+    processor.processing_stats = {'total': 0, 'success': 0, 'failed': 0, 'last_process': None}
+    return processor
+
+
+FILES = {'bulkreport': 'BulkReport.csv', 'export': 'Export.xlsx', 'frais': None}
+
+
+def test_auto_retry_resumes_at_failed_stage():
+    """Un PDF en échec est reconverti sans relire ni re-rendre"""
+    processor = make_processor(max_retries=2, pdf_failures=1)
+    result = processor.process_files(FILES)
+    assert result['success']
+    assert result['pdf_path'] and os.path.exists(result['pdf_path'])
+    assert processor.file_handler.reads == 1
+    assert processor.data_processor.runs == 1
+    assert processor.report_generator.renders == 1
+    assert processor.pdf_converter.calls == 2
+    assert processor.journal.load(result['job_id']).status == STATUS_DONE
+
+
+def test_manual_resume_after_exhausted_retries():
+    """Après échec définitif, la reprise manuelle repart de l'étape PDF"""
+    processor = make_processor(max_retries=0, pdf_failures=1)
+    result = processor.process_files(FILES)
+    assert not result['success']
+    job = processor.journal.load(result['job_id'])
+    assert job.status == STATUS_FAILED
+    assert job.next_stage() == 'pdf'
+
+    resumed = processor.resume_job(result['job_id'])
+    assert resumed['success']
+    assert resumed['report_path'] == result['report_path']
+    assert processor.file_handler.reads == 1
+    assert processor.report_generator.renders == 1
+
+
+def test_prefetched_inputs_handed_to_read_stage():
+    """Fichiers lus à leur arrivée : l'étape de lecture reprend le résultat sans relire"""
+    processor = make_processor(max_retries=0, pdf_failures=0)
+    inbox = tempfile.mkdtemp()
+    files = {'bulkreport': os.path.join(inbox, 'BulkReport.csv'),
+             'export': os.path.join(inbox, 'Export.xlsx'), 'frais': None}
+    for path in (files['bulkreport'], files['export']):
+        with open(path, 'w') as f:
+            f.write('x')
+
+    processor.prefetcher.prefetch('bulkreport', files['bulkreport'])
+    processor.prefetcher.prefetch('export', files['export'])
+    result = processor.process_files(files)
+    assert result['success']
+    assert processor.file_handler.reads == 1
+    assert processor.prefetcher.stats['used'] == 2
+
+    # Fichier remplacé après la pré-lecture : relu
+    processor.prefetcher.prefetch('bulkreport', files['bulkreport'])
+    with open(files['bulkreport'], 'w') as f:
+        f.write('xy')
+    processor.process_files(files)
+    assert processor.file_handler.reads == 3
+    assert processor.prefetcher.stats['used'] == 2
+
+
+class SlowPDFConverter:
+    """Conversion de 0,2 s ; mesure le nombre de conversions simultanées"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def convert_excel_to_pdf(self, excel_path, pdf_path, options=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.2)
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF')
+        with self.lock:
+            self.active -= 1
+        return {'success': True}
+
+
+def test_pipeline_overlaps_jobs_with_exclusive_pdf_slot():
+    """Jobs simultanés : rendus en parallèle, un seul PDF à la fois, débit du PDF"""
+    processor = make_processor(max_retries=1, pdf_failures=0)
+    processor.pdf_converter = SlowPDFConverter()
+    render = processor.report_generator.generate_report
+    processor.report_generator.generate_report = lambda *a, **k: time.sleep(0.2) or render(*a, **k)
+    processor.config['processing']['pipeline'] = {'parse_workers': 2, 'render_workers': 2}
+    pipeline = processor.start_pipeline()
+
+    results = []
+    start = time.time()
+    threads = [threading.Thread(target=lambda: results.append(processor.process_files(FILES)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    pipeline.stop()
+
+    assert len(results) == 4 and all(r['success'] for r in results)
+    assert processor.pdf_converter.max_active == 1
+    # Séquentiel : 4 × (0,2 rendu + 0,2 PDF) = 1,6 s ; pipeline : ~4 × 0,2 + 0,2
+    assert elapsed < 1.4
+    assert pipeline.get_stats()['pdf']['completed'] == 4
+
+
+class StubJob:
+    """Job minimal : étapes terminées et échecs enregistrés"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.done = set()
+        self.failures = 0
+
+    def next_stage(self):
+        return next((stage for stage in self.stages if stage not in self.done), None)
+
+    def is_done(self, stage):
+        return stage in self.done
+
+    def fail(self, error):
+        self.failures += 1
+
+
+def test_pipeline_stop_resolves_pending_retries_and_stuck_jobs():
+    """Arrêt : tentative planifiée annulée, job bloqué au-delà du délai, aucun Future en suspens"""
+    release = threading.Event()
+
+    def run_stage(job, stage, context, result):
+        if stage == 'a':
+            raise RuntimeError('Excel occupé')
+        release.wait(10)
+        job.done.add(stage)
+
+    pipeline = StagePipeline([Lane('a', ('a',)), Lane('b', ('b',))], run_stage,
+                             restore=lambda job, context, result: None, attempts=3, retry_delay=60)
+    pipeline.start()
+    retrying = pipeline.submit(StubJob(['a']), {})
+    stuck = pipeline.submit(StubJob(['b']), {})
+    # Première tentative en échec : la suivante est planifiée dans 60 s
+    assert wait_until(lambda: pipeline.get_stats()['a']['completed'] == 1)
+
+    start = time.time()
+    pipeline.stop(timeout=0.2)
+    for future in (retrying, stuck):
+        try:
+            future.result(timeout=2)
+            assert False, "échec attendu"
+        except RuntimeError as e:
+            assert 'Pipeline arrêté' in str(e)
+    assert time.time() - start < 3
+    release.set()
+    try:
+        pipeline.submit(StubJob(['a']), {})
+        assert False, "pipeline arrêté"
+    except RuntimeError:
+        pass
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_parse_lane_jobs_keep_their_own_warnings():
+    """Deux jobs simultanés sur le même processeur : chacun garde ses avertissements"""
+    processor = DataProcessor()
+    processor.use_smart_processing = False
+    processor._save_mappings_cache = lambda: None
+    barrier = threading.Barrier(2)
+    validate = processor._validate_data
+
+    def interleaved(df):
+        barrier.wait(5)
+        validate(df)
+        barrier.wait(5)
+
+    processor._validate_data = interleaved
+
+    def bulk(amounts):
+        return pd.DataFrame({'Date': ['09/09/2025 10:00'] * len(amounts),
+                             'TransactionID': [f"TX{i}" for i in range(len(amounts))],
+                             'Amount': amounts, 'Credit Msisdn': ['23566000001'] * len(amounts)})
+
+    results = {}
+
+    def run(name, amounts):
+        _, errors = processor.process_transactions(
+            bulk(amounts), pd.DataFrame({'Nom': ['ALI', 'BOB']}), pd.DataFrame(), {})
+        results[name] = errors
+
+    threads = [threading.Thread(target=run, args=('negatif', [100000, -5000])),
+               threading.Thread(target=run, args=('sain', [100000, 250000]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert any('négatifs' in error for error in results['negatif'])
+    assert not any('négatifs' in error for error in results['sain'])
+    assert all(any('frais' in error for error in errors) for errors in results.values())
+    assert results['negatif'] is not results['sain']
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST JOURNAL DES JOBS")
+    print("=" * 70)
+    test_auto_retry_resumes_at_failed_stage()
+    test_manual_resume_after_exhausted_retries()
+    test_prefetched_inputs_handed_to_read_stage()
+    test_pipeline_overlaps_jobs_with_exclusive_pdf_slot()
+    test_pipeline_stop_resolves_pending_retries_and_stuck_jobs()
+    test_parse_lane_jobs_keep_their_own_warnings()
+    print("\n✅ Reprise à la première étape incomplète OK")
+    print("=" * 70)
@@ -0,0 +1,101 @@
+"""
+Test de la publication atomique des sorties partagées entre jobs
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+import subprocess
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core import output_manager as output_module
+from core.output_manager import OutputManager, HOST_TAG, TEMP_PREFIX
+
+
+def write(path, content=b'xlsx'):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def test_publish_unique_names_and_manifest():
+    """Noms uniques par job, publication atomique, une ligne de manifeste par fichier"""
+    manager = OutputManager(tempfile.mkdtemp())
+    names = {manager.unique_name('Rapport_AUTO', job_id) for job_id in ('a1', 'b2', 'c3')}
+    assert len(names) == 3 and all(name.endswith('.xlsx') for name in names)
+    assert manager.unique_name('Rapport', 'job9', '.pdf').endswith('_job9.pdf')
+
+    def produce(job_id):
+        final = manager.final_path(manager.unique_name('Rapport_AUTO', job_id))
+        temp = manager.temp_path(final)
+        assert temp.parent == final.parent and temp.name.startswith(TEMP_PREFIX)
+        write(temp, job_id.encode() * 100)
+        assert not final.exists()
+        manager.publish(temp, final, job_id=job_id)
+        assert final.exists() and not temp.exists()
+
+    threads = [threading.Thread(target=produce, args=(f"job{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Ligne tronquée par un crash : ignorée
+    with open(manager.manifest_path, 'a', encoding='utf-8') as f:
+        f.write('{"job_id": "tronq')
+    entries = manager.read_manifest()
+    assert sorted(e['job_id'] for e in entries) == [f"job{i}" for i in range(8)]
+    assert manager.read_manifest('job3')[0]['size'] == 400
+    assert manager.read_manifest('job3')[0]['kind'] == 'xlsx'
+
+
+def test_fsync_policies():
+    """'none' : aucun fsync ; 'file' : le fichier ; 'full' : le fichier puis le dossier"""
+    calls = []
+    real = output_module._fsync_path, output_module._fsync_dir
+    output_module._fsync_path = lambda path: calls.append('file')
+    output_module._fsync_dir = lambda directory: calls.append('dir')
+    try:
+        for policy, expected in (('none', []), ('file', ['file']), ('full', ['file', 'dir']),
+                                 ('bogus', ['file'])):
+            calls.clear()
+            manager = OutputManager(tempfile.mkdtemp(), fsync_policy=policy)
+            final = manager.final_path('Rapport.xlsx')
+            temp = manager.temp_path(final)
+            write(temp)
+            manager.publish(temp, final)
+            assert calls == expected, policy
+    finally:
+        output_module._fsync_path, output_module._fsync_dir = real
+
+
+def test_cleanup_keeps_files_of_live_writers():
+    """Seuls les temporaires d'un processus disparu (ou trop vieux) sont supprimés"""
+    manager = OutputManager(tempfile.mkdtemp())
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+
+    live = manager.temp_path(manager.final_path('en_cours.xlsx'))
+    orphan = manager.output_dir / f"{TEMP_PREFIX}{HOST_TAG}-{dead.pid}_abcd1234_crash.xlsx"
+    remote = manager.output_dir / f"{TEMP_PREFIX}ffffff-{dead.pid}_abcd1234_autre_poste.xlsx"
+    legacy_recent = manager.output_dir / f"{TEMP_PREFIX}abcd1234_recent.xlsx"
+    legacy_old = manager.output_dir / f"{TEMP_PREFIX}abcd1234_ancien.xlsx"
+    for path in (live, orphan, remote, legacy_recent, legacy_old):
+        write(path)
+    old = time.time() - 7 * 3600
+    os.utime(legacy_old, (old, old))
+
+    assert manager.cleanup_temp_files() == 2
+    remaining = sorted(p.name for p in manager.output_dir.iterdir())
+    assert remaining == sorted([live.name, remote.name, legacy_recent.name])
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST DES SORTIES PARTAGÉES")
+    print("=" * 70)
+    test_publish_unique_names_and_manifest()
+    test_fsync_policies()
+    test_cleanup_keeps_files_of_live_writers()
+    print("\n✅ Publication, manifeste et nettoyage OK")
+    print("=" * 70)
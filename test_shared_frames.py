@@ -0,0 +1,88 @@
+"""
+Test du transport des tableaux par mémoire partagée entre processus
+"""
+import sys
+import os
+import pickle
+import multiprocessing
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from core.shared_frames import SharedFrameStore, attach
+from core.render_block import RenderBlock
+
+
+def make_processed(rows):
+    return pd.DataFrame({
+        'Date': ['09/09/2025 10:15'] * rows,
+        'TransactionID': [f"TX{i:07d}" for i in range(rows)],
+        'Status': ['Succes,'] * rows,
+        'Amount': np.arange(rows, dtype=np.int64) * 100,
+        'Frais': np.full(rows, 1500.0),
+        'Vers': [f"23566{i % 1000:06d}" for i in range(rows)],
+        'Beneficiaire': [None if i % 10 == 0 else f"BÉNÉFICIAIRE {i % 500}" for i in range(rows)],
+        'Reference': [i if i % 2 else f"R{i}" for i in range(rows)]
+    })
+
+
+def render_in_child(handle, results):
+    """Processus de rendu : attache le bloc, calcule les totaux, se détache"""
+    block = RenderBlock.from_shared(handle)
+    results.put((block.totals(), block.rows()[1]))
+    block.close()
+
+
+def test_dataframe_round_trip_and_refcounted_release():
+    """Colonnes numériques sans copie, texte avec accents et valeurs manquantes, colonne mixte"""
+    df = make_processed(1000)
+    df['Heure'] = pd.to_datetime('2025-09-09') + pd.to_timedelta(np.arange(1000), unit='s')
+    store = SharedFrameStore()
+    handle = store.publish(df, refs=2)
+
+    with attach(handle) as frame:
+        shared = frame.to_dataframe()
+        pd.testing.assert_frame_equal(shared, df)
+        assert not frame.columns['Amount'].flags.owndata
+        shared = frame.to_dataframe(copy=True)
+    assert shared['Beneficiaire'].isna().sum() == 100
+
+    assert not store.release(handle)        # un consommateur reste
+    assert store.release(handle)            # dernier : segment supprimé
+    assert store.pending() == 0
+    try:
+        attach(handle)
+        assert False, "segment encore présent"
+    except FileNotFoundError:
+        pass
+
+
+def test_render_block_shared_with_another_process():
+    """Le processus de rendu ne reçoit qu'un descripteur de quelques centaines d'octets"""
+    block = RenderBlock.from_dataframe(make_processed(300000))
+    store = SharedFrameStore()
+    handle = block.share(store)
+    assert len(pickle.dumps(handle)) < 4096
+    assert len(pickle.dumps(block.columns)) > 10 * 1024 * 1024
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    child = context.Process(target=render_in_child, args=(handle, results))
+    child.start()
+    totals, second_row = results.get(timeout=60)
+    child.join(60)
+    assert child.exitcode == 0
+    assert totals == block.totals()
+    assert second_row == block.rows()[1]
+    assert store.release(handle) and store.pending() == 0
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST TABLEAUX EN MÉMOIRE PARTAGÉE")
+    print("=" * 70)
+    test_dataframe_round_trip_and_refcounted_release()
+    test_render_block_shared_with_another_process()
+    print("\n✅ Transport sans copie et libération OK")
+    print("=" * 70)
@@ -0,0 +1,73 @@
+"""
+Test de la mémoïsation des étapes du traitement
+"""
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from core.smart_processor import SmartProcessor
+from core.stage_cache import StageCache
+
+BULK = pd.DataFrame({
+    'TransactionID': ['T1', 'T2'],
+    'Transaction Timestamp': ['09-09-2025 10:00:00 AM'] * 2,
+    'Amount': [100000, 250000],
+    'Credit Msisdn': ['23566000001', '23566000002'],
+    'Status': ['Success', 'Success']
+})
+EXPORT = pd.DataFrame({'Nom': ['ALI', 'BOB'], 'Telephone': ['66000001', '66000002']})
+
+
+def test_corrected_export_reruns_only_resolution():
+    """Même BulkReport, Export corrigé : seules la résolution et les frais sont recalculés"""
+    processor = SmartProcessor()
+    processor.stage_cache = StageCache(tempfile.mkdtemp())
+    calls = []
+    original = processor.format_detector.detect_format
+    processor.format_detector.detect_format = lambda df: calls.append('detect') or original(df)
+
+    first, _ = processor.process_smart(BULK.copy(), EXPORT, None, {},
+                                       input_keys={'bulk': 'bulk1', 'export': 'export1', 'fees': None})
+    corrected = EXPORT.assign(Nom=['ALI', 'BOBO'])
+    second, _ = processor.process_smart(BULK.copy(), corrected, None, {},
+                                        input_keys={'bulk': 'bulk1', 'export': 'export2', 'fees': None})
+
+    assert calls == ['detect']
+    assert processor.stage_cache.stats == {'hits': 1, 'misses': 7, 'evicted': 0}
+    assert second['Frais'].tolist() == first['Frais'].tolist()
+
+    # Mêmes entrées : tout vient du cache
+    processor.process_smart(BULK.copy(), corrected, None, {},
+                            input_keys={'bulk': 'bulk1', 'export': 'export2', 'fees': None})
+    assert processor.stage_cache.stats['hits'] == 4
+
+
+def test_ttl_and_size_eviction():
+    """Entrées expirées recalculées, les moins récemment utilisées évincées"""
+    cache = StageCache(tempfile.mkdtemp(), ttl=0.2, max_size_mb=0.25)
+    cache.run('parse_bulk', ['a'], lambda: b'x' * 100000)
+    _, key = cache.run('parse_bulk', ['a'], lambda: b'x' * 100000)
+    assert cache.stats['hits'] == 1
+    time.sleep(0.3)
+    cache.run('parse_bulk', ['a'], lambda: b'x' * 100000)
+    assert cache.stats['misses'] == 2
+
+    cache.ttl = 3600
+    for name in ('b', 'c', 'd'):
+        cache.run('parse_bulk', [name], lambda: b'y' * 100000)
+    assert cache.stats['evicted'] >= 1
+    assert len(list((cache.cache_dir / 'parse_bulk').glob('*.pkl'))) == 2
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST MÉMOÏSATION DES ÉTAPES")
+    print("=" * 70)
+    test_corrected_export_reruns_only_resolution()
+    test_ttl_and_size_eviction()
+    print("\n✅ Étapes mémoïsées, expiration et éviction OK")
+    print("=" * 70)
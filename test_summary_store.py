@@ -0,0 +1,100 @@
+"""
+Test des agrégats quotidiens (résumés journaliers / hebdomadaires)
+"""
+import sys
+import os
+import time
+import tempfile
+from datetime import date
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Windows factices et dossier logs/ (avant core / monitoring)
+import tests_support  # noqa: F401
+
+import pandas as pd
+
+from core.render_block import RenderBlock
+from monitoring.summary_store import SummaryStore, HyperLogLog
+
+
+def make_block(rows):
+    return RenderBlock.from_dataframe(pd.DataFrame(rows, columns=['Date', 'Amount', 'Frais', 'Beneficiaire']))
+
+
+def test_hyperloglog_estimate():
+    """Erreur d'estimation sous 5 % et union par fusion des sketches"""
+    first, second = HyperLogLog(), HyperLogLog()
+    for i in range(20000):
+        first.add(f"BEN{i}")
+    for i in range(10000, 30000):
+        second.add(f"BEN{i}")
+    assert abs(first.count() - 20000) / 20000 < 0.05
+    first.merge(second)
+    assert abs(first.count() - 30000) / 30000 < 0.05
+    assert HyperLogLog(registers=first.to_bytes()).count() == first.count()
+
+
+def test_daily_and_weekly_summaries():
+    """Totaux par jour cumulés entre jobs, un job n'est compté qu'une fois"""
+    store = SummaryStore(os.path.join(tempfile.mkdtemp(), 'summaries.db'))
+    store.record(make_block([
+        ['08/09/2025 10:00', 100000, 1500, 'ALI'],
+        ['09/09/2025 11:00', 200000, 3000, 'BOB'],
+    ]), job_id='job1')
+    store.record(make_block([
+        ['09/09/2025 15:00', 50000, 750, 'ALI'],
+        ['09/09/2025 16:00', 50000, 750, 'BOB'],
+    ]), job_id='job2')
+    assert store.record(make_block([['09/09/2025 15:00', 1, 1, 'X']]), job_id='job2') == 0
+
+    daily = store.daily_summary(date(2025, 9, 9))
+    assert daily['reports'] == 2
+    assert daily['transaction_count'] == 3
+    assert daily['total_amount'] == 300000
+    assert daily['unique_beneficiaries'] == 2
+
+    weekly = store.weekly_summary(date(2025, 9, 14))
+    assert [d['day'] for d in weekly['days']] == ['2025-09-08', '2025-09-09']
+    assert weekly['transaction_count'] == 4
+    assert weekly['total_fees'] == 6000
+    assert weekly['unique_beneficiaries'] == 2
+
+
+def test_day_of_other_date_formats():
+    """ISO, jj-mm-aaaa, Timestamp : jour exact ; seule une date illisible compte aujourd'hui"""
+    store = SummaryStore(os.path.join(tempfile.mkdtemp(), 'summaries.db'))
+    store.record(make_block([
+        ['2025-09-08 10:15:00', 1000, 10, 'ALI'],
+        ['2025-09-08T23:59:00', 1000, 10, 'BOB'],
+        ['08-09-2025 10:15:00 AM', 1000, 10, 'CID'],
+        [pd.Timestamp('2025-09-08 09:00'), 1000, 10, 'DAN'],
+        ['illisible', 1000, 10, 'EVE'],
+    ]), job_id='job1')
+    assert store.daily_summary(date(2025, 9, 8))['transaction_count'] == 4
+    assert store.daily_summary(date(2025, 8, 9))['transaction_count'] == 0
+    assert store.daily_summary(date.today())['transaction_count'] == 1
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST AGRÉGATS QUOTIDIENS")
+    print("=" * 70)
+
+    test_hyperloglog_estimate()
+    test_daily_and_weekly_summaries()
+    test_day_of_other_date_formats()
+
+    # Coût d'un résumé hebdomadaire : indépendant du nombre de transactions
+    store = SummaryStore(os.path.join(tempfile.mkdtemp(), 'summaries.db'))
+    for job in range(20):
+        store.record(make_block([
+            [f"{day:02d}/09/2025 10:00", 10000, 150, f"BEN{job}_{i}"]
+            for day in range(1, 8) for i in range(500)
+        ]), job_id=f"job{job}")
+    start = time.time()
+    weekly = store.weekly_summary(date(2025, 9, 7))
+    print(f"  • {weekly['transaction_count']} transactions, "
+          f"~{weekly['unique_beneficiaries']} bénéficiaires (réel: 10000) "
+          f"résumées en {(time.time() - start) * 1000:.1f} ms")
+    print("\n✅ Agrégats et résumés OK")
+    print("=" * 70)
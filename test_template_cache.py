@@ -0,0 +1,70 @@
+"""
+Test du cache du template Excel : hits, clones indépendants, invalidation
+"""
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook
+
+from core.template_cache import load_template_clone, clear_template_cache, get_cache_stats
+
+
+def make_template(path, title='RAPPORT'):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet['A1'] = title
+    sheet.merge_cells('A1:D1')
+    workbook.save(path)
+
+
+def test_hits_and_independent_clones():
+    """Un seul parsing ; chaque clone se remplit sans toucher les autres"""
+    clear_template_cache()
+    path = os.path.join(tempfile.mkdtemp(), 'template.xlsx')
+    make_template(path)
+    before = get_cache_stats()
+
+    first = load_template_clone(path)
+    second = load_template_clone(path)
+    third = load_template_clone(path)
+    stats = get_cache_stats()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 2
+
+    first.active['B5'] = 'job 1'
+    second.active['A1'] = 'modifié'
+    assert third.active['B5'].value is None
+    assert third.active['A1'].value == 'RAPPORT'
+    assert 'A1:D1' in {str(r) for r in third.active.merged_cells.ranges}
+    assert load_template_clone(path).active['A1'].value == 'RAPPORT'
+
+
+def test_invalidation_on_content_change_only():
+    """Date modifiée à contenu égal : hit ; contenu modifié : nouveau parsing"""
+    clear_template_cache()
+    path = os.path.join(tempfile.mkdtemp(), 'template.xlsx')
+    make_template(path)
+    load_template_clone(path)
+    misses = get_cache_stats()['misses']
+
+    future = time.time() + 10
+    os.utime(path, (future, future))
+    assert load_template_clone(path).active['A1'].value == 'RAPPORT'
+    assert get_cache_stats()['misses'] == misses
+
+    make_template(path, title='NOUVEAU TITRE')
+    assert load_template_clone(path).active['A1'].value == 'NOUVEAU TITRE'
+    assert get_cache_stats()['misses'] == misses + 1
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 70)
+    print(" TEST CACHE DU TEMPLATE")
+    print("=" * 70)
+    test_hits_and_independent_clones()
+    test_invalidation_on_content_change_only()
+    print("\n✅ Cache, clones et invalidation OK")
+    print("=" * 70)
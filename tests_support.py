@@ -0,0 +1,53 @@
+"""
+Support commun des tests exécutables hors Windows
+À importer avant les packages core / monitoring : les modules Windows absents
+(pywin32) sont remplacés par des modules vides et le dossier logs/, où le
+package monitoring journalise dès l'import, est créé
+"""
+import os
+import sys
+import types
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+WINDOWS_MODULES = ('pythoncom', 'win32com', 'win32com.client')
+
+
+def stub_windows_modules(*extra: str):
+    """Remplace par des modules vides les modules Windows absents (et `extra`, ex: xlwings)"""
+    for module_name in WINDOWS_MODULES + extra:
+        try:
+            __import__(module_name)
+        except ImportError:
+            sys.modules[module_name] = types.ModuleType(module_name)
+    sys.modules['win32com'].client = sys.modules['win32com.client']
+
+
+stub_windows_modules()
+os.makedirs(os.path.join(ROOT, 'logs'), exist_ok=True)
+
+
+@contextmanager
+def windows_stubs_on_path():
+    """
+    Mêmes modules factices pour les processus fils ('spawn'), qui importent le
+    package monitoring avant tout module de test : dossier ajouté au chemin
+    transmis aux fils, retiré et supprimé à la sortie
+    """
+    if hasattr(sys.modules['win32com'], '__file__'):
+        yield
+        return
+    stubs = tempfile.mkdtemp()
+    os.makedirs(os.path.join(stubs, 'win32com'))
+    for name in ('pythoncom.py', os.path.join('win32com', '__init__.py'),
+                 os.path.join('win32com', 'client.py')):
+        open(os.path.join(stubs, name), 'w').close()
+    sys.path.insert(0, stubs)
+    try:
+        yield
+    finally:
+        sys.path.remove(stubs)
+        shutil.rmtree(stubs, ignore_errors=True)